@@ -4,6 +4,7 @@ AI Object Detection Application with YOLO
 Dual USB Camera System with Relay Control Integration
 """
 
+import os
 import sys
 import cv2
 import numpy as np
@@ -22,6 +23,17 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, QThread, Signal, QTimer, Slot, QRect, QPoint
 from PySide6.QtGui import QImage, QPixmap, QPainter, QColor, QPen, QFont, QFontMetrics
 
+from event_log import EventLog, LEVEL, MESSAGE, TIME
+
+# Camera, inference and relay threads log here instead of print(), and the
+# System Log shows the same records: logging is one ring buffer store, a
+# writer thread echoes to the console and appends to EVENT_LOG_FILE
+# (rotated at 1 MB), and the log view is redrawn every LOG_REFRESH_MS
+EVENT_LOG_FILE = os.getenv('EVENT_LOG_FILE', 'detection_events.log')
+LOG_REFRESH_MS = 250
+LOG_MAX_LINES = 1000
+event_log = EventLog(path=EVENT_LOG_FILE, echo=True)
+
 # YOLO imports
 try:
     from ultralytics import YOLO
@@ -37,8 +49,21 @@ except ImportError as e:
     CUDA_AVAILABLE = False
 
 # Relay imports
+if os.getenv('RELAY_BROKER'):
+    # Share the board through relay_broker.py (OCR_Project) instead of opening
+    # our own socket. Not imported inside the fallback below: asking for the
+    # broker and silently getting the dummy Relay would drive no hardware.
+    try:
+        from relay_broker import BrokerRelay
+    except ImportError as e:
+        raise ImportError(f"RELAY_BROKER is set but relay_broker could not be imported ({e}); "
+                          "put OCR_Project on PYTHONPATH or unset RELAY_BROKER") from e
 try:
-    from Relay_b import Relay
+    if os.getenv('RELAY_BROKER'):
+        Relay = BrokerRelay
+    else:
+        from Relay_b import Relay
+    from Relay_b import DISampler, OutputShadow
     RELAY_AVAILABLE = True
     print("✓ Relay module loaded successfully")
 except (ImportError, AttributeError) as e:
@@ -51,7 +76,7 @@ except (ImportError, AttributeError) as e:
         def __init__(self, host='192.168.1.254', port=4196, address=0x01):
             self.host = host
             self.port = port
-            print(f"Using dummy Relay (no hardware connection to {host}:{port})")
+            event_log.log(f"Using dummy Relay (no hardware connection to {host}:{port})")
             
         def connect(self):
             pass
@@ -63,10 +88,10 @@ except (ImportError, AttributeError) as e:
             return False
             
         def on(self, channel):
-            print(f"Dummy: Relay channel {channel} ON")
+            event_log.log(f"Dummy: Relay channel {channel} ON")
             
         def off(self, channel):
-            print(f"Dummy: Relay channel {channel} OFF")
+            event_log.log(f"Dummy: Relay channel {channel} OFF")
             
         def check_DI(self):
             return 0
@@ -226,14 +251,14 @@ class CameraThread(QThread):
         retry_delay = 1.0
         
         for attempt in range(max_retries):
-            print(f"Camera {self.camera_id}: Opening /dev/video{self.camera_index} (attempt {attempt + 1}/{max_retries})...")
+            event_log.log(f"Camera {self.camera_id}: Opening /dev/video{self.camera_index} (attempt {attempt + 1}/{max_retries})...")
             self.cap = cv2.VideoCapture(self.camera_index)
             
             if self.cap.isOpened():
-                print(f"✓ Camera {self.camera_id} opened successfully")
+                event_log.log(f"✓ Camera {self.camera_id} opened successfully")
                 break
             
-            print(f"Camera {self.camera_id}: Failed to open, retrying in {retry_delay}s...")
+            event_log.warning(f"Camera {self.camera_id}: Failed to open, retrying in {retry_delay}s...")
             time.sleep(retry_delay)
             retry_delay *= 1.5  # Exponential backoff
         else:
@@ -292,9 +317,9 @@ class YOLOInferenceThread(QThread):
             # Move to GPU if available
             if CUDA_AVAILABLE:
                 self.model.to('cuda:0')
-                print(f"✓ YOLO model loaded on GPU")
+                event_log.log(f"✓ YOLO model loaded on GPU")
             else:
-                print(f"✓ YOLO model loaded on CPU")
+                event_log.log(f"✓ YOLO model loaded on CPU")
             
             return True
             
@@ -394,8 +419,11 @@ class RelayMonitorThread(QThread):
         self.last_di1_state = False
         self.last_di2_state = False
         self.manual_mode = True  # Start in manual mode
+        self.sampler = None
+        self.outputs = None  # OutputShadow: drops redundant writes, batches the rest
+        self.di_lock = threading.Lock()
         
-        # Track current DO states to avoid redundant commands
+        # Last requested DO states, for logging state changes
         self.do_states = {1: None, 2: None, 3: None, 4: None, 5: None, 6: None, 7: None, 8: None}
         
     def run(self):
@@ -406,29 +434,20 @@ class RelayMonitorThread(QThread):
             self.relay = Relay(host=self.relay_host, port=self.relay_port)
             self.relay.connect(timeout=2.0)  # Short timeout
             self.error_signal.emit(f"Connected to relay at {self.relay_host}")
-            
+            self.outputs = OutputShadow(self.relay)
+
+            # One DI read per 20 ms sample covers DI1 and DI2; debounced edges
+            # are reported immediately instead of on the next 100 ms poll
+            self.sampler = DISampler(self.relay, interval=0.02)
+            for di_number in (1, 2):
+                self.sampler.subscribe(di_number, on_rise=self._on_di_edge, on_fall=self._on_di_edge)
+            self.sampler.start()
+
             while self.running:
-                try:
-                    # Only monitor hardware DI when not in manual mode
-                    if not self.manual_mode:
-                        # Check DI1 state
-                        di1_state = self.relay.is_DI_on(1)
-                        if di1_state != self.last_di1_state:
-                            self.last_di1_state = di1_state
-                            self.di1_changed.emit(di1_state)
-                            
-                        # Check DI2 state
-                        di2_state = self.relay.is_DI_on(2)
-                        if di2_state != self.last_di2_state:
-                            self.last_di2_state = di2_state
-                            self.di2_changed.emit(di2_state)
-                        
-                    time.sleep(0.1)  # Poll every 100ms
-                    
-                except Exception as e:
-                    self.error_signal.emit(f"Relay monitoring error: {str(e)}")
-                    time.sleep(1)
-                    
+                # Picks up inputs that changed while in manual mode
+                self._emit_di_changes()
+                time.sleep(0.1)
+
         except Exception as e:
             self.error_signal.emit(f"Relay connection error: {str(e)} - using dummy mode")
             # Continue in dummy mode
@@ -436,44 +455,63 @@ class RelayMonitorThread(QThread):
                 time.sleep(0.5)
             
         finally:
+            if self.sampler:
+                self.sampler.stop()
             if self.relay:
                 self.relay.disconnect()
-                
+
+    def _on_di_edge(self, di_number, timestamp):
+        """DI1/DI2 edge from the sampler thread."""
+        self._emit_di_changes()
+
+    def _emit_di_changes(self):
+        """Emit di1_changed/di2_changed for inputs that differ from the last emitted state."""
+        # Only monitor hardware DI when not in manual mode
+        if self.manual_mode or not self.sampler or self.sampler.state is None:
+            return
+        with self.di_lock:
+            di1_state = self.sampler.is_on(1)
+            if di1_state != self.last_di1_state:
+                self.last_di1_state = di1_state
+                self.di1_changed.emit(di1_state)
+
+            di2_state = self.sampler.is_on(2)
+            if di2_state != self.last_di2_state:
+                self.last_di2_state = di2_state
+                self.di2_changed.emit(di2_state)
+
     def stop(self):
         """Stop the relay monitor thread"""
         self.running = False
         self.wait()
         
-    def set_output(self, channel, state):
-        """Set relay output channel state (only if state changed)"""
+    def set_output(self, channel, state, flush=True):
+        """Set relay output channel state (only sent if state changed)
+        
+        With flush=False the change is queued until flush_outputs(), so
+        outputs changed together go to the relay in one frame.
+        """
+        if not self.relay or not self.outputs:
+            return
+        self.outputs.set(channel, state)
+        self.do_states[channel] = state
+        if flush:
+            self.flush_outputs()
+    
+    def flush_outputs(self):
+        """Send queued output changes to the relay"""
         try:
-            if self.relay:
-                # Check if state is already set to avoid redundant commands
-                if self.do_states.get(channel) == state:
-                    # Already in requested state, skip command
-                    return
-                
-                # State is changing, send command
-                success = False
-                if state:
-                    result = self.relay.on(channel)
-                    success = result if result is not None else True
-                else:
-                    result = self.relay.off(channel)
-                    success = result if result is not None else True
-                
-                # Update tracked state only if command succeeded
-                if success:
-                    self.do_states[channel] = state
+            if self.relay and self.outputs:
+                self.outputs.flush()
         except socket.timeout:
-            self.error_signal.emit(f"Relay timeout: DO{channel} command timed out")
+            self.error_signal.emit("Relay timeout: output write timed out")
         except ConnectionError as e:
             self.error_signal.emit(f"Relay connection error: {str(e)}")
             # Try to reconnect on next operation
             self.relay = None
         except Exception as e:
             # Log error but don't spam - only log unique errors
-            error_msg = f"Relay output error on DO{channel}: {str(e)}"
+            error_msg = f"Relay output error: {str(e)}"
             if not hasattr(self, '_last_error') or self._last_error != error_msg:
                 self.error_signal.emit(error_msg)
                 self._last_error = error_msg
@@ -507,6 +545,13 @@ class DetectionApp(QMainWindow):
         # Setup UI
         self.init_ui()
         
+        # Redraw the log view from the event log at a fixed rate
+        self.log_cursor = event_log.head
+        self.log_timer = QTimer(self)
+        self.log_timer.timeout.connect(self.refresh_log)
+        self.log_timer.start(LOG_REFRESH_MS)
+        event_log.start()
+        
         # Start threads
         self.start_threads()
         
@@ -569,6 +614,7 @@ class DetectionApp(QMainWindow):
         self.log_text = QTextEdit()
         self.log_text.setReadOnly(True)
         self.log_text.setMaximumHeight(300)
+        self.log_text.document().setMaximumBlockCount(LOG_MAX_LINES)
         log_layout.addWidget(self.log_text)
         
         # Reset DO5 button (with password protection)
@@ -735,7 +781,7 @@ class DetectionApp(QMainWindow):
         
     def start_threads(self):
         """Start all worker threads"""
-        print("Starting camera 1 thread...")
+        event_log.log("Starting camera 1 thread...")
         # Camera threads with delay between initialization
         self.camera1_thread = CameraThread(camera_id=1, camera_index=0)
         self.camera1_thread.frame_ready.connect(self.on_camera1_frame)
@@ -743,27 +789,27 @@ class DetectionApp(QMainWindow):
         self.camera1_thread.start()
         
         # Wait for camera 1 to initialize
-        print("Waiting for camera 1 to initialize...")
+        event_log.log("Waiting for camera 1 to initialize...")
         time.sleep(2)
         
-        print("Starting camera 2 thread...")
+        event_log.log("Starting camera 2 thread...")
         self.camera2_thread = CameraThread(camera_id=2, camera_index=2)
         self.camera2_thread.frame_ready.connect(self.on_camera2_frame)
         self.camera2_thread.error_signal.connect(self.on_error)
         self.camera2_thread.start()
         
         # Wait for camera 2 to initialize
-        print("Waiting for camera 2 to initialize...")
+        event_log.log("Waiting for camera 2 to initialize...")
         time.sleep(2)
         
-        print("Starting inference thread...")
+        event_log.log("Starting inference thread...")
         # Inference thread
         self.inference_thread = YOLOInferenceThread(self.model_path, conf_threshold=0.25)
         self.inference_thread.detection_result.connect(self.on_detection_result)
         self.inference_thread.error_signal.connect(self.on_error)
         self.inference_thread.start()
         
-        print("Starting relay monitor thread...")
+        event_log.log("Starting relay monitor thread...")
         # Relay monitor thread
         self.relay_thread = RelayMonitorThread(relay_host=self.relay_host)
         self.relay_thread.di1_changed.connect(self.on_di1_changed)
@@ -771,7 +817,7 @@ class DetectionApp(QMainWindow):
         self.relay_thread.error_signal.connect(self.on_error)
         self.relay_thread.start()
         
-        print("All threads started")
+        event_log.log("All threads started")
         self.log("All threads started")
         
     @Slot(np.ndarray, int)
@@ -912,15 +958,15 @@ class DetectionApp(QMainWindow):
         if self.detection_active:
             if self.di2_active and not any_object and not self.do5_locked:
                 # DI2 is on, no object detected, DO5 not locked -> DO4 ON
-                self.relay_thread.set_output(4, True)
+                self.relay_thread.set_output(4, True, flush=False)
                 self.do4_indicator.setStyleSheet("color: green; font-size: 24px;")
                 # Only log if state changed
                 if prev_do4 != True:
                     self.log("DO4 ON - No object detected (DI2 active)")
             elif any_object:
                 # Object detected -> DO5 ON and lock it
-                self.relay_thread.set_output(4, False)
-                self.relay_thread.set_output(5, True)
+                self.relay_thread.set_output(4, False, flush=False)
+                self.relay_thread.set_output(5, True, flush=False)
                 self.do4_indicator.setStyleSheet("color: gray; font-size: 24px;")
                 self.do5_indicator.setStyleSheet("color: green; font-size: 24px;")
                 
@@ -933,24 +979,27 @@ class DetectionApp(QMainWindow):
                     self.log("DO5 ON - Object detected")
             elif self.do5_locked:
                 # DO5 is locked ON, keep it that way regardless of detection state
-                self.relay_thread.set_output(4, False)
+                self.relay_thread.set_output(4, False, flush=False)
                 # Don't turn off DO5 - it's locked
                 self.do4_indicator.setStyleSheet("color: gray; font-size: 24px;")
                 self.do5_indicator.setStyleSheet("color: green; font-size: 24px;")
             else:
                 # No conditions met, DO5 not locked -> both OFF
-                self.relay_thread.set_output(4, False)
+                self.relay_thread.set_output(4, False, flush=False)
                 self.do4_indicator.setStyleSheet("color: gray; font-size: 24px;")
                 self.do5_indicator.setStyleSheet("color: gray; font-size: 24px;")
         else:
             # Detection not active
             # DO4 turns off, but DO5 stays locked if it was locked
-            self.relay_thread.set_output(4, False)
+            self.relay_thread.set_output(4, False, flush=False)
             self.do4_indicator.setStyleSheet("color: gray; font-size: 24px;")
             
             if not self.do5_locked:
                 # Only turn off DO5 if it's not locked
                 self.do5_indicator.setStyleSheet("color: gray; font-size: 24px;")
+        
+        # DO4/DO5 changes from this update go out in one frame
+        self.relay_thread.flush_outputs()
             
     @Slot(str)
     def on_error(self, error_msg):
@@ -958,9 +1007,19 @@ class DetectionApp(QMainWindow):
         self.log(f"ERROR: {error_msg}")
         
     def log(self, message):
-        """Add message to log"""
-        timestamp = time.strftime("%H:%M:%S")
-        self.log_text.append(f"[{timestamp}] {message}")
+        """Add message to log; safe and non-blocking from any thread."""
+        event_log.log(message)
+        
+    def refresh_log(self):
+        """Append the messages logged since the last refresh in one update"""
+        records, self.log_cursor, missed = event_log.read(self.log_cursor)
+        lines = [f"... {missed} messages not shown"] if missed else []
+        for record in records[-LOG_MAX_LINES:]:
+            timestamp = time.strftime("%H:%M:%S", time.localtime(record[TIME]))
+            prefix = "" if record[LEVEL] == 'INFO' else f"{record[LEVEL]}: "
+            lines.append(f"[{timestamp}] {prefix}{record[MESSAGE]}")
+        if lines:
+            self.log_text.append("\n".join(lines))
         
     def clear_log(self):
         """Clear the log"""
@@ -1219,10 +1278,13 @@ class DetectionApp(QMainWindow):
             self.inference_thread.stop()
         if self.relay_thread:
             # Turn off all outputs
-            self.relay_thread.set_output(4, False)
-            self.relay_thread.set_output(5, False)
+            self.relay_thread.set_output(4, False, flush=False)
+            self.relay_thread.set_output(5, False, flush=False)
+            self.relay_thread.flush_outputs()
             self.relay_thread.stop()
-            
+        
+        self.log_timer.stop()
+        event_log.close()
         event.accept()
 
 
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Event log: ring buffer with a background rotating-file writer
+Control loops log through EventLog.log(), which only stores the record in a
+fixed-size ring buffer: no lock, no I/O, no GUI call, a few microseconds.
+Everything that costs time reads the buffer later from its own thread:
+
+- the writer thread appends new records to a log file every
+  flush_interval seconds, rotating it at max_bytes (file, file.1, ...),
+  and echoes them to stdout if asked, in place of print();
+- a GUI polls read() on a timer and redraws once per refresh instead of
+  once per event.
+
+The buffer is lock-free: every record takes a sequence number from an
+itertools.count (atomic under the GIL) and is stored in slot seq % capacity
+as one tuple assignment. A reader keeps its own cursor and only takes the
+slots that hold the sequence number it expects, so a record that is still
+being written is picked up on the next read, and a reader that fell more
+than `capacity` records behind learns how many it missed.
+
+Example:
+    event_log = EventLog(path='controller.log', echo=True)
+    event_log.start()
+    event_log.log("Sequence 0: DO1 ON")
+    ...
+    event_log.close()
+"""
+
+import itertools
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Record fields: (seq, wall time, level, message)
+SEQ, TIME, LEVEL, MESSAGE = range(4)
+
+
+def format_record(record):
+    """'2025-01-31 08:00:00.123 [LEVEL] message' for files and the console."""
+    timestamp = datetime.fromtimestamp(record[TIME]).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+    if record[LEVEL] == 'INFO':
+        return f"{timestamp} {record[MESSAGE]}"
+    return f"{timestamp} [{record[LEVEL]}] {record[MESSAGE]}"
+
+
+class EventLog:
+    """Fixed-size in-memory log, safe to write from any thread without blocking.
+
+    Args:
+        capacity: records kept in memory; older ones are overwritten.
+        path: log file written by the background writer, None for memory only.
+        max_bytes: size at which the log file is rotated.
+        backups: rotated files kept (path.1 ... path.N).
+        echo: also print new records to stdout from the writer thread.
+        flush_interval: seconds between writer passes.
+    """
+
+    def __init__(self, capacity=4096, path=None, max_bytes=1_000_000, backups=5, echo=False,
+                 flush_interval=0.5):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.echo = echo
+        self.flush_interval = flush_interval
+        self._slots = [None] * capacity
+        self._counter = itertools.count()
+        self.head = 0  # about one past the newest sequence number; a hint for readers
+        self.dropped = 0  # records the writer missed because it fell a whole buffer behind
+        self._file = None
+        self._cursor = 0  # writer's next sequence number
+        self._stop = threading.Event()
+        self._thread = None
+
+    def log(self, message, level='INFO'):
+        """Store a record; never blocks and never does I/O."""
+        seq = next(self._counter)
+        self._slots[seq % self.capacity] = (seq, time.time(), level, message)
+        self.head = seq + 1
+
+    def warning(self, message):
+        self.log(message, 'WARNING')
+
+    def error(self, message):
+        self.log(message, 'ERROR')
+
+    def read(self, cursor):
+        """Records from sequence number cursor on: returns (records, next cursor, missed count)."""
+        slots = self._slots
+        capacity = self.capacity
+        missed = 0
+        oldest = self.head - capacity
+        if cursor < oldest:
+            missed = oldest - cursor
+            cursor = oldest
+        records = []
+        while True:
+            record = slots[cursor % capacity]
+            if record is None or record[SEQ] < cursor:
+                # Not written yet
+                break
+            if record[SEQ] > cursor:
+                # Overwritten while we read
+                missed += 1
+            else:
+                records.append(record)
+            cursor += 1
+        return records, cursor, missed
+
+    def start(self):
+        """Start the background writer, if there is a file to write or echo is on."""
+        if (self.path is None and not self.echo) or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='event-log-writer', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Write the remaining records and stop the writer."""
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(5.0)
+        self._thread = None
+        self.flush()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write the records logged since the last flush; called by the writer thread."""
+        records, self._cursor, missed = self.read(self._cursor)
+        if missed:
+            self.dropped += missed
+            records.insert(0, (None, time.time(), 'WARNING', f"{missed} log records lost (buffer full)"))
+        if not records:
+            return
+        lines = "".join(format_record(record) + "\n" for record in records)
+        if self.echo:
+            sys.stdout.write(lines)
+            sys.stdout.flush()
+        if self.path is None:
+            return
+        try:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(lines)
+            self._file.flush()
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            sys.stderr.write(f"Error writing event log {self.path}: {e}\n")
+            self._file = None
+
+    def _rotate(self):
+        """path -> path.1 -> ... -> path.<backups>; the next write starts a new file."""
+        self._file.close()
+        self._file = None
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{n}"):
+                os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
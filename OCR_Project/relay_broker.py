@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Relay broker: one board connection shared by every app on this machine.
+
+Run one broker per relay board:
+
+    python3 relay_broker.py --host 192.168.1.254 --port 502
+
+The broker owns the only TCP connection to the board. It polls DI/DO once
+per interval and pushes every change to all connected apps over a Unix
+socket, and it executes their write commands one at a time on the board
+connection. Apps reach it through BrokerRelay, a drop-in replacement for
+relay_b.Relay:
+
+    from relay_broker import BrokerRelay as Relay
+
+Messages are newline-delimited JSON. Apps send
+{"id": n, "op": "on", "args": [3]} and get {"id": n, "ok": true, "result": ...}
+or {"id": n, "ok": false, "error": "..."}; the broker pushes
+{"di": mask, "do": mask, "connected": bool, "time": t} on every change.
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+
+from relay_b import Relay
+
+# Write commands apps may send; reads are answered from the pushed state
+BROKER_COMMANDS = ('on', 'off', 'all_on', 'all_off', 'set_outputs')
+
+
+def broker_socket_path(host: str) -> str:
+    """Default Unix socket path of the broker for a board."""
+    return os.path.join('/tmp', f'relay_broker_{host}.sock')
+
+
+class _BrokerClientHandler(socketserver.StreamRequestHandler):
+    """One connected app: receives state pushes, sends write commands."""
+
+    def setup(self):
+        super().setup()
+        self.send_lock = threading.Lock()
+
+    def send(self, message: dict):
+        data = (json.dumps(message) + '\n').encode()
+        with self.send_lock:
+            self.wfile.write(data)
+
+    def handle(self):
+        broker = self.server.broker
+        broker.add_client(self)
+        try:
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    print(f"Broker: ignoring malformed request {line!r}")
+                    continue
+                broker.commands.put((self, request))
+        except OSError:
+            pass
+        finally:
+            broker.remove_client(self)
+
+
+class _BrokerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class RelayBroker:
+    """Owns one Relay connection, polls it and serves apps over a Unix socket."""
+
+    def __init__(self, host='192.168.1.254', port=502, socket_path=None,
+                 interval=0.05, timeout=2.0, retry_delay=1.0, optimistic=False):
+        # Optimistic writes are verified by the next poll's coil read, so a
+        # write costs one transaction and is checked within one interval
+        self.relay = Relay(host=host, port=port, optimistic=optimistic)
+        self.socket_path = socket_path or broker_socket_path(host)
+        self.interval = interval
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+
+        self.commands = queue.Queue()
+        self.clients = set()
+        self.clients_lock = threading.Lock()
+        self.state = {'di': None, 'do': None, 'connected': False, 'time': None}
+
+        self.server = None
+        self.worker = None
+        self.running = False
+
+    def start(self):
+        """Start the board worker thread and the Unix socket server."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.server = _BrokerServer(self.socket_path, _BrokerClientHandler)
+        self.server.broker = self
+        self.running = True
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Relay broker for {self.relay.host}:{self.relay.port} listening on {self.socket_path}")
+
+    def stop(self):
+        """Stop serving and close the board connection."""
+        self.running = False
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        # Close app connections so every BrokerRelay sees the broker go away
+        with self.clients_lock:
+            clients = list(self.clients)
+        for client in clients:
+            try:
+                client.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self.worker:
+            self.worker.join(timeout=5.0)
+        self.relay.disconnect()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def add_client(self, client):
+        with self.clients_lock:
+            self.clients.add(client)
+            state = dict(self.state)
+        try:
+            client.send(state)
+        except OSError:
+            self.remove_client(client)
+
+    def remove_client(self, client):
+        with self.clients_lock:
+            self.clients.discard(client)
+
+    def _broadcast(self):
+        with self.clients_lock:
+            clients = list(self.clients)
+            state = dict(self.state)
+        for client in clients:
+            try:
+                client.send(state)
+            except OSError:
+                self.remove_client(client)
+
+    def _set_state(self, di, do, connected):
+        if (di, do, connected) == (self.state['di'], self.state['do'], self.state['connected']):
+            return
+        with self.clients_lock:
+            self.state = {'di': di, 'do': do, 'connected': connected, 'time': time.time()}
+        self._broadcast()
+
+    def _run(self):
+        """Worker loop: the only thread that talks to the board."""
+        next_poll = 0.0
+        while self.running:
+            try:
+                client, request = self.commands.get(timeout=max(0.0, next_poll - time.monotonic()))
+            except queue.Empty:
+                client = None
+
+            if client is not None:
+                self._execute(client, request)
+                # Publish the written outputs right away, re-read on the next pass
+                next_poll = 0.0
+                continue
+
+            next_poll = time.monotonic() + (self.interval if self._poll() else self.retry_delay)
+
+    def _ensure_connected(self):
+        if not getattr(self.relay, 'sock', None):
+            self.relay.connect()
+            self.relay.sock.settimeout(self.timeout)
+            print(f"Broker connected to {self.relay.host}:{self.relay.port}")
+
+    def _poll(self) -> bool:
+        try:
+            self._ensure_connected()
+            di = self.relay.read_DI()
+            do = self.relay.check_DO()
+            self._set_state(di, do, True)
+            return True
+        except (OSError, RuntimeError) as e:
+            print(f"Broker poll error ({self.relay.host}): {e}")
+            self.relay.disconnect()
+            self._set_state(None, None, False)
+            return False
+
+    def _execute(self, client, request: dict):
+        op = request.get('op')
+        reply = {'id': request.get('id')}
+        try:
+            if op not in BROKER_COMMANDS:
+                raise ValueError(f"Unsupported broker command [{op}]")
+            self._ensure_connected()
+            reply['result'] = getattr(self.relay, op)(*request.get('args', []))
+            reply['ok'] = True
+            if self.relay.coil_mask is not None:
+                self._set_state(self.state['di'], self.relay.coil_mask, True)
+        except (OSError, RuntimeError, ValueError, TypeError) as e:
+            reply['ok'] = False
+            reply['error'] = str(e)
+            if isinstance(e, OSError):
+                self.relay.disconnect()
+                self._set_state(None, None, False)
+        try:
+            client.send(reply)
+        except OSError:
+            self.remove_client(client)
+
+
+class BrokerRelay:
+    """relay_b.Relay-compatible proxy that talks to a RelayBroker.
+
+    Reads (check_DI, is_DI_on, check_DO, status) are answered from the state
+    the broker pushes, so polling them costs no board traffic. Writes are
+    forwarded to the broker and raise RuntimeError on failure, as Relay does.
+    """
+
+    def __init__(self, host='192.168.1.254', port=502, address=0x01, socket_path=None):
+        self.host = host
+        self.port = port
+        self.address = address
+        self.channels = range(1, 9)
+        self.socket_path = socket_path or broker_socket_path(host)
+        self.timeout = 2.0
+        self.command_timeout = 5.0
+
+        self.sock = None
+        self.di_mask = None
+        self.coil_mask = None
+        self.board_connected = False
+        self.state_received = False
+        self._changed = threading.Condition()
+        self._replies = {}
+        self._next_id = 0
+        self._send_lock = threading.Lock()
+
+    def __str__(self):
+        return f'Broker relay host [{self.host}] socket [{self.socket_path}]'
+
+    def connect(self, timeout=2.0):
+        """Connect to the broker and wait for its first state push."""
+        if self.sock:
+            return
+        self.timeout = timeout
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(self.socket_path)
+        sock.settimeout(None)
+        self.sock = sock
+        threading.Thread(target=self._read_messages, args=(sock,), daemon=True).start()
+
+        with self._changed:
+            received = self._changed.wait_for(lambda: self.sock is not sock or self.state_received,
+                                              timeout)
+        if not received or self.sock is not sock:
+            self.disconnect()
+            raise RuntimeError(f'No state received from broker for device [{self}].')
+
+    def disconnect(self):
+        """Disconnect from the broker."""
+        sock = self.sock
+        self.sock = None
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        with self._changed:
+            self.di_mask = self.coil_mask = None
+            self.board_connected = False
+            self.state_received = False
+            self._changed.notify_all()
+
+    def _read_messages(self, sock):
+        try:
+            for line in sock.makefile('rb'):
+                message = json.loads(line)
+                with self._changed:
+                    if 'id' in message:
+                        self._replies[message['id']] = message
+                    else:
+                        self.state_received = True
+                        self.di_mask = message['di']
+                        self.coil_mask = message['do']
+                        self.board_connected = message['connected']
+                    self._changed.notify_all()
+        except (OSError, ValueError):
+            pass
+        with self._changed:
+            if self.sock is sock:
+                self.sock = None
+                sock.close()
+            self.board_connected = False
+            self._changed.notify_all()
+
+    def _call(self, op, *args):
+        self.connect(self.timeout)
+        with self._send_lock:
+            self._next_id += 1
+            request_id = self._next_id
+            sock = self.sock
+            sock.sendall((json.dumps({'id': request_id, 'op': op, 'args': list(args)}) + '\n').encode())
+
+        with self._changed:
+            if not self._changed.wait_for(lambda: request_id in self._replies or self.sock is not sock,
+                                          self.command_timeout):
+                raise RuntimeError(f'Broker did not answer [{op}] for device [{self}].')
+            reply = self._replies.pop(request_id, None)
+        if reply is None:
+            raise RuntimeError(f'Lost connection to broker for device [{self}].')
+        if not reply['ok']:
+            raise RuntimeError(reply['error'])
+        return reply.get('result')
+
+    def _state(self, key: str) -> int:
+        self.connect(self.timeout)
+        with self._changed:
+            if not self.board_connected:
+                raise RuntimeError(f'Broker is not connected to device [{self}].')
+            return self.di_mask if key == 'di' else self.coil_mask
+
+    def _check_channel(self, channel: int):
+        if channel not in self.channels:
+            raise ValueError(f'Provided channel [{channel}] not in [{self.channels}] for device [{self}].')
+
+    def on(self, channel: int):
+        """Turn a relay channel on."""
+        self._check_channel(channel)
+        self._call('on', channel)
+
+    def off(self, channel: int):
+        """Turn a relay channel off."""
+        self._check_channel(channel)
+        self._call('off', channel)
+
+    def all_on(self):
+        """Turn all relay channels on."""
+        self._call('all_on')
+
+    def all_off(self):
+        """Turn all relay channels off."""
+        self._call('all_off')
+
+    def set_outputs(self, mask: int, channels: int = 0xFF, verify: bool = False):
+        """Write several relay channels in one frame (see Relay.set_outputs)."""
+        self._call('set_outputs', mask, channels, verify)
+
+    def check_DO(self):
+        """Return the state of all relay channels as a bitmask (bit 0 = channel 1)."""
+        return self._state('do')
+
+    def status(self, channel: int):
+        """Return whether a relay channel is on (True) or off (False)."""
+        self._check_channel(channel)
+        return bool(self._state('do') & (1 << (channel - 1)))
+
+    def check_DI(self):
+        """Return the state of the digital inputs as a bitmask (bit 0 = DI1)."""
+        return self._state('di')
+
+    def read_DI(self):
+        """Same as check_DI(); lets a DISampler run on top of the broker."""
+        return self._state('di')
+
+    def is_DI_on(self, di_number: int) -> bool:
+        """Return True if the specified DI number (1-8) is ON, else False."""
+        if di_number < 1 or di_number > 8:
+            raise ValueError("DI number must be between 1 and 8")
+        return bool(self._state('di') & (1 << (di_number - 1)))
+
+    def DI_on_Relay(self, channel: int):
+        """Turn on the relay channel if the corresponding DI is ON, else off."""
+        self._check_channel(channel)
+        if self.is_DI_on(channel):
+            self.on(channel)
+        else:
+            self.off(channel)
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *args):
+        self.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Share one relay board connection between apps')
+    parser.add_argument('--host', default='192.168.1.254', help='relay board IP address')
+    parser.add_argument('--port', type=int, default=502, help='relay board TCP port')
+    parser.add_argument('--socket', default=None, help='Unix socket path (default: /tmp/relay_broker_<host>.sock)')
+    parser.add_argument('--interval', type=float, default=0.05, help='DI/DO poll interval in seconds')
+    parser.add_argument('--optimistic', action='store_true',
+                        help='skip the per-write status read; verify writes on the next poll')
+    args = parser.parse_args()
+
+    broker = RelayBroker(args.host, args.port, args.socket, args.interval, optimistic=args.optimistic)
+    broker.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopping relay broker")
+    finally:
+        broker.stop()
@@ -12,7 +12,7 @@ import os
 import json
 from threading import Thread, Lock
 from time import sleep
-from typing import List, Dict
+from typing import List, Dict, Optional
 from functools import partial
 from datetime import datetime
 
@@ -32,16 +32,52 @@ import matplotlib.dates as mdates
 from datetime import datetime as dt
 
 from relay_client import RelayClient
+from async_relay_client import AsyncRelayClient, AsyncRelayPoller, LoopRelayClient
+from command_dispatcher import PRIORITY_MANUAL, PRIORITY_SAFETY
+from poll_scheduler import AdaptivePollScheduler
+from relay_capture import CaptureWriter
+from event_log import EventLog
 
 
 # Configuration
+# Optional per-board 'protocol': 'tcp' selects Modbus TCP (MBAP, usually port 502)
+# so DI and DO reads are pipelined; the default 'rtu' is RTU over TCP
+# Optional 'poll_min_ms' / 'poll_max_ms' override the adaptive poll bounds
+# A board list written by relay_discovery.py (RELAY_BOARDS_FILE) replaces these
 RELAY_CONFIGS = [
     {'ip': '192.168.1.200', 'port': 4196, 'name': 'Table 1'},
     {'ip': '192.168.1.201', 'port': 4196, 'name': 'Table 2'},
     {'ip': '192.168.1.202', 'port': 4196, 'name': 'Table 3'},
     {'ip': '192.168.1.203', 'port': 4196, 'name': 'Table 4'},
 ]
-UPDATE_INTERVAL = int(os.getenv('UPDATE_INTERVAL', '500'))  # milliseconds
+RELAY_BOARDS_FILE = os.getenv('RELAY_BOARDS_FILE', 'relay_boards.json')
+EVENT_LOG_FILE = os.getenv('EVENT_LOG_FILE', 'pokayoke_events.log')
+
+# Sequence, alarm and poll threads log here instead of print(): a record is
+# one ring buffer store, and a writer thread echoes it to the console and
+# appends it to EVENT_LOG_FILE (rotated at 1 MB)
+event_log = EventLog(path=EVENT_LOG_FILE, echo=True)
+
+
+def load_relay_configs(default: List[Dict]) -> List[Dict]:
+    """Board list from RELAY_BOARDS_FILE, or default if there is none."""
+    try:
+        if os.path.exists(RELAY_BOARDS_FILE):
+            with open(RELAY_BOARDS_FILE, 'r') as f:
+                boards = [board for board in json.load(f).get('boards', []) if 'ip' in board and 'port' in board]
+            for number, board in enumerate(boards, 1):
+                board.setdefault('name', f"Table {number}")
+            if boards:
+                return boards
+    except Exception as e:
+        event_log.error(f"Error loading {RELAY_BOARDS_FILE}: {e}")
+    return default
+
+
+RELAY_CONFIGS = load_relay_configs(RELAY_CONFIGS)
+UPDATE_INTERVAL = int(os.getenv('UPDATE_INTERVAL', '500'))  # milliseconds, idle poll rate
+POLL_MIN_INTERVAL = int(os.getenv('POLL_MIN_INTERVAL', '20'))  # milliseconds, poll rate around activity
+CAPTURE_DIR = os.getenv('RELAY_CAPTURE_DIR')  # record each board's Modbus traffic here for relay_replay.py
 JOBS_FILE = 'job_sequences.json'
 ALARM_CONFIG_FILE = 'alarm_config.json'
 VACUUM_CONFIG_FILE = 'vacuum_config.json'
@@ -158,7 +194,9 @@ class StepSequenceExecutor:
 
     def __init__(self, relay_id: str, relay_client: RelayClient,
                  relay_states: Dict, signals: SequenceSignals, 
-                 step_configs: List[int], alarm_config: AlarmConfig, vacuum_config=None):
+                 step_configs: List[int], alarm_config: AlarmConfig, vacuum_config=None,
+                 poll_scheduler: Optional[AdaptivePollScheduler] = None,
+                 alarm_client: Optional[RelayClient] = None):
         """
         relay_id: IP address of relay
         relay_client: RelayClient instance
@@ -167,14 +205,18 @@ class StepSequenceExecutor:
         step_configs: List of BOX numbers (1-8) for each step (index 0 = step 1)
         alarm_config: AlarmConfig for unexpected DI detection
         vacuum_config: VacuumConfig to exclude vacuum DI from alarms
+        poll_scheduler: AdaptivePollScheduler of this relay; polled fast while waiting on a DI
+        alarm_client: client used for the alarm DO (safety priority); defaults to relay_client
         """
         self.relay_id = relay_id
         self.relay_client = relay_client
+        self.alarm_client = alarm_client or relay_client
         self.relay_states = relay_states
         self.signals = signals
         self.step_configs = step_configs
         self.alarm_config = alarm_config
         self.vacuum_config = vacuum_config
+        self.poll_scheduler = poll_scheduler
         self.current_step = 0
         self.running = False
         self.lock = Lock()
@@ -225,24 +267,24 @@ class StepSequenceExecutor:
         
         try:
             # Verify relay is connected
-            if not self.relay_client.is_connected():
-                print(f"[{self.relay_id}] Relay not connected, attempting to connect for alarm...")
-                if not self.relay_client.connect():
-                    print(f"[{self.relay_id}] Failed to connect relay for alarm")
+            if not self.alarm_client.is_connected():
+                event_log.log(f"[{self.relay_id}] Relay not connected, attempting to connect for alarm...")
+                if not self.alarm_client.connect():
+                    event_log.error(f"[{self.relay_id}] Failed to connect relay for alarm")
                     return
             
             alarm_channel = self.alarm_config.do_channel
-            print(f"[{self.relay_id}] Triggering alarm on DO{alarm_channel}")
+            event_log.log(f"[{self.relay_id}] Triggering alarm on DO{alarm_channel}")
             
             # Turn ON alarm DO and keep it ON until reset
-            success = self.relay_client.write_digital_output(alarm_channel, True)
+            success = self.alarm_client.write_digital_output(alarm_channel, True)
             if success:
-                print(f"[{self.relay_id}] A`larm on DO{alarm_channel} sent successfully")
+                event_log.log(f"[{self.relay_id}] A`larm on DO{alarm_channel} sent successfully")
             else:
-                print(f"[{self.relay_id}] Failed to set DO{alarm_channel} ON")
+                event_log.error(f"[{self.relay_id}] Failed to set DO{alarm_channel} ON")
             
         except Exception as e:
-            print(f"[{self.relay_id}] Error triggering alarm on DO{self.alarm_config.do_channel}: {e}")
+            event_log.error(f"[{self.relay_id}] Error triggering alarm on DO{self.alarm_config.do_channel}: {e}")
 
 
     def send_do_signal(self, box_num: int) -> bool:
@@ -254,7 +296,7 @@ class StepSequenceExecutor:
             sleep(0.1)
             return True
         except Exception as e:
-            print(f"Error sending DO signal for box {box_num}: {e}")
+            event_log.error(f"Error sending DO signal for box {box_num}: {e}")
             return False
 
     def turn_off_do(self, box_num: int) -> bool:
@@ -266,7 +308,7 @@ class StepSequenceExecutor:
             sleep(0.1)
             return True
         except Exception as e:
-            print(f"Error turning off DO for box {box_num}: {e}")
+            event_log.error(f"Error turning off DO for box {box_num}: {e}")
             return False
 
     def wait_for_di(self, box_num: int) -> bool:
@@ -274,24 +316,37 @@ class StepSequenceExecutor:
         if not (1 <= box_num <= NUM_INPUTS):
             return False
 
-        # Wait indefinitely for DI to turn ON
-        while True:
-            if box_num - 1 < len(self.relay_states.get('di', [])):
-                if self.relay_states['di'][box_num - 1]:
-                    return True
-            sleep(0.1)
+        # Wait for DI to turn ON until the executor is stopped
+        return self._wait_for_di_state(box_num, True)
 
     def wait_for_di_off(self, box_num: int) -> bool:
         """Wait for DI signal to turn OFF before proceeding to next step"""
         if not (1 <= box_num <= NUM_INPUTS):
             return False
 
-        # Wait indefinitely for DI to turn OFF
-        while True:
-            if box_num - 1 < len(self.relay_states.get('di', [])):
-                if not self.relay_states['di'][box_num - 1]:
-                    return True
-            sleep(0.1)
+        # Wait for DI to turn OFF until the executor is stopped
+        return self._wait_for_di_state(box_num, False)
+
+    def _wait_for_di_state(self, box_num: int, state: bool) -> bool:
+        """Block until DI box_num reads state, with the relay polled fast meanwhile.
+
+        Keeps waiting through relay disconnects (a single missed poll marks
+        the relay disconnected); returns False only if the executor is stopped.
+        """
+        interval = 0.1
+        if self.poll_scheduler:
+            self.poll_scheduler.begin_wait()
+            interval = self.poll_scheduler.min_interval
+        try:
+            while self.running:
+                if box_num - 1 < len(self.relay_states.get('di', [])):
+                    if self.relay_states['di'][box_num - 1] == state:
+                        return True
+                sleep(interval)
+            return False
+        finally:
+            if self.poll_scheduler:
+                self.poll_scheduler.end_wait()
 
     def run(self):
         """Execute the step sequence"""
@@ -331,6 +386,8 @@ class StepSequenceExecutor:
                         self.signals.step_status_changed.emit(self.relay_id, step_num, 'WAIT')
                         
                         if not self.wait_for_di(box_num):
+                            # Don't leave the box signalled while moving on
+                            self.turn_off_do(box_num)
                             self.step_status[step_num - 1] = 'ERROR'
                             self.signals.step_status_changed.emit(self.relay_id, step_num, 'ERROR')
                             continue
@@ -340,6 +397,7 @@ class StepSequenceExecutor:
                         self.signals.step_status_changed.emit(self.relay_id, step_num, 'WAIT_OFF')
                         
                         if not self.wait_for_di_off(box_num):
+                            self.turn_off_do(box_num)
                             self.step_status[step_num - 1] = 'ERROR'
                             self.signals.step_status_changed.emit(self.relay_id, step_num, 'ERROR')
                             continue
@@ -358,17 +416,18 @@ class StepSequenceExecutor:
                         self.signals.step_status_changed.emit(self.relay_id, step_num, 'OK')
                         
                     except Exception as e:
-                        print(f"Step {step_num} error: {e}")
+                        event_log.error(f"Step {step_num} error: {e}")
+                        self.turn_off_do(box_num)
                         self.step_status[step_num - 1] = 'ERROR'
                         self.signals.step_status_changed.emit(self.relay_id, step_num, 'ERROR')
 
                     sleep(0.5)
 
                 # Sequence loop completed
-                print(f"[{self.relay_id}] Sequence loop completed")
+                event_log.log(f"[{self.relay_id}] Sequence loop completed")
 
         except Exception as e:
-            print(f"Execution error: {e}")
+            event_log.error(f"Execution error: {e}")
             self.signals.sequence_error.emit(self.relay_id, str(e))
         finally:
             with self.lock:
@@ -404,7 +463,7 @@ class JobManager:
                 json.dump(jobs, f, indent=2)
             return True
         except Exception as e:
-            print(f"Error saving job: {e}")
+            event_log.error(f"Error saving job: {e}")
             return False
 
     @staticmethod
@@ -418,7 +477,7 @@ class JobManager:
                         if job_data['job_name'] == job_name:
                             return JobSequence.from_dict(job_data)
         except Exception as e:
-            print(f"Error loading job: {e}")
+            event_log.error(f"Error loading job: {e}")
         return None
 
     @staticmethod
@@ -430,7 +489,7 @@ class JobManager:
                     jobs = json.load(f)
                     return [j['job_name'] for j in jobs]
         except Exception as e:
-            print(f"Error listing jobs: {e}")
+            event_log.error(f"Error listing jobs: {e}")
         return []
 
 
@@ -452,7 +511,7 @@ class AlarmManager:
                 json.dump(configs, f, indent=2)
             return True
         except Exception as e:
-            print(f"Error saving alarm config: {e}")
+            event_log.error(f"Error saving alarm config: {e}")
             return False
 
     @staticmethod
@@ -465,7 +524,7 @@ class AlarmManager:
                     if relay_id in configs:
                         return AlarmConfig.from_dict(configs[relay_id])
         except Exception as e:
-            print(f"Error loading alarm config: {e}")
+            event_log.error(f"Error loading alarm config: {e}")
         return AlarmConfig(relay_id=relay_id)
 
 
@@ -487,7 +546,7 @@ class VacuumManager:
                 json.dump(configs, f, indent=2)
             return True
         except Exception as e:
-            print(f"Error saving vacuum config: {e}")
+            event_log.error(f"Error saving vacuum config: {e}")
             return False
 
     @staticmethod
@@ -500,7 +559,7 @@ class VacuumManager:
                     if relay_id in configs:
                         return VacuumConfig.from_dict(configs[relay_id])
         except Exception as e:
-            print(f"Error loading vacuum config: {e}")
+            event_log.error(f"Error loading vacuum config: {e}")
         return VacuumConfig(relay_id=relay_id)
 
 
@@ -650,13 +709,17 @@ class PokayokeTableWindow(QMainWindow):
         self.setGeometry(100, 100, 1400, 900)
 
         # Initialize relay clients
-        self.relay_clients = {}
+        self.relay_clients = {}  # sequence-priority clients
+        self.safety_clients = {}  # alarm outputs, dispatched before everything else
+        self.manual_clients = {}  # operator buttons, after sequence writes
         self.relay_signals = {}
         self.relay_states = {}
         self.sequence_signals = SequenceSignals()
         self.sequence_executors = {}
         self.alarm_configs = {}
-        self.polling_threads = {}
+        self.async_clients = {}
+        self.poller = None
+        self.poll_schedulers = {}
         self.polling_active = False
         self.active_alarms = {}  # Track which relays have active alarms
         
@@ -681,9 +744,29 @@ class PokayokeTableWindow(QMainWindow):
             relay_id = config['ip']
             self.graph_cycle_times[relay_id] = {'timestamps': [], 'durations': []}
 
+        # One asyncio loop thread polls every relay; other threads reach the
+        # same connections through LoopRelayClient
+        for config in RELAY_CONFIGS:
+            relay_id = config['ip']
+            self.async_clients[relay_id] = AsyncRelayClient(
+                config['ip'], config['port'], protocol=config.get('protocol', 'rtu'))
+            if CAPTURE_DIR:
+                os.makedirs(CAPTURE_DIR, exist_ok=True)
+                path = os.path.join(CAPTURE_DIR, f"{relay_id}_{datetime.now():%Y%m%d_%H%M%S}.rcap")
+                self.async_clients[relay_id].capture = CaptureWriter(path, f"{config['ip']}:{config['port']}")
+            # Poll fast while a sequence waits on a DI or inputs just changed,
+            # back off to UPDATE_INTERVAL when the table is idle
+            self.poll_schedulers[relay_id] = AdaptivePollScheduler(
+                config.get('poll_min_ms', POLL_MIN_INTERVAL) / 1000.0,
+                config.get('poll_max_ms', max(UPDATE_INTERVAL, POLL_MIN_INTERVAL)) / 1000.0)
+        self.poller = AsyncRelayPoller(self.async_clients, self._on_poll_result, UPDATE_INTERVAL,
+                                       schedulers=self.poll_schedulers)
+
         for config in RELAY_CONFIGS:
             relay_id = config['ip']
-            self.relay_clients[relay_id] = RelayClient(config['ip'], config['port'])
+            self.relay_clients[relay_id] = LoopRelayClient(self.poller, self.async_clients[relay_id])
+            self.safety_clients[relay_id] = self.relay_clients[relay_id].with_priority(PRIORITY_SAFETY)
+            self.manual_clients[relay_id] = self.relay_clients[relay_id].with_priority(PRIORITY_MANUAL)
             self.relay_signals[relay_id] = RelaySignals()
             self.relay_states[relay_id] = {
                 'di': [False] * NUM_INPUTS,
@@ -773,7 +856,7 @@ class PokayokeTableWindow(QMainWindow):
         legend_layout.addWidget(QLabel("Legend:"))
         for idx, config in enumerate(RELAY_CONFIGS):
             color_box = QLabel("■")
-            color_box.setStyleSheet(f"color: {self.graph_colors[idx]}; font-size: 16px;")
+            color_box.setStyleSheet(f"color: {self.graph_colors[idx % len(self.graph_colors)]}; font-size: 16px;")
             legend_layout.addWidget(color_box)
             legend_layout.addWidget(QLabel(config['name']))
         legend_layout.addStretch()
@@ -820,7 +903,7 @@ class PokayokeTableWindow(QMainWindow):
                         marker='o',
                         linestyle='-',
                         linewidth=2,
-                        color=self.graph_colors[idx],
+                        color=self.graph_colors[idx % len(self.graph_colors)],
                         label=relay_name,
                         markersize=6
                     )
@@ -973,8 +1056,8 @@ class PokayokeTableWindow(QMainWindow):
                 executor = self.sequence_executors.get(relay_id)
                 if executor and executor.alarm_config.do_channel > 0:
                     do_channel = executor.alarm_config.do_channel
-                    self.relay_clients[relay_id].write_digital_output(do_channel, False)
-                    print(f"[{relay_id}] Alarm reset - DO{do_channel} turned OFF")
+                    self.manual_clients[relay_id].write_digital_output(do_channel, False)
+                    event_log.log(f"[{relay_id}] Alarm reset - DO{do_channel} turned OFF")
                     
                     # Update UI
                     self.active_alarms[relay_id] = False
@@ -984,7 +1067,7 @@ class PokayokeTableWindow(QMainWindow):
                     
                     QMessageBox.information(self, "Success", f"Alarm reset for {relay_name}")
             except Exception as e:
-                print(f"Error resetting alarm: {e}")
+                event_log.error(f"Error resetting alarm: {e}")
                 QMessageBox.critical(self, "Error", f"Failed to reset alarm: {e}")
 
     def setup_monitor_tab(self):
@@ -1023,7 +1106,9 @@ class PokayokeTableWindow(QMainWindow):
                 self.sequence_signals,
                 step_configs,
                 self.alarm_configs[relay_id],
-                self.vacuum_configs[relay_id] if relay_id in self.vacuum_configs else None
+                self.vacuum_configs[relay_id] if relay_id in self.vacuum_configs else None,
+                self.poll_schedulers[relay_id],
+                self.safety_clients[relay_id]
             )
             self.sequence_executors[relay_id] = executor
 
@@ -1261,7 +1346,7 @@ class PokayokeTableWindow(QMainWindow):
             AlarmManager.save_alarm_config(relay_id, self.alarm_configs[relay_id])
             if relay_id in self.sequence_executors:
                 self.sequence_executors[relay_id].alarm_config = self.alarm_configs[relay_id]
-            print(f"[{relay_id}] Alarm enabled: {enabled}")
+            event_log.log(f"[{relay_id}] Alarm enabled: {enabled}")
 
     def on_alarm_do_changed(self, relay_id: str, value):
         """Handle alarm DO channel change"""
@@ -1271,7 +1356,7 @@ class PokayokeTableWindow(QMainWindow):
             AlarmManager.save_alarm_config(relay_id, self.alarm_configs[relay_id])
             if relay_id in self.sequence_executors:
                 self.sequence_executors[relay_id].alarm_config = self.alarm_configs[relay_id]
-            print(f"[{relay_id}] Alarm DO set to: {do_channel}")
+            event_log.log(f"[{relay_id}] Alarm DO set to: {do_channel}")
 
     def on_vacuum_do_changed(self, relay_id: str, index):
         """Handle vacuum DO channel change"""
@@ -1279,7 +1364,7 @@ class PokayokeTableWindow(QMainWindow):
             do_channel = self.vacuum_widgets[relay_id]['do_combo'].currentIndex()
             self.vacuum_configs[relay_id].do_channel = do_channel
             VacuumManager.save_vacuum_config(relay_id, self.vacuum_configs[relay_id])
-            print(f"[{relay_id}] Vacuum DO set to: DO{do_channel}")
+            event_log.log(f"[{relay_id}] Vacuum DO set to: DO{do_channel}")
 
     def on_vacuum_di_changed(self, relay_id: str, index):
         """Handle vacuum DI channel change"""
@@ -1287,7 +1372,7 @@ class PokayokeTableWindow(QMainWindow):
             di_channel = self.vacuum_widgets[relay_id]['di_combo'].currentIndex()
             self.vacuum_configs[relay_id].di_channel = di_channel
             VacuumManager.save_vacuum_config(relay_id, self.vacuum_configs[relay_id])
-            print(f"[{relay_id}] Vacuum DI set to: DI{di_channel}")
+            event_log.log(f"[{relay_id}] Vacuum DI set to: DI{di_channel}")
 
     def refresh_job_list(self):
         """Refresh job combo box"""
@@ -1354,7 +1439,7 @@ class PokayokeTableWindow(QMainWindow):
                 executor = self.sequence_executors[relay_id]
                 executor.set_step_config(step_num, box_num)
         except Exception as e:
-            print(f"Error setting box config: {e}")
+            event_log.error(f"Error setting box config: {e}")
 
     def on_start_sequence(self, relay_id: str):
         """Start the sequence for relay"""
@@ -1376,7 +1461,7 @@ class PokayokeTableWindow(QMainWindow):
         
         thread = Thread(target=executor.run, daemon=True)
         thread.start()
-        print(f"[{relay_id}] Sequence started")
+        event_log.log(f"[{relay_id}] Sequence started")
 
     def on_stop_sequence(self, relay_id: str):
         """Stop the sequence for relay"""
@@ -1392,7 +1477,7 @@ class PokayokeTableWindow(QMainWindow):
                 # Restore Start button to default color
                 self.cycle_time_buttons[relay_id]['start'].setStyleSheet("")
             
-            print(f"[{relay_id}] Sequence stopped")
+            event_log.log(f"[{relay_id}] Sequence stopped")
 
     def on_reset_table(self, relay_id: str):
         """Reset all BOX selections for a table"""
@@ -1510,7 +1595,7 @@ class PokayokeTableWindow(QMainWindow):
         if relay_id in self.relay_states:
             self.relay_states[relay_id]['connected'] = connected
             status = "Connected ✓" if connected else "Disconnected ✗"
-            print(f"[{relay_id}] {status}")
+            event_log.log(f"[{relay_id}] {status}")
             # Update manual tab
             self.on_manual_connection_status_changed(relay_id, connected)
 
@@ -1535,7 +1620,7 @@ class PokayokeTableWindow(QMainWindow):
                     self.cycle_timer.timeout.connect(self._update_cycle_times)
                     self.cycle_timer.start(100)  # Update every 100ms
                 
-                print(f"[{relay_id}] Cycle started at Step 1")
+                event_log.log(f"[{relay_id}] Cycle started at Step 1")
         
         # Detect if this is the last configured step
         executor = self.sequence_executors.get(relay_id)
@@ -1563,9 +1648,9 @@ class PokayokeTableWindow(QMainWindow):
                     if vacuum_config.do_channel > 0:
                         try:
                             self.relay_clients[relay_id].write_digital_output(vacuum_config.do_channel, False)
-                            print(f"[{relay_id}] Cycle completed - Vacuum DO{vacuum_config.do_channel} turned OFF")
+                            event_log.log(f"[{relay_id}] Cycle completed - Vacuum DO{vacuum_config.do_channel} turned OFF")
                         except Exception as e:
-                            print(f"[{relay_id}] Error turning off vacuum DO: {e}")
+                            event_log.error(f"[{relay_id}] Error turning off vacuum DO: {e}")
                 
                 # Increment cycle counter
                 self.cycle_count[relay_id] = self.cycle_count.get(relay_id, 0) + 1
@@ -1595,7 +1680,7 @@ class PokayokeTableWindow(QMainWindow):
                     self.graph_cycle_times[relay_id]['durations'].append(cycle_time)
                     self.update_graph()
                 
-                print(f"[{relay_id}] Cycle completed at Step {last_configured_step}. Total cycles: {self.cycle_count[relay_id]}, Avg time: {avg_time_str}")        
+                event_log.log(f"[{relay_id}] Cycle completed at Step {last_configured_step}. Total cycles: {self.cycle_count[relay_id]}, Avg time: {avg_time_str}")
         # Update step status display
         if row < table.rowCount():
             item = table.item(row, 1)
@@ -1632,7 +1717,7 @@ class PokayokeTableWindow(QMainWindow):
         if alarm_config and alarm_config.enabled and alarm_config.do_channel > 0:
             alarm_info = f"Alarm sent to DO{alarm_config.do_channel}"
         
-        print(f"[{relay_id}] Unexpected DI detected on channel DI{di_channel} - {alarm_info}")
+        event_log.log(f"[{relay_id}] Unexpected DI detected on channel DI{di_channel} - {alarm_info}")
         
         # Switch to Alarm tab automatically
         alarm_tab_index = self.tab_widget.indexOf(self.alarm_widget)
@@ -1665,13 +1750,13 @@ class PokayokeTableWindow(QMainWindow):
             try:
                 success = self.relay_clients[relay_id].write_digital_output(do_channel, True)
                 if success:
-                    print(f"[{relay_id}] Vacuum auto-control: DI{vacuum_config.di_channel} detected → DO{do_channel} activated")
+                    event_log.log(f"[{relay_id}] Vacuum auto-control: DI{vacuum_config.di_channel} detected → DO{do_channel} activated")
                     
                     # Auto-start sequence when vacuum DO is triggered
                     if relay_id in self.sequence_executors:
                         executor = self.sequence_executors[relay_id]
                         if not executor.running:
-                            print(f"[{relay_id}] Auto-starting sequence from vacuum trigger")
+                            event_log.log(f"[{relay_id}] Auto-starting sequence from vacuum trigger")
                             self.on_start_sequence(relay_id)
                             
                             # Verify step 1 starts within 2 seconds
@@ -1682,21 +1767,21 @@ class PokayokeTableWindow(QMainWindow):
                                     executor = self.sequence_executors[relay_id]
                                     # Check if step 1 has started (should be in SIGNAL or later)
                                     if executor.current_step < 1:
-                                        print(f"[{relay_id}] ⚠️ WARNING: Vacuum triggered but Step 1 did not start!")
+                                        event_log.warning(f"[{relay_id}] Vacuum triggered but Step 1 did not start!")
                                         # Switch to job change tab to see the issue
                                         if hasattr(self, 'tab_widget'):
                                             tab_index = self.tab_widget.indexOf(self.job_change_widget)
                                             if tab_index >= 0:
                                                 self.tab_widget.setCurrentIndex(tab_index)
                                     else:
-                                        print(f"[{relay_id}] ✓ Step 1 started successfully (Step {executor.current_step})")
+                                        event_log.log(f"[{relay_id}] ✓ Step 1 started successfully (Step {executor.current_step})")
                             
                             verification_thread = Thread(target=verify_step1_started, daemon=True)
                             verification_thread.start()
                 else:
-                    print(f"[{relay_id}] Failed to activate vacuum DO{do_channel}")
+                    event_log.error(f"[{relay_id}] Failed to activate vacuum DO{do_channel}")
             except Exception as e:
-                print(f"[{relay_id}] Error in vacuum auto-control: {e}")
+                event_log.error(f"[{relay_id}] Error in vacuum auto-control: {e}")
         
         # Update previous state for next iteration
         self.vacuum_di_previous_state[relay_id] = current_di_state
@@ -1717,13 +1802,13 @@ class PokayokeTableWindow(QMainWindow):
     def _write_relay_manual(self, relay_id: str, channel: int, value: bool):
         """Write relay state in manual mode"""
         try:
-            success = self.relay_clients[relay_id].write_digital_output(channel, value)
+            success = self.manual_clients[relay_id].write_digital_output(channel, value)
             if success:
-                print(f"[{relay_id}] Manual control: CH{channel} set to {'ON' if value else 'OFF'}")
+                event_log.log(f"[{relay_id}] Manual control: CH{channel} set to {'ON' if value else 'OFF'}")
             else:
-                print(f"[{relay_id}] Failed to set CH{channel}")
+                event_log.error(f"[{relay_id}] Failed to set CH{channel}")
         except Exception as e:
-            print(f"[{relay_id}] Error in manual control: {e}")
+            event_log.error(f"[{relay_id}] Error in manual control: {e}")
 
     def on_manual_di_updated(self, relay_id: str, states: List[bool]):
         """Update manual tab DI display"""
@@ -1769,60 +1854,41 @@ class PokayokeTableWindow(QMainWindow):
                 label.setStyleSheet("color: red; font-weight: bold;")
 
     def start_polling(self):
-        """Start polling threads"""
+        """Start polling all relays from the shared asyncio poller"""
         self.polling_active = True
-        for relay_id in self.relay_clients.keys():
-            thread = Thread(target=self._polling_loop, args=(relay_id,), daemon=True)
-            self.polling_threads[relay_id] = thread
-            thread.start()
-
-    def _polling_loop(self, relay_id: str):
-        """Main polling loop for relay"""
-        while self.polling_active:
-            try:
-                client = self.relay_clients[relay_id]
-                signals = self.relay_signals[relay_id]
-                was_connected = self.relay_states[relay_id]['connected']
-
-                if not client.is_connected():
-                    if was_connected:
-                        signals.connection_status_changed.emit(relay_id, False)
-                    if not client.connect():
-                        sleep(UPDATE_INTERVAL / 1000.0)
-                        continue
+        self.poller.start()
 
-                di_states = client.read_digital_inputs()
-                if di_states:
-                    signals.di_updated.emit(relay_id, di_states)
-                else:
-                    if was_connected:
-                        signals.connection_status_changed.emit(relay_id, False)
+    def _on_poll_result(self, relay_id: str, di_states, do_states):
+        """Publish one relay's poll result (called from the poller thread)"""
+        signals = self.relay_signals[relay_id]
+        was_connected = self.relay_states[relay_id]['connected']
 
-                do_states = client.read_digital_outputs()
-                if do_states:
-                    signals.do_updated.emit(relay_id, do_states)
-                    if not was_connected:
-                        signals.connection_status_changed.emit(relay_id, True)
+        if di_states:
+            signals.di_updated.emit(relay_id, di_states)
+        elif was_connected:
+            signals.connection_status_changed.emit(relay_id, False)
 
-                sleep(UPDATE_INTERVAL / 1000.0)
-
-            except Exception as e:
-                print(f"Polling error for {relay_id}: {e}")
-                if relay_id in self.relay_clients:
-                    self.relay_clients[relay_id].disconnect()
-                sleep(UPDATE_INTERVAL / 1000.0)
+        if do_states:
+            signals.do_updated.emit(relay_id, do_states)
+            if not was_connected:
+                signals.connection_status_changed.emit(relay_id, True)
 
     def closeEvent(self, event):
         """Handle window close"""
         self.polling_active = False
         for executor in self.sequence_executors.values():
             executor.stop()
-        for relay_id in self.relay_clients.keys():
-            self.relay_clients[relay_id].disconnect()
+        self.poller.stop()
+        for relay_id, client in self.async_clients.items():
+            event_log.log(f"[{relay_id}] Command latency: {client.dispatcher.format_stats()}")
+            if client.capture:
+                client.capture.close()
+        event_log.close()
         event.accept()
 
 
 def main():
+    event_log.start()
     app = QApplication(sys.argv)
     window = PokayokeTableWindow()
     window.show()
@@ -1834,6 +1900,7 @@ if __name__ == "__main__":
 
 
 def main():
+    event_log.start()
     app = QApplication(sys.argv)
     window = PokayokeTableWindow()
     window.show()
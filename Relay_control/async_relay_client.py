@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+asyncio Modbus relay client and multi-board poller
+Same read/write surface as RelayClient, but every board is served from a
+single event loop thread instead of one polling thread per board.
+With protocol='tcp' (Modbus TCP, port 502) requests are tagged with MBAP
+transaction ids and may be in flight concurrently on one connection.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from command_dispatcher import PRIORITY_POLL, PRIORITY_SEQUENCE, CommandDispatcher
+from poll_scheduler import AdaptivePollScheduler
+from relay_capture import REQUEST, RESPONSE
+from relay_client import (EXCEPTION_RESPONSE_LENGTH, MBAP_HEADER_LENGTH, check_crc,
+                          mbap_header, modbus_crc)
+
+
+class AsyncRelayClient:
+    """Waveshare Modbus POE ETH relay board client for asyncio."""
+
+    def __init__(self, host='192.168.1.200', port=4196, address=0x01, timeout=2.0,
+                 protocol='rtu', queue_limits: Optional[Dict[int, int]] = None):
+        if protocol not in ('rtu', 'tcp'):
+            raise ValueError(f"Unknown protocol {protocol!r}, must be 'rtu' or 'tcp'")
+        self.host = host
+        self.port = port
+        self.address = address
+        self.timeout = timeout
+        self.protocol = protocol
+        self.reader = None
+        self.writer = None
+        self.connected = False
+        self.channels = range(1, 9)  # 8 relay channels
+        # RTU framing has no transaction id, so only one request may be in
+        # flight per connection; the dispatcher runs them by priority class
+        self.dispatcher = CommandDispatcher(serial=(protocol == 'rtu'), limits=queue_limits)
+        # Concurrent first requests must share one connection attempt
+        self.connect_lock = asyncio.Lock()
+        # Modbus TCP: outstanding requests by transaction id, resolved by
+        # the reader task in whatever order the board answers
+        self.transaction_id = 0
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.reader_task = None
+        # relay_capture.CaptureWriter recording every request and response
+        self.capture = None
+
+    async def connect(self) -> bool:
+        """Connect to the relay device."""
+        async with self.connect_lock:
+            return await self._connect()
+
+    async def _connect(self) -> bool:
+        try:
+            if self.writer:
+                return True
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout)
+            self.connected = True
+            if self.protocol == 'tcp':
+                self.reader_task = asyncio.ensure_future(self._read_mbap(self.reader))
+            print(f"Connected to relay at {self.host}:{self.port}")
+            return True
+        except Exception as e:
+            print(f"Connection failed ({self.host}): {e}")
+            self.reader = self.writer = None
+            self.connected = False
+            return False
+
+    async def disconnect(self):
+        """Disconnect from the relay device."""
+        writer = self.writer
+        self.reader = self.writer = None
+        self.connected = False
+        if self.reader_task:
+            self.reader_task.cancel()
+            self.reader_task = None
+        self._fail_pending(ConnectionResetError("Disconnected"))
+        if writer:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception as e:
+                print(f"Disconnect error: {e}")
+
+    async def _send_command(self, cmd: List[int], response_length: int,
+                            priority: int = PRIORITY_POLL) -> Optional[bytes]:
+        """Send a command and read exactly one response frame.
+
+        The request waits in the dispatcher queue of its priority class;
+        None is returned on failure or if that queue is full.
+        """
+        if self.protocol == 'tcp':
+            return await self.dispatcher.run(priority, lambda: self._send_mbap(cmd))
+        return await self.dispatcher.run(priority, lambda: self._send_rtu(cmd, response_length))
+
+    async def _send_rtu(self, cmd: List[int], response_length: int) -> Optional[bytes]:
+        """Send an RTU frame and read its response (caller holds the dispatcher turn)."""
+        try:
+            if not self.writer or not self.connected:
+                if not await self.connect():
+                    return None
+
+            if self.capture:
+                self.capture.record(REQUEST, cmd)
+            crc = modbus_crc(cmd)
+            cmd.append(crc & 0xFF)
+            cmd.append(crc >> 8)
+            self.writer.write(bytes(cmd))
+            await self.writer.drain()
+
+            header = await asyncio.wait_for(self.reader.readexactly(2), self.timeout)
+            length = EXCEPTION_RESPONSE_LENGTH if header[1] & 0x80 else response_length
+            body = await asyncio.wait_for(self.reader.readexactly(length - 2), self.timeout)
+            response = header + body
+            if not check_crc(response):
+                raise ValueError(f"CRC mismatch in response: {response.hex()}")
+            if self.capture:
+                self.capture.record(RESPONSE, response[:-2])
+            return response
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, OSError) as e:
+            print(f"Connection error ({self.host}, {type(e).__name__}): {e}")
+            await self.disconnect()
+            return None
+        except Exception as e:
+            print(f"Command error ({self.host}): {e}")
+            await self.disconnect()
+            return None
+
+    async def _send_mbap(self, cmd: List[int]) -> Optional[bytes]:
+        """Send a Modbus TCP request and await the response with its transaction id.
+
+        No lock is taken: any number of requests may be outstanding. The
+        response is returned as [unit, function, data...] so callers index
+        it exactly like an RTU frame.
+        """
+        transaction_id = None
+        try:
+            if not self.writer or not self.connected:
+                if not await self.connect():
+                    return None
+
+            self.transaction_id = (self.transaction_id + 1) & 0xFFFF
+            transaction_id = self.transaction_id
+            future = asyncio.get_running_loop().create_future()
+            self.pending[transaction_id] = future
+            self.writer.write(mbap_header(transaction_id, cmd) + bytes(cmd))
+            if self.capture:
+                self.capture.record(REQUEST, cmd, transaction_id)
+            await self.writer.drain()
+            response = await asyncio.wait_for(future, self.timeout)
+            if self.capture:
+                self.capture.record(RESPONSE, response, transaction_id)
+            return response
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, OSError) as e:
+            print(f"Connection error ({self.host}, {type(e).__name__}): {e}")
+            await self.disconnect()
+            return None
+        except Exception as e:
+            print(f"Command error ({self.host}): {e}")
+            await self.disconnect()
+            return None
+        finally:
+            self.pending.pop(transaction_id, None)
+
+    async def _read_mbap(self, reader: asyncio.StreamReader):
+        """Reader task: route each Modbus TCP response to its waiting request."""
+        try:
+            while True:
+                header = await reader.readexactly(MBAP_HEADER_LENGTH)
+                transaction_id = (header[0] << 8) | header[1]
+                length = (header[4] << 8) | header[5]
+                if length < 2:
+                    raise ValueError(f"Invalid MBAP length {length}")
+                body = await reader.readexactly(length - 1)
+                future = self.pending.get(transaction_id)
+                if future is None or future.done():
+                    print(f"Discarding stale response for transaction {transaction_id} ({self.host})")
+                    continue
+                future.set_result(header[6:] + body)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._fail_pending(ConnectionResetError(f"{type(e).__name__}: {e}"))
+
+    def _fail_pending(self, error: Exception):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def read_digital_inputs(self, priority: int = PRIORITY_POLL) -> Optional[List[bool]]:
+        """Read all 8 digital inputs (DI1-DI8)."""
+        response = await self._send_command([0x01, 0x02, 0x00, 0x00, 0x00, 0x08], 6, priority)
+        if not response or len(response) < 4 or response[1] != 0x02:
+            return None
+        return [(response[3] >> i) & 1 for i in range(8)]
+
+    async def read_digital_outputs(self, priority: int = PRIORITY_POLL) -> Optional[List[bool]]:
+        """Read all 8 relay channels (DO1-DO8)."""
+        response = await self._send_command([0x01, 0x01, 0x00, 0x00, 0x00, 0x08], 6, priority)
+        if not response or len(response) < 4 or response[1] != 0x01:
+            return None
+        return [(response[3] >> i) & 1 for i in range(8)]
+
+    async def write_digital_output(self, channel: int, value: bool,
+                                   priority: int = PRIORITY_SEQUENCE) -> bool:
+        """Turn a single relay channel on/off.
+
+        Args:
+            channel: Channel number (1-8)
+            value: True to turn on, False to turn off
+            priority: dispatcher class (PRIORITY_SAFETY for alarm outputs)
+        """
+        if channel < 1 or channel > 8:
+            print(f"Invalid channel {channel}, must be 1-8")
+            return False
+
+        coil_value = 0xFF00 if value else 0x0000
+        cmd = [0x01, 0x05, 0x00, channel - 1, coil_value >> 8, coil_value & 0xFF]
+        response = await self._send_command(cmd[:], 8, priority)
+        if not response or len(response) < 6:
+            return False
+        if list(response[:6]) != cmd:
+            print(f"Response mismatch. Expected: {cmd}, got: {response[:6].hex()}")
+            return False
+        return True
+
+    def is_connected(self) -> bool:
+        """Check if connected to relay."""
+        return self.connected and self.writer is not None
+
+
+class AsyncRelayPoller:
+    """Polls every board concurrently from one asyncio loop in one thread.
+
+    on_update(relay_id, di_states, do_states) is called from the loop thread
+    after each board is read; a None state means that read failed. Qt signals
+    emitted from it are queued to the GUI thread as usual.
+
+    Each board is polled on its own schedule: pass an AdaptivePollScheduler
+    per relay_id in schedulers to poll fast around activity and slowly when
+    idle; boards without one are polled every interval_ms.
+    """
+
+    def __init__(self, clients: Dict[str, AsyncRelayClient],
+                 on_update: Callable[[str, Optional[List[bool]], Optional[List[bool]]], None],
+                 interval_ms: int = 500,
+                 schedulers: Optional[Dict[str, AdaptivePollScheduler]] = None):
+        self.clients = clients
+        self.on_update = on_update
+        self.interval = interval_ms / 1000.0
+        self.schedulers = dict(schedulers or {})
+        for relay_id in clients:
+            if relay_id not in self.schedulers:
+                self.schedulers[relay_id] = AdaptivePollScheduler(self.interval, self.interval)
+        self.loop = asyncio.new_event_loop()
+        self.thread = None
+        self.task = None
+        self.running = False
+        self.wake_events: Dict[str, asyncio.Event] = {}
+
+    def start(self):
+        """Start the event loop thread and the polling task."""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop polling and close every connection."""
+        if not self.running:
+            return
+        self.running = False
+        future = asyncio.run_coroutine_threadsafe(self._close_all(), self.loop)
+        try:
+            future.result(timeout=5.0)
+        except Exception as e:
+            print(f"Poller shutdown error: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5.0)
+
+    def call(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the poller loop from another thread and wait for it."""
+        if not self.running:
+            raise RuntimeError("AsyncRelayPoller is not running")
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("AsyncRelayPoller.call() cannot be used from the poller thread")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.task = self.loop.create_task(self._poll_forever())
+        self.loop.run_forever()
+
+    async def _poll_forever(self):
+        for relay_id, scheduler in self.schedulers.items():
+            event = asyncio.Event()
+            self.wake_events[relay_id] = event
+            scheduler.on_wake = lambda event=event: self.loop.call_soon_threadsafe(event.set)
+        await asyncio.gather(*(self._poll_board(relay_id) for relay_id in self.clients))
+
+    async def _poll_board(self, relay_id: str):
+        scheduler = self.schedulers[relay_id]
+        wake = self.wake_events[relay_id]
+        while self.running:
+            started = time.monotonic()
+            di_states = await self._poll_one(relay_id)
+            interval = scheduler.next_interval(tuple(di_states) if di_states else None)
+            wake.clear()
+            try:
+                await asyncio.wait_for(wake.wait(), max(0.0, interval - (time.monotonic() - started)))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll_one(self, relay_id: str) -> Optional[List[bool]]:
+        client = self.clients[relay_id]
+        try:
+            if not client.is_connected() and not await client.connect():
+                self.on_update(relay_id, None, None)
+                return None
+            # Issued together: over Modbus TCP both reads are in flight at
+            # once, over RTU the dispatcher serialises them behind any writes
+            di_states, do_states = await asyncio.gather(
+                client.read_digital_inputs(), client.read_digital_outputs())
+            self.on_update(relay_id, di_states, do_states)
+            return di_states
+        except Exception as e:
+            print(f"Polling error for {relay_id}: {e}")
+            await client.disconnect()
+            return None
+
+    async def _close_all(self):
+        if self.task:
+            self.task.cancel()
+        await asyncio.gather(*(client.disconnect() for client in self.clients.values()))
+
+
+class LoopRelayClient:
+    """Blocking RelayClient-compatible wrapper around an AsyncRelayClient.
+
+    Calls are executed on the poller's event loop, so sequence executors,
+    alarms and manual writes share the board connection with the poller
+    instead of opening their own socket. Writes are dispatched at this
+    wrapper's priority class; use with_priority() for alarm or manual views.
+    """
+
+    def __init__(self, poller: AsyncRelayPoller, client: AsyncRelayClient, timeout: float = 5.0,
+                 priority: int = PRIORITY_SEQUENCE):
+        self.poller = poller
+        self.client = client
+        self.timeout = timeout
+        self.priority = priority
+        self.host = client.host
+        self.port = client.port
+        self.channels = client.channels
+
+    def connect(self) -> bool:
+        return self.poller.call(self.client.connect(), self.timeout)
+
+    def disconnect(self):
+        if self.poller.running:
+            self.poller.call(self.client.disconnect(), self.timeout)
+
+    def with_priority(self, priority: int) -> 'LoopRelayClient':
+        """Return a wrapper for the same board that dispatches at another priority class."""
+        return LoopRelayClient(self.poller, self.client, self.timeout, priority)
+
+    def read_digital_inputs(self) -> Optional[List[bool]]:
+        return self.poller.call(self.client.read_digital_inputs(self.priority), self.timeout)
+
+    def read_digital_outputs(self) -> Optional[List[bool]]:
+        return self.poller.call(self.client.read_digital_outputs(self.priority), self.timeout)
+
+    def write_digital_output(self, channel: int, value: bool) -> bool:
+        return self.poller.call(self.client.write_digital_output(channel, value, self.priority),
+                                self.timeout)
+
+    def is_connected(self) -> bool:
+        return self.client.is_connected()
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *args):
+        self.disconnect()
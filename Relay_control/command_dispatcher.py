@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Priority command dispatcher for one relay board
+Requests to a board are run one at a time, safety writes first, then sequence
+writes, manual writes and finally polling reads, so an alarm output never
+waits behind a queue of polls. Each class has a bounded queue and its own
+latency statistics.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+# Priority classes, most urgent first
+PRIORITY_SAFETY = 0    # alarm / safety outputs
+PRIORITY_SEQUENCE = 1  # sequence step and automation writes
+PRIORITY_MANUAL = 2    # operator buttons
+PRIORITY_POLL = 3      # periodic DI/DO reads
+
+PRIORITY_NAMES = {
+    PRIORITY_SAFETY: 'safety',
+    PRIORITY_SEQUENCE: 'sequence',
+    PRIORITY_MANUAL: 'manual',
+    PRIORITY_POLL: 'poll',
+}
+
+# Requests that may wait per class; further requests are rejected
+DEFAULT_QUEUE_LIMITS = {
+    PRIORITY_SAFETY: 16,
+    PRIORITY_SEQUENCE: 32,
+    PRIORITY_MANUAL: 16,
+    PRIORITY_POLL: 4,
+}
+
+
+class CommandDispatcher:
+    """Serialises the requests of one board by priority class.
+
+    Runs on the event loop of the board's client: run() waits until no
+    request of a higher class is queued and the board is free, then awaits
+    the request. With serial=False (Modbus TCP, where requests are matched
+    by transaction id) requests are not serialised and only latency is
+    recorded.
+
+    Latency is measured from run() to the response, so it includes the
+    time spent queued behind other requests.
+    """
+
+    def __init__(self, serial: bool = True, limits: Optional[Dict[int, int]] = None,
+                 history: int = 1000):
+        self.serial = serial
+        self.limits = dict(DEFAULT_QUEUE_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        self.queues = {priority: deque() for priority in PRIORITY_NAMES}
+        self.busy = False
+        self.latency = {priority: deque(maxlen=history) for priority in PRIORITY_NAMES}
+        self.completed = {priority: 0 for priority in PRIORITY_NAMES}
+        self.rejected = {priority: 0 for priority in PRIORITY_NAMES}
+
+    async def run(self, priority: int, request: Callable[[], Awaitable]):
+        """Await request() when it is this class's turn and return its result.
+
+        Returns None without running the request if the class's queue is full.
+        """
+        if priority not in self.queues:
+            raise ValueError(f"Unknown priority class {priority}")
+        queued = time.monotonic()
+        if self.serial:
+            if not await self._acquire(priority):
+                return None
+        try:
+            return await request()
+        finally:
+            self.latency[priority].append(time.monotonic() - queued)
+            self.completed[priority] += 1
+            if self.serial:
+                self._release()
+
+    async def _acquire(self, priority: int) -> bool:
+        if not self.busy and not any(self.queues.values()):
+            self.busy = True
+            return True
+        queue = self.queues[priority]
+        if len(queue) >= self.limits[priority]:
+            self.rejected[priority] += 1
+            print(f"Dropping {PRIORITY_NAMES[priority]} request: {len(queue)} already queued")
+            return False
+        turn = asyncio.get_running_loop().create_future()
+        queue.append(turn)
+        try:
+            await turn
+        except asyncio.CancelledError:
+            if turn.done() and not turn.cancelled():
+                # Cancelled after being handed the board: pass it on
+                self._release()
+            elif turn in queue:
+                queue.remove(turn)
+            raise
+        return True
+
+    def _release(self):
+        """Hand the board to the oldest request of the most urgent class."""
+        for priority in sorted(self.queues):
+            queue = self.queues[priority]
+            while queue:
+                turn = queue.popleft()
+                if not turn.done():
+                    turn.set_result(None)
+                    return
+        self.busy = False
+
+    def queued(self) -> Dict[str, int]:
+        """Number of requests waiting per class."""
+        return {PRIORITY_NAMES[priority]: len(queue) for priority, queue in self.queues.items()}
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-class count, rejections and latency percentiles in milliseconds."""
+        result = {}
+        for priority, name in PRIORITY_NAMES.items():
+            samples = sorted(self.latency[priority])
+            entry = {'count': self.completed[priority], 'rejected': self.rejected[priority]}
+            if samples:
+                def rank(p):
+                    return samples[min(len(samples) - 1, int(p / 100.0 * len(samples)))] * 1000.0
+                entry.update({'p50_ms': rank(50), 'p99_ms': rank(99), 'max_ms': samples[-1] * 1000.0})
+            result[name] = entry
+        return result
+
+    def format_stats(self) -> str:
+        """One-line summary of stats() for logging."""
+        parts = []
+        for name, entry in self.stats().items():
+            if 'p50_ms' in entry:
+                parts.append(f"{name} n={entry['count']} p50={entry['p50_ms']:.1f}ms "
+                             f"p99={entry['p99_ms']:.1f}ms max={entry['max_ms']:.1f}ms")
+            else:
+                parts.append(f"{name} n=0")
+            if entry['rejected']:
+                parts[-1] += f" rejected={entry['rejected']}"
+        return ", ".join(parts)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Adaptive poll interval for one relay board
+Polls fast while something is waiting on a DI or a DI changed recently, and
+backs off towards a slow idle rate when the board is quiet.
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+
+class AdaptivePollScheduler:
+    """Chooses the delay before the next poll of one board.
+
+    The interval is min_interval while a sequence is waiting on a DI and for
+    `hold` seconds after the last DI change. Otherwise it grows by `backoff`
+    per poll up to max_interval. A pending timer deadline caps the interval
+    so timed outputs are not handled late.
+    """
+
+    def __init__(self, min_interval: float = 0.02, max_interval: float = 0.5,
+                 hold: float = 2.0, backoff: float = 1.5,
+                 clock: Callable[[], float] = time.monotonic):
+        self.lock = threading.Lock()
+        self.hold = hold
+        self.backoff = backoff
+        self.clock = clock
+        self.set_bounds(min_interval, max_interval)
+        self.interval = self.min_interval
+        self.last_state = None
+        self.last_change = clock()  # start fast after (re)connect
+        self.waiters = 0
+        # Called from the thread that requests fast polling, so the poller
+        # can cut its current (possibly long) sleep short
+        self.on_wake: Optional[Callable[[], None]] = None
+
+    def set_bounds(self, min_interval: float, max_interval: float):
+        """Set the fastest and slowest poll interval in seconds."""
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError(f"Invalid poll bounds {min_interval}-{max_interval}s")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+    def begin_wait(self):
+        """A sequence started waiting on a DI: poll fast until end_wait()."""
+        with self.lock:
+            self.waiters += 1
+            self.interval = self.min_interval
+        self.wake()
+
+    def end_wait(self):
+        """A sequence stopped waiting on a DI."""
+        with self.lock:
+            self.waiters = max(0, self.waiters - 1)
+
+    def wake(self):
+        """Ask the poller to poll now instead of finishing its current sleep."""
+        if self.on_wake:
+            self.on_wake()
+
+    def next_interval(self, state=None, waiting: bool = False,
+                      until_deadline: Optional[float] = None) -> float:
+        """Return the delay in seconds before the next poll.
+
+        Args:
+            state: DI state from the poll just done (any comparable value);
+                None if the poll failed.
+            waiting: the caller is waiting on a DI (in addition to begin_wait()).
+            until_deadline: seconds until the next timer is due, if any.
+        """
+        now = self.clock()
+        with self.lock:
+            if state is not None and state != self.last_state:
+                if self.last_state is not None:
+                    self.last_change = now
+                self.last_state = state
+
+            if waiting or self.waiters or now - self.last_change < self.hold:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.max_interval, self.interval * self.backoff)
+
+            if until_deadline is not None:
+                return max(self.min_interval, min(self.interval, until_deadline))
+            return self.interval
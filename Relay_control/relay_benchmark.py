@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Relay I/O benchmark suite
+Measures per-operation latency, the maximum poll rate of one board and how
+aggregate poll throughput scales from 1 to N boards for the threaded,
+batched and async clients. Results are printed and written to JSON so runs
+can be compared between releases.
+
+Against the local simulator (default):
+    python3 relay_benchmark.py --boards 1,4,16,50 --rtt 2 --output bench.json
+
+Against real boards (writes toggle relay channel 8 unless --no-writes):
+    python3 relay_benchmark.py --hosts 192.168.1.200,192.168.1.201 --port 4196
+
+Clients compared in the scaling run:
+    threaded  one thread per board, RelayClient DI read then DO read
+    batched   one thread per board, RelayClient.read_io() (pipelined over Modbus TCP)
+    async     AsyncRelayClient for every board gathered on one event loop
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from typing import Callable, Dict, List
+
+from async_relay_client import AsyncRelayClient
+from relay_client import RelayClient
+from relay_simulator import RelaySimulator
+
+# relay_b.Relay and IOSnapshot live with the sequence controller
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'relay-sequence-controller', 'src'))
+from relay_b import Relay  # noqa: E402
+from models.io_snapshot import IOSnapshot  # noqa: E402
+
+WRITE_CHANNEL = 8
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Summarise latencies (seconds) as milliseconds: mean, p50, p90, p99, max."""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))] * 1000.0
+
+    return {
+        'count': len(ordered),
+        'mean_ms': sum(ordered) / len(ordered) * 1000.0,
+        'p50_ms': rank(50),
+        'p90_ms': rank(90),
+        'p99_ms': rank(99),
+        'max_ms': ordered[-1] * 1000.0,
+    }
+
+
+def time_operation(operation: Callable[[], object], iterations: int) -> Dict[str, float]:
+    """Run operation repeatedly and return its latency percentiles."""
+    operation()  # warm up the connection
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def bench_latency(host: str, port: int, protocol: str, iterations: int, writes: bool) -> Dict[str, dict]:
+    """Latency of single operations on one board."""
+    results = {}
+
+    client = RelayClient(host, port, protocol=protocol)
+    client.connect()
+    results['RelayClient.read_digital_inputs'] = time_operation(client.read_digital_inputs, iterations)
+    results['RelayClient.read_io'] = time_operation(client.read_io, iterations)
+    client.disconnect()
+
+    if protocol == 'rtu':
+        relay = Relay(host, port)
+        relay.connect()
+        relay.sock.settimeout(2.0)
+        # update_status reads one IOSnapshot per tick
+        results['update_status tick (IOSnapshot.read)'] = time_operation(
+            lambda: IOSnapshot.read(relay), iterations)
+        if writes:
+            toggle = [False]
+
+            def on_off():
+                toggle[0] = not toggle[0]
+                (relay.on if toggle[0] else relay.off)(WRITE_CHANNEL)
+
+            results['Relay.on/off (with status verify)'] = time_operation(on_off, iterations)
+            relay.optimistic = True
+            results['Relay.on/off (optimistic)'] = time_operation(on_off, iterations)
+            relay.optimistic = False
+            relay.verify_pending()
+            results['Relay.set_outputs'] = time_operation(
+                lambda: relay.set_outputs(0x00, 1 << (WRITE_CHANNEL - 1)), iterations)
+        relay.disconnect()
+    return results
+
+
+def bench_poll_rate(host: str, port: int, protocol: str, duration: float) -> Dict[str, float]:
+    """Back-to-back DI+DO polls of one board: the ceiling on its poll frequency."""
+    client = RelayClient(host, port, protocol=protocol)
+    client.connect()
+    polls = failures = 0
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        di_states, do_states = client.read_io()
+        if di_states is None or do_states is None:
+            failures += 1
+        else:
+            polls += 1
+    elapsed = time.perf_counter() - started
+    client.disconnect()
+    return {'polls': polls, 'failures': failures, 'max_poll_hz': polls / elapsed}
+
+
+def _poll_threads(targets, poll_one: Callable[[RelayClient], bool], protocol: str,
+                  duration: float) -> Dict[str, float]:
+    counts = [0] * len(targets)
+    failures = [0] * len(targets)
+    stop = threading.Event()
+
+    def worker(index, host, port):
+        client = RelayClient(host, port, protocol=protocol)
+        client.connect()
+        while not stop.is_set():
+            if poll_one(client):
+                counts[index] += 1
+            else:
+                failures[index] += 1
+        client.disconnect()
+
+    threads = [threading.Thread(target=worker, args=(i, host, port), daemon=True)
+               for i, (host, port) in enumerate(targets)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {'polls': sum(counts), 'failures': sum(failures), 'polls_per_s': sum(counts) / elapsed}
+
+
+def _threaded_poll(client: RelayClient) -> bool:
+    return client.read_digital_inputs() is not None and client.read_digital_outputs() is not None
+
+
+def _batched_poll(client: RelayClient) -> bool:
+    di_states, do_states = client.read_io()
+    return di_states is not None and do_states is not None
+
+
+def _async_poll(targets, protocol: str, duration: float) -> Dict[str, float]:
+    async def run():
+        clients = [AsyncRelayClient(host, port, protocol=protocol) for host, port in targets]
+        await asyncio.gather(*(client.connect() for client in clients))
+        counts = [0, 0]  # polls, failures
+        deadline = time.perf_counter() + duration
+
+        async def poll_board(client):
+            while time.perf_counter() < deadline:
+                di_states, do_states = await asyncio.gather(
+                    client.read_digital_inputs(), client.read_digital_outputs())
+                counts[0 if di_states is not None and do_states is not None else 1] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(poll_board(client) for client in clients))
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*(client.disconnect() for client in clients))
+        return {'polls': counts[0], 'failures': counts[1], 'polls_per_s': counts[0] / elapsed}
+
+    return asyncio.run(run())
+
+
+def bench_scaling(targets, board_counts: List[int], protocol: str, duration: float) -> Dict[str, list]:
+    """Aggregate DI+DO polls per second for 1..N boards and each client variant."""
+    results = {'threaded': [], 'batched': [], 'async': []}
+    for count in board_counts:
+        subset = targets[:count]
+        for variant, result in (
+                ('threaded', lambda: _poll_threads(subset, _threaded_poll, protocol, duration)),
+                ('batched', lambda: _poll_threads(subset, _batched_poll, protocol, duration)),
+                ('async', lambda: _async_poll(subset, protocol, duration))):
+            entry = result()
+            entry['boards'] = count
+            results[variant].append(entry)
+            print(f"  {variant:8s} {count:3d} board(s): {entry['polls_per_s']:8.1f} polls/s "
+                  f"({entry['failures']} failed)")
+    return results
+
+
+def print_latency(results: Dict[str, dict]):
+    for name, stats in results.items():
+        print(f"  {name:40s} p50 {stats['p50_ms']:7.3f} ms  p90 {stats['p90_ms']:7.3f} ms  "
+              f"p99 {stats['p99_ms']:7.3f} ms  max {stats['max_ms']:7.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark relay board I/O')
+    parser.add_argument('--hosts', help='comma-separated board IPs (default: local simulator)')
+    parser.add_argument('--port', type=int, default=4196, help='board TCP port')
+    parser.add_argument('--protocol', choices=('rtu', 'tcp'), default='rtu', help='RTU over TCP or Modbus TCP')
+    parser.add_argument('--boards', default='1,2,4,8,16',
+                        help='comma-separated board counts for the scaling run')
+    parser.add_argument('--iterations', type=int, default=500, help='samples per latency measurement')
+    parser.add_argument('--duration', type=float, default=2.0, help='seconds per throughput measurement')
+    parser.add_argument('--rtt', type=float, default=0.0, help='simulator reply delay in milliseconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='simulator +/- jitter in milliseconds')
+    parser.add_argument('--no-writes', action='store_true', help='skip relay write benchmarks')
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    board_counts = [int(count) for count in args.boards.split(',')]
+    simulator = None
+    if args.hosts:
+        targets = [(host, args.port) for host in args.hosts.split(',')]
+        board_counts = [count for count in board_counts if count <= len(targets)] or [len(targets)]
+    else:
+        simulator = RelaySimulator(max(board_counts), protocol=args.protocol,
+                                   rtt=args.rtt / 1000.0, jitter=args.jitter / 1000.0)
+        simulator.start()
+        targets = [('127.0.0.1', port) for port in simulator.ports]
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'target': 'simulator' if simulator else 'hardware',
+        'protocol': args.protocol,
+        'simulator_rtt_ms': args.rtt if simulator else None,
+        'simulator_jitter_ms': args.jitter if simulator else None,
+    }
+    try:
+        host, port = targets[0]
+        print(f"Latency ({host}:{port}, {args.iterations} samples)")
+        results['latency'] = bench_latency(host, port, args.protocol, args.iterations, not args.no_writes)
+        print_latency(results['latency'])
+
+        print(f"Maximum poll rate ({args.duration}s)")
+        results['poll_rate'] = bench_poll_rate(host, port, args.protocol, args.duration)
+        print(f"  {results['poll_rate']['max_poll_hz']:.1f} DI+DO polls/s")
+
+        print(f"Scaling ({args.duration}s per run)")
+        results['scaling'] = bench_scaling(targets, board_counts, args.protocol, args.duration)
+    finally:
+        if simulator:
+            simulator.stop()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
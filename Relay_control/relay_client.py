@@ -8,70 +8,182 @@ import socket
 import time
 from typing import Optional, List
 
+from relay_capture import REQUEST, RESPONSE
+
+
+# CRC lookup tables
+CRC_TABLE_HIGH = [
+    0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81,
+    0x40, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0,
+    0x80, 0x41, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81, 0x40, 0x01,
+    0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x01, 0xC0, 0x80, 0x41,
+    0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81,
+    0x40, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x01, 0xC0,
+    0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x01,
+    0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40,
+    0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81,
+    0x40, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0,
+    0x80, 0x41, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81, 0x40, 0x01,
+    0xC0, 0x80, 0x41, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41,
+    0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81,
+    0x40, 0x01, 0xC0, 0x80, 0x41, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0,
+    0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x01,
+    0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41,
+    0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81,
+    0x40
+]
+
+CRC_TABLE_LOW = [
+    0x00, 0xC0, 0xC1, 0x01, 0xC3, 0x03, 0x02, 0xC2, 0xC6, 0x06, 0x07, 0xC7, 0x05, 0xC5, 0xC4,
+    0x04, 0xCC, 0x0C, 0x0D, 0xCD, 0x0F, 0xCF, 0xCE, 0x0E, 0x0A, 0xCA, 0xCB, 0x0B, 0xC9, 0x09,
+    0x08, 0xC8, 0xD8, 0x18, 0x19, 0xD9, 0x1B, 0xDB, 0xDA, 0x1A, 0x1E, 0xDE, 0xDF, 0x1F, 0xDD,
+    0x1D, 0x1C, 0xDC, 0x14, 0xD4, 0xD5, 0x15, 0xD7, 0x17, 0x16, 0xD6, 0xD2, 0x12, 0x13, 0xD3,
+    0x11, 0xD1, 0xD0, 0x10, 0xF0, 0x30, 0x31, 0xF1, 0x33, 0xF3, 0xF2, 0x32, 0x36, 0xF6, 0xF7,
+    0x37, 0xF5, 0x35, 0x34, 0xF4, 0x3C, 0xFC, 0xFD, 0x3D, 0xFF, 0x3F, 0x3E, 0xFE, 0xFA, 0x3A,
+    0x3B, 0xFB, 0x39, 0xF9, 0xF8, 0x38, 0x28, 0xE8, 0xE9, 0x29, 0xEB, 0x2B, 0x2A, 0xEA, 0xEE,
+    0x2E, 0x2F, 0xEF, 0x2D, 0xED, 0xEC, 0x2C, 0xE4, 0x24, 0x25, 0xE5, 0x27, 0xE7, 0xE6, 0x26,
+    0x22, 0xE2, 0xE3, 0x23, 0xE1, 0x21, 0x20, 0xE0, 0xA0, 0x60, 0x61, 0xA1, 0x63, 0xA3, 0xA2,
+    0x62, 0x66, 0xA6, 0xA7, 0x67, 0xA5, 0x65, 0x64, 0xA4, 0x6C, 0xAC, 0xAD, 0x6D, 0xAF, 0x6F,
+    0x6E, 0xAE, 0xAA, 0x6A, 0x6B, 0xAB, 0x69, 0xA9, 0xA8, 0x68, 0x78, 0xB8, 0xB9, 0x79, 0xBB,
+    0x7B, 0x7A, 0xBA, 0xBE, 0x7E, 0x7F, 0xBF, 0x7D, 0xBD, 0xBC, 0x7C, 0xB4, 0x74, 0x75, 0xB5,
+    0x77, 0xB7, 0xB6, 0x76, 0x72, 0xB2, 0xB3, 0x73, 0xB1, 0x71, 0x70, 0xB0, 0x50, 0x90, 0x91,
+    0x51, 0x93, 0x53, 0x52, 0x92, 0x96, 0x56, 0x57, 0x97, 0x55, 0x95, 0x94, 0x54, 0x9C, 0x5C,
+    0x5D, 0x9D, 0x5F, 0x9F, 0x9E, 0x5E, 0x5A, 0x9A, 0x9B, 0x5B, 0x99, 0x59, 0x58, 0x98, 0x88,
+    0x48, 0x49, 0x89, 0x4B, 0x8B, 0x8A, 0x4A, 0x4E, 0x8E, 0x8F, 0x4F, 0x8D, 0x4D, 0x4C, 0x8C,
+    0x44, 0x84, 0x85, 0x45, 0x87, 0x47, 0x46, 0x86, 0x82, 0x42, 0x43, 0x83, 0x41, 0x81, 0x80,
+    0x40
+]
+
+
+def modbus_crc(data) -> int:
+    """Calculate modbus CRC value."""
+    crc_high = 0xff
+    crc_low = 0xff
+    for byte in data:
+        index = crc_low ^ byte
+        crc_low = crc_high ^ CRC_TABLE_HIGH[index]
+        crc_high = CRC_TABLE_LOW[index]
+    return (crc_high << 8 | crc_low)
+
+
+# Largest Modbus RTU frame (address + PDU + CRC)
+MAX_FRAME_LENGTH = 256
+MBAP_HEADER_LENGTH = 7
+# Exception response: address, function | 0x80, exception code, CRC
+EXCEPTION_RESPONSE_LENGTH = 5
+
+
+def response_length(request) -> int:
+    """Return the expected length (including CRC) of the response to a request.
+
+    Read Coils/Discrete Inputs answer with one bit per coil, Read Registers
+    with two bytes per register, and every write function echoes the
+    address, function code and the first four request data bytes.
+    """
+    function_code = request[1]
+    if function_code in (0x01, 0x02):
+        quantity = request[4] << 8 | request[5]
+        return 5 + (quantity + 7) // 8
+    if function_code in (0x03, 0x04):
+        quantity = request[4] << 8 | request[5]
+        return 5 + 2 * quantity
+    return 8
+
+
+def check_crc(frame) -> bool:
+    """Return True if the last two bytes of a frame hold its Modbus CRC."""
+    crc = modbus_crc(frame[:-2])
+    return frame[-2] == crc & 0xFF and frame[-1] == crc >> 8
+
+
+def recv_exact(sock, view, length: int):
+    """Fill view[:length] from a socket, looping over partial segments."""
+    received = 0
+    while received < length:
+        count = sock.recv_into(view[received:length], length - received)
+        if count == 0:
+            raise ConnectionResetError("Connection closed by relay")
+        received += count
+
+
+def recv_frame(sock, view, expected_length: int) -> int:
+    """Receive exactly one response frame into view and validate its CRC.
+
+    Only the bytes of one frame are consumed, so a response split over
+    several TCP segments, or coalesced with the next one, stays in sync.
+    Returns the frame length (expected_length, or 5 for an exception
+    response).
+    """
+    recv_exact(sock, view, 2)
+    length = EXCEPTION_RESPONSE_LENGTH if view[1] & 0x80 else expected_length
+    recv_exact(sock, view[2:], length - 2)
+    if not check_crc(view[:length]):
+        raise ValueError(f"CRC mismatch in response: {view[:length].hex()}")
+    return length
+
+
+def mbap_header(transaction_id: int, cmd) -> bytes:
+    """Build the 7-byte Modbus TCP (MBAP) header for an RTU-style command.
+
+    cmd is [unit, function, data...] without CRC; the MBAP length field
+    counts the unit id plus the PDU, i.e. len(cmd).
+    """
+    return bytes([transaction_id >> 8, transaction_id & 0xFF, 0x00, 0x00,
+                  len(cmd) >> 8, len(cmd) & 0xFF])
+
+
+def recv_mbap(sock, view) -> tuple:
+    """Receive exactly one Modbus TCP response into view.
+
+    Returns (transaction_id, length). The unit id and PDU are left at
+    view[6:6 + length], laid out like an RTU frame without its CRC, so
+    response[1] is the function code and response[3] the first data byte.
+    """
+    recv_exact(sock, view, MBAP_HEADER_LENGTH)
+    length = (view[4] << 8) | view[5]
+    if length < 2 or length > MAX_FRAME_LENGTH - 6:
+        raise ValueError(f"Invalid MBAP length {length}")
+    recv_exact(sock, view[MBAP_HEADER_LENGTH:], length - 1)
+    return (view[0] << 8) | view[1], length
+
 
 class RelayClient:
-    """Waveshare Modbus POE ETH relay board client."""
+    """Waveshare Modbus POE ETH relay board client.
+
+    protocol='rtu' speaks Modbus RTU over TCP (the board default, port
+    4196); protocol='tcp' speaks Modbus TCP with MBAP headers (port 502),
+    where each request carries a transaction id and several may be in
+    flight at once (see read_io()).
+    """
     
-    def __init__(self, host='192.168.1.200', port=4196, address=0x01):
+    def __init__(self, host='192.168.1.200', port=4196, address=0x01, protocol='rtu'):
+        if protocol not in ('rtu', 'tcp'):
+            raise ValueError(f"Unknown protocol {protocol!r}, must be 'rtu' or 'tcp'")
         self.host = host
         self.port = port
         self.address = address
+        self.protocol = protocol
+        self.transaction_id = 0
         self.sock = None
         self.connected = False
         self.channels = range(1, 9)  # 8 relay channels
 
         # CRC lookup tables
-        self.CRCTableHigh = [
-            0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81,
-            0x40, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0,
-            0x80, 0x41, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81, 0x40, 0x01,
-            0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x01, 0xC0, 0x80, 0x41,
-            0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81,
-            0x40, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x01, 0xC0,
-            0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x01,
-            0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40,
-            0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81,
-            0x40, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0,
-            0x80, 0x41, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81, 0x40, 0x01,
-            0xC0, 0x80, 0x41, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41,
-            0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81,
-            0x40, 0x01, 0xC0, 0x80, 0x41, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0,
-            0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x01,
-            0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81, 0x40, 0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41,
-            0x00, 0xC1, 0x81, 0x40, 0x01, 0xC0, 0x80, 0x41, 0x01, 0xC0, 0x80, 0x41, 0x00, 0xC1, 0x81,
-            0x40
-        ]
-
-        self.CRCTableLow = [
-            0x00, 0xC0, 0xC1, 0x01, 0xC3, 0x03, 0x02, 0xC2, 0xC6, 0x06, 0x07, 0xC7, 0x05, 0xC5, 0xC4,
-            0x04, 0xCC, 0x0C, 0x0D, 0xCD, 0x0F, 0xCF, 0xCE, 0x0E, 0x0A, 0xCA, 0xCB, 0x0B, 0xC9, 0x09,
-            0x08, 0xC8, 0xD8, 0x18, 0x19, 0xD9, 0x1B, 0xDB, 0xDA, 0x1A, 0x1E, 0xDE, 0xDF, 0x1F, 0xDD,
-            0x1D, 0x1C, 0xDC, 0x14, 0xD4, 0xD5, 0x15, 0xD7, 0x17, 0x16, 0xD6, 0xD2, 0x12, 0x13, 0xD3,
-            0x11, 0xD1, 0xD0, 0x10, 0xF0, 0x30, 0x31, 0xF1, 0x33, 0xF3, 0xF2, 0x32, 0x36, 0xF6, 0xF7,
-            0x37, 0xF5, 0x35, 0x34, 0xF4, 0x3C, 0xFC, 0xFD, 0x3D, 0xFF, 0x3F, 0x3E, 0xFE, 0xFA, 0x3A,
-            0x3B, 0xFB, 0x39, 0xF9, 0xF8, 0x38, 0x28, 0xE8, 0xE9, 0x29, 0xEB, 0x2B, 0x2A, 0xEA, 0xEE,
-            0x2E, 0x2F, 0xEF, 0x2D, 0xED, 0xEC, 0x2C, 0xE4, 0x24, 0x25, 0xE5, 0x27, 0xE7, 0xE6, 0x26,
-            0x22, 0xE2, 0xE3, 0x23, 0xE1, 0x21, 0x20, 0xE0, 0xA0, 0x60, 0x61, 0xA1, 0x63, 0xA3, 0xA2,
-            0x62, 0x66, 0xA6, 0xA7, 0x67, 0xA5, 0x65, 0x64, 0xA4, 0x6C, 0xAC, 0xAD, 0x6D, 0xAF, 0x6F,
-            0x6E, 0xAE, 0xAA, 0x6A, 0x6B, 0xAB, 0x69, 0xA9, 0xA8, 0x68, 0x78, 0xB8, 0xB9, 0x79, 0xBB,
-            0x7B, 0x7A, 0xBA, 0xBE, 0x7E, 0x7F, 0xBF, 0x7D, 0xBD, 0xBC, 0x7C, 0xB4, 0x74, 0x75, 0xB5,
-            0x77, 0xB7, 0xB6, 0x76, 0x72, 0xB2, 0xB3, 0x73, 0xB1, 0x71, 0x70, 0xB0, 0x50, 0x90, 0x91,
-            0x51, 0x93, 0x53, 0x52, 0x92, 0x96, 0x56, 0x57, 0x97, 0x55, 0x95, 0x94, 0x54, 0x9C, 0x5C,
-            0x5D, 0x9D, 0x5F, 0x9F, 0x9E, 0x5E, 0x5A, 0x9A, 0x9B, 0x5B, 0x99, 0x59, 0x58, 0x98, 0x88,
-            0x48, 0x49, 0x89, 0x4B, 0x8B, 0x8A, 0x4A, 0x4E, 0x8E, 0x8F, 0x4F, 0x8D, 0x4D, 0x4C, 0x8C,
-            0x44, 0x84, 0x85, 0x45, 0x87, 0x47, 0x46, 0x86, 0x82, 0x42, 0x43, 0x83, 0x41, 0x81, 0x80,
-            0x40
-        ]
+        self.CRCTableHigh = CRC_TABLE_HIGH
+        self.CRCTableLow = CRC_TABLE_LOW
+
+        # Frame buffers reused by every command
+        self._tx = bytearray(MAX_FRAME_LENGTH)
+        self._tx_view = memoryview(self._tx)
+        self._rx = bytearray(MAX_FRAME_LENGTH)
+        self._rx_view = memoryview(self._rx)
+
+        # relay_capture.CaptureWriter recording every request and response
+        self.capture = None
 
     def modbus_crc(self, data):
         """Calculate modbus CRC value."""
-        crc_high = 0xff
-        crc_low = 0xff
-        for byte in data:
-            index = crc_low ^ byte
-            crc_low = crc_high ^ self.CRCTableHigh[index]
-            crc_high = self.CRCTableLow[index]
-        return (crc_high << 8 | crc_low)
+        return modbus_crc(data)
 
     def connect(self) -> bool:
         """Connect to the relay device."""
@@ -99,24 +211,37 @@ class RelayClient:
         except Exception as e:
             print(f"Disconnect error: {e}")
 
-    def _send_command(self, cmd: List[int]) -> Optional[bytes]:
-        """Send a command and receive response."""
+    def _send_command(self, cmd: List[int]) -> Optional[memoryview]:
+        """Send a command and receive exactly one response frame.
+
+        The returned view points into a buffer reused by the next command,
+        so callers must read it before sending another one.
+        """
         try:
             if not self.sock or not self.connected:
                 if not self.connect():
                     return None
 
-            # Calculate CRC
-            crc = self.modbus_crc(cmd)
-            cmd.append(crc & 0xFF)
-            cmd.append(crc >> 8)
+            if self.protocol == 'tcp':
+                return self._send_mbap(cmd)
+
+            # Build frame with CRC in the send buffer
+            length = len(cmd)
+            self._tx[:length] = bytes(cmd)
+            crc = modbus_crc(self._tx_view[:length])
+            self._tx[length] = crc & 0xFF
+            self._tx[length + 1] = crc >> 8
 
             # Send command
-            self.sock.send(bytearray(cmd))
+            self.sock.sendall(self._tx_view[:length + 2])
+            if self.capture:
+                self.capture.record(REQUEST, cmd)
 
             # Receive response
-            response = self.sock.recv(1024)
-            return response
+            received = recv_frame(self.sock, self._rx_view, response_length(cmd))
+            if self.capture:
+                self.capture.record(RESPONSE, self._rx_view[:received - 2])
+            return self._rx_view[:received]
         except (socket.timeout, BrokenPipeError, ConnectionResetError, OSError) as e:
             error_type = type(e).__name__
             print(f"Connection error ({error_type}): {e}")
@@ -129,13 +254,102 @@ class RelayClient:
             self.disconnect()
             return None
 
+    def _next_transaction_id(self) -> int:
+        self.transaction_id = (self.transaction_id + 1) & 0xFFFF
+        return self.transaction_id
+
+    def _send_mbap(self, cmd: List[int]) -> memoryview:
+        """Send one Modbus TCP request and wait for the matching response."""
+        transaction_id = self._next_transaction_id()
+        self._tx[:6] = mbap_header(transaction_id, cmd)
+        self._tx[6:6 + len(cmd)] = bytes(cmd)
+        self.sock.sendall(self._tx_view[:6 + len(cmd)])
+        if self.capture:
+            self.capture.record(REQUEST, cmd, transaction_id)
+
+        while True:
+            received_id, length = recv_mbap(self.sock, self._rx_view)
+            if received_id == transaction_id:
+                if self.capture:
+                    self.capture.record(RESPONSE, self._rx_view[6:6 + length], transaction_id)
+                return self._rx_view[6:6 + length]
+            # Late answer to a request that already timed out; skip it
+            print(f"Discarding stale response for transaction {received_id}")
+
+    def _send_pipelined(self, cmds: List[List[int]]) -> List[Optional[bytes]]:
+        """Send several commands and collect their responses in request order.
+
+        Over Modbus TCP all requests go out in one write and the responses
+        are matched by transaction id, whatever order they arrive in, so the
+        batch costs about one round trip. Over RTU they are sent one by one.
+        """
+        if self.protocol != 'tcp':
+            results = []
+            for cmd in cmds:
+                response = self._send_command(cmd)
+                results.append(bytes(response) if response is not None else None)
+            return results
+
+        try:
+            if not self.sock or not self.connected:
+                if not self.connect():
+                    return [None] * len(cmds)
+
+            pending = {}
+            frames = bytearray()
+            for index, cmd in enumerate(cmds):
+                transaction_id = self._next_transaction_id()
+                pending[transaction_id] = index
+                frames += mbap_header(transaction_id, cmd)
+                frames += bytes(cmd)
+            self.sock.sendall(frames)
+            if self.capture:
+                for transaction_id, index in pending.items():
+                    self.capture.record(REQUEST, cmds[index], transaction_id)
+
+            results = [None] * len(cmds)
+            while pending:
+                received_id, length = recv_mbap(self.sock, self._rx_view)
+                index = pending.pop(received_id, None)
+                if index is None:
+                    print(f"Discarding stale response for transaction {received_id}")
+                    continue
+                results[index] = bytes(self._rx_view[6:6 + length])
+                if self.capture:
+                    self.capture.record(RESPONSE, results[index], received_id)
+            return results
+        except (socket.timeout, BrokenPipeError, ConnectionResetError, OSError) as e:
+            print(f"Connection error ({type(e).__name__}): {e}")
+            self.disconnect()
+            return [None] * len(cmds)
+        except Exception as e:
+            print(f"Command error: {e}")
+            self.disconnect()
+            return [None] * len(cmds)
+
+    def read_io(self) -> tuple:
+        """Read the digital inputs and relay channels in one pipelined batch.
+
+        Returns (di_list, do_list); either is None if its read failed.
+        """
+        di_response, do_response = self._send_pipelined([
+            [0x01, 0x02, 0x00, 0x00, 0x00, 0x08],
+            [0x01, 0x01, 0x00, 0x00, 0x00, 0x08],
+        ])
+        di_list = do_list = None
+        if di_response and di_response[1] == 0x02:
+            di_list = [(di_response[3] >> i) & 1 for i in range(8)]
+        if do_response and do_response[1] == 0x01:
+            do_list = [(do_response[3] >> i) & 1 for i in range(8)]
+        return di_list, do_list
+
     def read_digital_inputs(self) -> Optional[List[bool]]:
         """Read all 8 digital inputs (DI1-DI8)."""
         try:
             cmd = [0x01, 0x02, 0x00, 0x00, 0x00, 0x08]
             response = self._send_command(cmd[:])
             
-            if not response or len(response) < 4:
+            if not response or response[1] != 0x02:
                 return None
 
             di_status = response[3]
@@ -152,7 +366,7 @@ class RelayClient:
             cmd = [0x01, 0x01, 0x00, 0x00, 0x00, 0x08]
             response = self._send_command(cmd[:])
             
-            if not response or len(response) < 4:
+            if not response or response[1] != 0x01:
                 return None
 
             do_status = response[3]
@@ -182,8 +396,8 @@ class RelayClient:
             cmd = [0x01, 0x05, 0x00, channel_idx, coil_value >> 8, coil_value & 0xFF]
             response = self._send_command(cmd[:])
             
-            if not response or len(response) < 8:
-                print(f"Invalid response length: {(response) if response else 0}")
+            if not response or len(response) < 6:
+                print(f"Invalid response length: {len(response) if response else 0}")
                 return False
 
             # Verify response echoes back the command (first 6 bytes before CRC)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Relay board discovery and health scan
+Probes every address of one or more networks on the relay ports (4196 RTU over
+TCP, 502 Modbus TCP) concurrently from one asyncio loop. An open port is only
+reported as a board once it answers a Read Discrete Inputs request; the
+framing that worked (RTU or Modbus TCP) is recorded with the DI read RTT.
+
+A /24 takes about one connect timeout: dead addresses all time out together.
+
+Example: scan the default subnet and write relay_boards.json for app_pokayoke
+    python3 relay_discovery.py 192.168.1.0/24
+Also point the sequence controller at the first RTU board found:
+    python3 relay_discovery.py 192.168.1.0/24 --controller-config
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from relay_client import MBAP_HEADER_LENGTH, check_crc, mbap_header, modbus_crc
+
+DEFAULT_PORTS = (4196, 502)
+DEFAULT_OUTPUT = 'relay_boards.json'
+CONTROLLER_CONFIG = Path.home() / '.relay_controller' / 'sequences.json'
+
+# Read Discrete Inputs DI1-DI8, the request every Waveshare board answers
+READ_DI = [0x01, 0x02, 0x00, 0x00, 0x00, 0x08]
+
+
+def protocol_order(port: int) -> List[str]:
+    """Framings to try on a port, most likely first."""
+    return ['tcp', 'rtu'] if port == 502 else ['rtu', 'tcp']
+
+
+async def read_di(reader, writer, protocol: str, timeout: float) -> int:
+    """Send one Read Discrete Inputs request and return the DI bitmask.
+
+    Raises ValueError if the reply is not a valid DI response.
+    """
+    if protocol == 'rtu':
+        crc = modbus_crc(READ_DI)
+        writer.write(bytes(READ_DI + [crc & 0xFF, crc >> 8]))
+        await writer.drain()
+        response = await asyncio.wait_for(reader.readexactly(6), timeout)
+        if not check_crc(response):
+            raise ValueError(f"CRC mismatch in response: {response.hex()}")
+    else:
+        writer.write(mbap_header(1, READ_DI) + bytes(READ_DI))
+        await writer.drain()
+        header = await asyncio.wait_for(reader.readexactly(MBAP_HEADER_LENGTH), timeout)
+        length = (header[4] << 8) | header[5]
+        if header[:4] != b'\x00\x01\x00\x00' or length != 4:
+            raise ValueError(f"Unexpected MBAP header: {header.hex()}")
+        response = header[6:] + await asyncio.wait_for(reader.readexactly(length - 1), timeout)
+    if response[1] != 0x02 or response[2] != 1:
+        raise ValueError(f"Not a DI response: {response.hex()}")
+    return response[3]
+
+
+async def open_port(host: str, port: int, timeout: float):
+    """Open a connection; returns (reader, writer, status) with status
+    'open', 'closed' (refused: the host is up) or 'timeout'."""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        return reader, writer, 'open'
+    except ConnectionRefusedError:
+        return None, None, 'closed'
+    except (asyncio.TimeoutError, OSError):
+        return None, None, 'timeout'
+
+
+async def close(writer):
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except Exception:
+        pass
+
+
+async def probe_port(host: str, port: int, timeout: float, samples: int) -> dict:
+    """Probe one port: connect, then find the framing that reads the DIs."""
+    started = time.monotonic()
+    reader, writer, status = await open_port(host, port, timeout)
+    result = {'port': port, 'status': status}
+    if status != 'open':
+        return result
+    result['connect_ms'] = (time.monotonic() - started) * 1000.0
+
+    for protocol in protocol_order(port):
+        if writer is None:
+            reader, writer, status = await open_port(host, port, timeout)
+            if status != 'open':
+                break
+        try:
+            rtts = []
+            for _ in range(samples):
+                sent = time.monotonic()
+                di_mask = await read_di(reader, writer, protocol, timeout)
+                rtts.append((time.monotonic() - sent) * 1000.0)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, OSError, ValueError):
+            # Wrong framing leaves unread bytes behind; retry on a new connection
+            await close(writer)
+            writer = None
+            continue
+        await close(writer)
+        rtts.sort()
+        result.update({
+            'protocol': protocol,
+            'di': [(di_mask >> i) & 1 for i in range(8)],
+            'rtt_ms': rtts[len(rtts) // 2],
+            'rtt_max_ms': rtts[-1],
+        })
+        return result
+
+    if writer is not None:
+        await close(writer)
+    return result
+
+
+async def scan(networks: List[str], ports=DEFAULT_PORTS, timeout: float = 1.0,
+               samples: int = 3, concurrency: int = 512) -> List[dict]:
+    """Probe every host of the given networks on all ports concurrently.
+
+    Returns one entry per host that answered on any port (a refused
+    connection counts as reachable), each with its per-port results.
+    """
+    limit = asyncio.Semaphore(concurrency)
+
+    async def probe(host: str, port: int) -> dict:
+        async with limit:
+            return await probe_port(host, port, timeout, samples)
+
+    hosts = []
+    for network in networks:
+        net = ipaddress.ip_network(network, strict=False)
+        hosts.extend(str(address) for address in (net.hosts() if net.num_addresses > 1 else [net.network_address]))
+
+    results = await asyncio.gather(*[probe(host, port) for host in hosts for port in ports])
+    found = []
+    for index, host in enumerate(hosts):
+        host_results = results[index * len(ports):(index + 1) * len(ports)]
+        if any(entry['status'] != 'timeout' for entry in host_results):
+            found.append({'ip': host, 'ports': host_results})
+    return found
+
+
+def boards_from_scan(found: List[dict], previous: Optional[List[dict]] = None) -> List[dict]:
+    """RELAY_CONFIGS entries for every confirmed board, one per address.
+
+    The first port that answered in scan order is used. Names of boards in
+    a previous board list are kept; new boards are numbered after them.
+    """
+    names = {entry['ip']: entry.get('name') for entry in previous or [] if 'ip' in entry}
+    boards = []
+    for host in found:
+        confirmed = [entry for entry in host['ports'] if 'protocol' in entry]
+        if not confirmed:
+            continue
+        entry = confirmed[0]
+        board = {'ip': host['ip'], 'port': entry['port'], 'name': names.get(host['ip']),
+                 'protocol': entry['protocol']}
+        boards.append(board)
+    number = len([name for name in names.values() if name]) + 1
+    for board in boards:
+        if not board['name']:
+            board['name'] = f"Table {number}"
+            number += 1
+    return boards
+
+
+def write_boards(path: str, boards: List[dict], networks: List[str]):
+    """Write the board list app_pokayoke.py loads at startup."""
+    with open(path, 'w') as f:
+        json.dump({'boards': boards, 'networks': networks, 'scanned_at': datetime.now().isoformat()},
+                  f, indent=2)
+
+
+def update_controller_config(board: dict, path: Path = CONTROLLER_CONFIG):
+    """Point the sequence controller at board, keeping its saved sequences."""
+    config = {}
+    if path.exists():
+        with open(path, 'r') as f:
+            config = json.load(f)
+    config['relay_host'] = board['ip']
+    config['relay_port'] = board['port']
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=4)
+
+
+def format_report(found: List[dict]) -> str:
+    lines = []
+    for host in found:
+        for entry in host['ports']:
+            if 'protocol' in entry:
+                di = ''.join(str(bit) for bit in entry['di'])
+                lines.append(f"{host['ip']:>15}:{entry['port']:<5} board ({entry['protocol']})  "
+                             f"connect {entry['connect_ms']:6.1f} ms  DI RTT {entry['rtt_ms']:6.1f} ms "
+                             f"(max {entry['rtt_max_ms']:.1f})  DI {di}")
+            elif entry['status'] == 'open':
+                lines.append(f"{host['ip']:>15}:{entry['port']:<5} open, no Modbus DI response")
+            elif entry['status'] == 'closed':
+                lines.append(f"{host['ip']:>15}:{entry['port']:<5} host up, port closed")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Find Waveshare relay boards on the network')
+    parser.add_argument('networks', nargs='+', help='networks in CIDR form, e.g. 192.168.1.0/24, or addresses')
+    parser.add_argument('--ports', default=','.join(str(port) for port in DEFAULT_PORTS),
+                        help='comma separated ports to probe')
+    parser.add_argument('--timeout', type=float, default=1.0, help='connect and read timeout in seconds')
+    parser.add_argument('--samples', type=int, default=3, help='DI reads per board for the RTT')
+    parser.add_argument('--concurrency', type=int, default=512, help='maximum probes in flight')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='board list for app_pokayoke.py')
+    parser.add_argument('--no-output', action='store_true', help='only print the report')
+    parser.add_argument('--controller-config', action='store_true',
+                        help=f'set the first RTU board as the sequence controller relay in {CONTROLLER_CONFIG}')
+    args = parser.parse_args()
+
+    ports = [int(port) for port in args.ports.split(',') if port]
+    started = time.monotonic()
+    found = asyncio.run(scan(args.networks, ports, args.timeout, args.samples, args.concurrency))
+    elapsed = time.monotonic() - started
+    if found:
+        print(format_report(found))
+
+    previous = []
+    if not args.no_output and Path(args.output).exists():
+        try:
+            with open(args.output, 'r') as f:
+                previous = json.load(f).get('boards', [])
+        except Exception as e:
+            print(f"Ignoring existing {args.output}: {e}")
+    boards = boards_from_scan(found, previous)
+    print(f"Scanned {', '.join(args.networks)} in {elapsed:.1f} s: {len(found)} host(s) up, "
+          f"{len(boards)} relay board(s)")
+
+    if boards and not args.no_output:
+        write_boards(args.output, boards, args.networks)
+        print(f"Wrote {args.output}")
+    if args.controller_config:
+        rtu_boards = [board for board in boards if board['protocol'] == 'rtu']
+        if rtu_boards:
+            update_controller_config(rtu_boards[0])
+            print(f"Sequence controller relay set to {rtu_boards[0]['ip']}:{rtu_boards[0]['port']}")
+        else:
+            print("No RTU board found for the sequence controller")
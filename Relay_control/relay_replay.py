@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Replay Modbus captures as simulated relay boards
+Serves capture files written by relay_capture.CaptureWriter back through
+RelaySimulator, one board per file, so the sequence controller or the
+poka-yoke app can be run against the DI traffic of a production session.
+
+Digital input reads (FC 0x02) are answered from the capture. Everything
+else (coil reads, writes, flash commands) is executed by the simulated
+board, so the outputs the application drives under replay are its own and
+can be compared with the capture.
+
+Two speeds:
+    recorded speed (default)  each DI read returns the input state captured
+                              at the same time since the first request
+    --fast                    each DI read returns the next captured DI
+                              response, so a long session replays as fast as
+                              the application polls
+
+Example: replay two boards on ports 14196-14197 with 2 ms RTT
+    python3 relay_replay.py line1.rcap line2.rcap --rtt 2
+"""
+
+import argparse
+import bisect
+import time
+from typing import Dict, List, Optional
+
+from relay_capture import REQUEST, exchanges, read_capture
+from relay_simulator import RelaySimulator, SimulatedBoard
+
+
+class ReplayBoard(SimulatedBoard):
+    """SimulatedBoard whose digital inputs follow a capture."""
+
+    def __init__(self, records, realtime: bool = True, address=0x01):
+        super().__init__(address)
+        self.realtime = realtime
+        # DI request PDU -> capture times and response PDUs, in capture order
+        self.times: Dict[bytes, List[float]] = {}
+        self.replies: Dict[bytes, List[bytes]] = {}
+        for elapsed, request, response, _ in exchanges(records):
+            if len(request) < 2 or request[1] != 0x02:
+                continue
+            key = bytes(request[1:])
+            self.times.setdefault(key, []).append(elapsed)
+            self.replies.setdefault(key, []).append(bytes(response[1:]))
+        self.cursors = {key: 0 for key in self.replies}
+        self.started: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        """Capture time of the last DI response."""
+        return max((times[-1] for times in self.times.values()), default=0.0)
+
+    @property
+    def finished(self) -> bool:
+        """True once every captured DI response has been served."""
+        if self.realtime:
+            return self.started is not None and time.monotonic() - self.started > self.duration
+        return all(self.cursors[key] >= len(replies) for key, replies in self.replies.items())
+
+    def rewind(self):
+        """Start the replay again from the beginning of the capture."""
+        self.started = None
+        self.cursors = {key: 0 for key in self.replies}
+
+    def handle_pdu(self, pdu: bytes) -> bytes:
+        key = bytes(pdu)
+        replies = self.replies.get(key)
+        if replies is None:
+            return super().handle_pdu(pdu)
+
+        if self.realtime:
+            now = time.monotonic()
+            if self.started is None:
+                self.started = now - self.times[key][0]
+            index = max(0, bisect.bisect_right(self.times[key], now - self.started) - 1)
+        else:
+            index = min(self.cursors[key], len(replies) - 1)
+            self.cursors[key] += 1
+
+        reply = replies[index]
+        if reply[0] == 0x02 and len(reply) >= 3:
+            self.di_mask = reply[2]
+        return reply
+
+
+def replay_simulator(paths: List[str], realtime: bool = True, **kwargs) -> RelaySimulator:
+    """RelaySimulator serving one ReplayBoard per capture file.
+
+    kwargs are passed to RelaySimulator (host, base_port, protocol, rtt, ...).
+    The simulator is returned unstarted.
+    """
+    boards = []
+    for path in paths:
+        _, records = read_capture(path)
+        unit = next((frame[0] for _, direction, _, frame in records if direction == REQUEST and frame), 0x01)
+        boards.append(ReplayBoard(records, realtime, address=unit))
+    return RelaySimulator(boards, **kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve Modbus captures as simulated relay boards')
+    parser.add_argument('paths', nargs='+', help='capture files, one per board')
+    parser.add_argument('--fast', action='store_true', help='serve one captured DI response per read')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--base-port', type=int, default=14196, help='port of the first board')
+    parser.add_argument('--protocol', choices=('rtu', 'tcp'), default='rtu', help='RTU over TCP or Modbus TCP')
+    parser.add_argument('--rtt', type=float, default=0.0, help='reply delay in milliseconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='+/- random delay in milliseconds')
+    parser.add_argument('--repeat', action='store_true', help='rewind each capture when it ends')
+    args = parser.parse_args()
+
+    simulator = replay_simulator(args.paths, not args.fast, host=args.host, base_port=args.base_port,
+                                 protocol=args.protocol, rtt=args.rtt / 1000.0, jitter=args.jitter / 1000.0)
+    simulator.start()
+    for path, port in zip(args.paths, simulator.ports):
+        board = simulator.boards[port - args.base_port]
+        print(f"Replaying {path} ({board.duration:.1f} s) on {args.host}:{port} ({args.protocol})")
+    try:
+        while True:
+            time.sleep(0.5)
+            if all(board.finished for board in simulator.boards):
+                if not args.repeat:
+                    print("Replay finished")
+                    break
+                for board in simulator.boards:
+                    board.rewind()
+    except KeyboardInterrupt:
+        print("Stopping replay")
+    finally:
+        simulator.stop()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Waveshare Modbus POE ETH relay board simulator
+Serves any number of simulated 8-channel boards on localhost so RelayClient,
+AsyncRelayClient and the relay_b drivers can be exercised without hardware.
+
+Supports FC 0x01 (read coils), 0x02 (read discrete inputs), 0x05 (write
+single coil, including the board's flash-on/flash-off timed commands) and
+0x0F (write multiple coils) over RTU-over-TCP (same framing
+and CRC as the board) or Modbus TCP (MBAP). Faults can be injected per reply:
+RTT with jitter, dropped replies and replies split over several TCP segments.
+
+Example: 50 boards on ports 14196-14245 with 2 ms +/- 1 ms RTT and 1% drops
+    python3 relay_simulator.py --boards 50 --rtt 2 --jitter 1 --drop 0.01
+
+DI pins can be driven from Python (board.set_di(1, True)) or from a script
+file given with --script, one event per line:
+    # time_s  board  DIn  ON|OFF      (board is an index or * for all)
+    0.5       0      DI1  ON
+    1.0       *      DI1  OFF
+"""
+
+import argparse
+import asyncio
+import random
+import socket
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from relay_client import MBAP_HEADER_LENGTH, check_crc, mbap_header, modbus_crc
+
+NUM_CHANNELS = 8
+
+# Modbus exception codes
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_ADDRESS = 0x02
+ILLEGAL_DATA_VALUE = 0x03
+
+# Write Single Coil addresses of the board's timed commands, delay in 100 ms units
+FLASH_ON_BASE = 0x0200
+FLASH_OFF_BASE = 0x0400
+
+
+class SimulatedBoard:
+    """State of one simulated relay board (bit 0 = channel 1)."""
+
+    def __init__(self, address=0x01):
+        self.address = address
+        self.di_mask = 0
+        self.coil_mask = 0
+        self.requests = 0
+        self.dropped = 0
+        # Flash commands in progress: coil bit -> (monotonic revert time, level after revert)
+        self.timed = {}
+
+    def set_di(self, channel: int, value: bool):
+        """Drive digital input DI<channel> (1-8)."""
+        if channel < 1 or channel > NUM_CHANNELS:
+            raise ValueError(f"Invalid DI {channel}, must be 1-{NUM_CHANNELS}")
+        if value:
+            self.di_mask |= 1 << (channel - 1)
+        else:
+            self.di_mask &= ~(1 << (channel - 1))
+
+    def _expire_timed(self):
+        now = time.monotonic()
+        for bit, (revert_at, level) in list(self.timed.items()):
+            if now >= revert_at:
+                self.coil_mask = self.coil_mask | bit if level else self.coil_mask & ~bit
+                del self.timed[bit]
+
+    def _cancel_timed(self, mask: int):
+        for bit in list(self.timed):
+            if bit & mask:
+                del self.timed[bit]
+
+    def handle_pdu(self, pdu: bytes) -> bytes:
+        """Execute one request PDU (function code + data) and return the reply PDU."""
+        self._expire_timed()
+        function = pdu[0]
+        if function in (0x01, 0x02):
+            start = (pdu[1] << 8) | pdu[2]
+            quantity = (pdu[3] << 8) | pdu[4]
+            if quantity < 1 or start + quantity > NUM_CHANNELS:
+                return bytes([function | 0x80, ILLEGAL_DATA_ADDRESS])
+            bits = (self.coil_mask if function == 0x01 else self.di_mask) >> start
+            bits &= (1 << quantity) - 1
+            return bytes([function, 1, bits])
+
+        if function == 0x05:
+            coil = (pdu[1] << 8) | pdu[2]
+            value = (pdu[3] << 8) | pdu[4]
+            if coil & 0xFF00 in (FLASH_ON_BASE, FLASH_OFF_BASE):
+                # Flash on: on now, off after value * 100 ms (flash off: the reverse)
+                channel = coil & 0xFF
+                if channel >= NUM_CHANNELS:
+                    return bytes([function | 0x80, ILLEGAL_DATA_ADDRESS])
+                if value < 1 or value > 0x7FFF:
+                    return bytes([function | 0x80, ILLEGAL_DATA_VALUE])
+                bit = 1 << channel
+                flash_on = coil & 0xFF00 == FLASH_ON_BASE
+                self.coil_mask = self.coil_mask | bit if flash_on else self.coil_mask & ~bit
+                self.timed[bit] = (time.monotonic() + value / 10.0, not flash_on)
+                return bytes(pdu[:5])
+            # 0x00FF addresses all channels; 0x5500 toggles
+            mask = 0xFF if coil == 0x00FF else 1 << coil
+            if coil != 0x00FF and coil >= NUM_CHANNELS:
+                return bytes([function | 0x80, ILLEGAL_DATA_ADDRESS])
+            self._cancel_timed(mask)
+            if value == 0xFF00:
+                self.coil_mask |= mask
+            elif value == 0x0000:
+                self.coil_mask &= ~mask
+            elif value == 0x5500:
+                self.coil_mask ^= mask
+            else:
+                return bytes([function | 0x80, ILLEGAL_DATA_VALUE])
+            return bytes(pdu[:5])
+
+        if function == 0x0F:
+            start = (pdu[1] << 8) | pdu[2]
+            quantity = (pdu[3] << 8) | pdu[4]
+            if quantity < 1 or start + quantity > NUM_CHANNELS:
+                return bytes([function | 0x80, ILLEGAL_DATA_ADDRESS])
+            span = ((1 << quantity) - 1) << start
+            self._cancel_timed(span)
+            self.coil_mask = (self.coil_mask & ~span) | ((pdu[6] << start) & span)
+            return bytes(pdu[:5])
+
+        return bytes([function | 0x80, ILLEGAL_FUNCTION])
+
+
+def rtu_request_length(buffer: bytes) -> Optional[int]:
+    """Length of the RTU request at the start of buffer, or None if not known yet."""
+    if len(buffer) < 2:
+        return None
+    if buffer[1] == 0x0F:
+        return 9 + buffer[6] if len(buffer) >= 7 else None
+    return 8
+
+
+def load_di_script(path: str) -> List[Tuple[float, Optional[int], int, bool]]:
+    """Parse a DI script into sorted (time_s, board index or None for all, DI, state)."""
+    events = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            try:
+                when, board, pin, state = line.split()
+                if not pin.upper().startswith('DI') or state.upper() not in ('ON', 'OFF'):
+                    raise ValueError(line)
+                events.append((float(when), None if board == '*' else int(board),
+                               int(pin[2:]), state.upper() == 'ON'))
+            except ValueError:
+                raise ValueError(f"{path}:{line_number}: expected 'time board DIn ON|OFF', got {line!r}")
+    return sorted(events, key=lambda event: event[0])
+
+
+class RelaySimulator:
+    """Serves SimulatedBoards on consecutive TCP ports from one asyncio loop.
+
+    boards is a number of boards to create or a list of SimulatedBoard
+    objects (e.g. relay_replay.ReplayBoard) to serve.
+    rtt and jitter are in seconds; drop_rate is the probability a reply is
+    never sent; split_rate is the probability a reply is written as several
+    TCP segments.
+    """
+
+    def __init__(self, boards=1, host='127.0.0.1', base_port=14196, protocol='rtu',
+                 rtt=0.0, jitter=0.0, drop_rate=0.0, split_rate=0.0, seed=None):
+        if protocol not in ('rtu', 'tcp'):
+            raise ValueError(f"Unknown protocol {protocol!r}, must be 'rtu' or 'tcp'")
+        if isinstance(boards, int):
+            self.boards = [SimulatedBoard() for _ in range(boards)]
+        else:
+            self.boards = list(boards)
+        self.host = host
+        self.base_port = base_port
+        self.protocol = protocol
+        self.rtt = rtt
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.split_rate = split_rate
+        self.random = random.Random(seed)
+
+        self.loop = None
+        self.thread = None
+        self.servers = []
+        self.connections = {}  # handler task -> writer of each open client connection
+        self.started = threading.Event()
+
+    @property
+    def ports(self) -> List[int]:
+        return [self.base_port + i for i in range(len(self.boards))]
+
+    def start(self):
+        """Serve all boards from a background thread; returns once listening."""
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.thread.start()
+        self.started.wait()
+
+    def stop(self):
+        """Close all servers and stop the loop thread."""
+        if not self.loop:
+            return
+        asyncio.run_coroutine_threadsafe(self._close(), self.loop).result(timeout=5.0)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5.0)
+        self.loop.close()
+        self.loop = None
+
+    def run_script(self, events, repeat=False):
+        """Play DI script events (see load_di_script) on the simulator loop."""
+        return asyncio.run_coroutine_threadsafe(self._play(events, repeat), self.loop)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._listen())
+        self.started.set()
+        self.loop.run_forever()
+
+    async def _listen(self):
+        for board, port in zip(self.boards, self.ports):
+            handler = (lambda reader, writer, board=board: self._serve_client(board, reader, writer))
+            self.servers.append(await asyncio.start_server(handler, self.host, port))
+
+    async def _close(self):
+        for server in self.servers:
+            server.close()
+        # Closing the transports ends each handler through its normal EOF path
+        for writer in list(self.connections.values()):
+            writer.close()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        for server in self.servers:
+            await server.wait_closed()
+        self.servers = []
+
+    async def _play(self, events, repeat):
+        while True:
+            started = time.monotonic()
+            for when, board, pin, state in events:
+                await asyncio.sleep(max(0.0, started + when - time.monotonic()))
+                for target in (self.boards if board is None else [self.boards[board]]):
+                    target.set_di(pin, state)
+            if not repeat or not events:
+                return
+
+    async def _serve_client(self, board: SimulatedBoard, reader, writer):
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        write_lock = asyncio.Lock()
+        tasks = set()
+        connection = asyncio.current_task()
+        self.connections[connection] = writer
+        try:
+            while True:
+                if self.protocol == 'rtu':
+                    request = await self._read_rtu(reader)
+                    reply = self._handle_rtu(board, request)
+                    # RTU has no transaction id: answer strictly in order
+                    await self._send_reply(board, writer, write_lock, reply)
+                else:
+                    header = await reader.readexactly(MBAP_HEADER_LENGTH)
+                    length = (header[4] << 8) | header[5]
+                    pdu = await reader.readexactly(length - 1)
+                    reply = self._handle_mbap(board, header, pdu)
+                    # Replies may overtake each other, like a busy gateway
+                    task = asyncio.ensure_future(self._send_reply(board, writer, write_lock, reply))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.connections.pop(connection, None)
+            writer.close()
+
+    async def _read_rtu(self, reader) -> bytes:
+        request = await reader.readexactly(2)
+        if request[1] == 0x0F:
+            request += await reader.readexactly(5)
+        request += await reader.readexactly(rtu_request_length(request) - len(request))
+        return request
+
+    def _handle_rtu(self, board: SimulatedBoard, request: bytes) -> Optional[bytes]:
+        # A real RTU slave stays silent on a bad CRC or another address
+        if not check_crc(request) or request[0] != board.address:
+            return None
+        board.requests += 1
+        reply = bytes([board.address]) + board.handle_pdu(request[1:-2])
+        crc = modbus_crc(reply)
+        return reply + bytes([crc & 0xFF, crc >> 8])
+
+    def _handle_mbap(self, board: SimulatedBoard, header: bytes, pdu: bytes) -> bytes:
+        board.requests += 1
+        unit = header[6:7]
+        body = unit + board.handle_pdu(pdu)
+        transaction_id = (header[0] << 8) | header[1]
+        return mbap_header(transaction_id, body) + body
+
+    async def _send_reply(self, board: SimulatedBoard, writer, write_lock, reply: Optional[bytes]):
+        if reply is None:
+            return
+        delay = self.rtt + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.drop_rate and self.random.random() < self.drop_rate:
+            board.dropped += 1
+            return
+
+        async with write_lock:
+            if self.split_rate and len(reply) > 1 and self.random.random() < self.split_rate:
+                cut = self.random.randint(1, len(reply) - 1)
+                writer.write(reply[:cut])
+                await writer.drain()
+                # Give the first segment time to leave before the rest
+                await asyncio.sleep(0.001)
+                writer.write(reply[cut:])
+            else:
+                writer.write(reply)
+            await writer.drain()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Simulate Waveshare Modbus POE relay boards on localhost')
+    parser.add_argument('--boards', type=int, default=1, help='number of boards')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--base-port', type=int, default=14196, help='port of the first board')
+    parser.add_argument('--protocol', choices=('rtu', 'tcp'), default='rtu', help='RTU over TCP or Modbus TCP')
+    parser.add_argument('--rtt', type=float, default=0.0, help='reply delay in milliseconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='+/- random delay in milliseconds')
+    parser.add_argument('--drop', type=float, default=0.0, help='probability of dropping a reply')
+    parser.add_argument('--split', type=float, default=0.0, help='probability of splitting a reply')
+    parser.add_argument('--script', help='DI script file')
+    parser.add_argument('--repeat', action='store_true', help='loop the DI script')
+    parser.add_argument('--seed', type=int, help='random seed for reproducible faults')
+    args = parser.parse_args()
+
+    simulator = RelaySimulator(args.boards, args.host, args.base_port, args.protocol,
+                               args.rtt / 1000.0, args.jitter / 1000.0, args.drop, args.split, args.seed)
+    simulator.start()
+    print(f"Simulating {args.boards} board(s) on {args.host}:{simulator.ports[0]}-{simulator.ports[-1]} "
+          f"({args.protocol})")
+    if args.script:
+        simulator.run_script(load_di_script(args.script), args.repeat)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopping simulator")
+    finally:
+        simulator.stop()
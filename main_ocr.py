@@ -1,6 +1,8 @@
+import os
 import sys
 import cv2
 import time
+import threading
 import json
 import easyocr
 from PySide6.QtCore import QTimer, Qt
@@ -9,7 +11,12 @@ from PySide6.QtWidgets import (
     QApplication, QTabWidget, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QPushButton, QTableWidget, QTableWidgetItem, QFileDialog, QLineEdit, QInputDialog
 )
-from relay_b import Relay
+if os.getenv('RELAY_BROKER'):
+    # Share the board through relay_broker.py instead of opening our own socket
+    from relay_broker import BrokerRelay as Relay
+else:
+    from relay_b import Relay
+from relay_b import DISampler
 from PySide6.QtCore import QObject, Signal
 
 class RelayWorker(QObject):
@@ -21,6 +28,13 @@ class RelayWorker(QObject):
         super().__init__(parent)
         self.relay = relay
         self.running = True  # Control flag for the thread
+        self.stopped = threading.Event()
+
+        # DI1 starts and DI2 finishes an inspection: react to their debounced
+        # rising edges within one 20 ms sample instead of a 0.5 s poll
+        self.sampler = DISampler(relay, interval=0.02)
+        self.sampler.subscribe(1, on_rise=self.on_start_input)
+        self.sampler.subscribe(2, on_rise=self.on_finish_input)
 
     def monitor_relay_inputs(self):
         """Monitor DI1 and DI2 for signals to start and stop inspection."""
@@ -30,23 +44,27 @@ class RelayWorker(QObject):
         self.relay.all_off()
         time.sleep(0.5)  # Ensure all relays are off before starting
         print("Started monitoring relay inputs.")
+        self.sampler.start()
         try:
-            while self.running:
-                if self.relay.is_DI_on(1):  # Check if DI1 is ON
-                    self.start_signal.emit()  # Emit start signal
-                    print("DI1 is ON, starting inspection.")
-
-                elif self.relay.is_DI_on(2):  # Check if DI2 is ON
-                    print("DI2 is ON, stopping inspection.")
-                    self.finish_signal.emit()  # Emit finish signal
-
-                time.sleep(0.5)
+            self.stopped.wait()
         finally:
+            self.sampler.stop()
             self.relay.disconnect()
 
+    def on_start_input(self, di_number, timestamp):
+        """DI1 rising edge (called from the sampler thread)."""
+        print("DI1 is ON, starting inspection.")
+        self.start_signal.emit()  # Emit start signal
+
+    def on_finish_input(self, di_number, timestamp):
+        """DI2 rising edge (called from the sampler thread)."""
+        print("DI2 is ON, stopping inspection.")
+        self.finish_signal.emit()  # Emit finish signal
+
     def stop(self):
         """Stop the monitoring thread."""
         self.running = False
+        self.stopped.set()
 
 
 class VideoOCRApp(QWidget):
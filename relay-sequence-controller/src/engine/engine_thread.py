@@ -0,0 +1,126 @@
+"""Fixed-period engine thread.
+
+Runs SequenceEngine.tick() on a fixed grid of tick times from a daemon
+thread, so the control loop keeps its timing whatever the GUI is doing.
+Ticks are scheduled on absolute times (start + n * period), so a slow tick
+does not shift the ones after it; a tick that overruns whole periods skips
+them instead of bursting.
+
+Between ticks the thread also wakes at the engine's next timer deadline
+(see utils/deadline_scheduler.py), so timed outputs, waits and blink phases
+fire at their due time rather than on the next tick.
+
+Jitter is how late each tick started against its grid time; cycle is the
+time a tick took when it polled the relay; timer is how late each timer
+fired against its deadline. All are kept for the last `history` samples.
+
+The engine state is published for the GUI at most every publish_interval
+seconds; latest() returns the newest EngineState without blocking.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+def format_stats(stats):
+    """One-line summary of EngineThread.stats() for the status bar and logs."""
+    text = f"tick {stats['period_ms']:.0f} ms"
+    if 'jitter_p50_ms' in stats:
+        text += (f", jitter p50 {stats['jitter_p50_ms']:.2f} ms p99 {stats['jitter_p99_ms']:.2f} ms"
+                 f" max {stats['jitter_max_ms']:.1f} ms")
+    if 'cycle_p50_ms' in stats:
+        text += f", cycle p50 {stats['cycle_p50_ms']:.1f} ms p99 {stats['cycle_p99_ms']:.1f} ms"
+    if 'timer_p50_ms' in stats:
+        text += f", timer late p99 {stats['timer_p99_ms']:.2f} ms"
+    if stats['overruns']:
+        text += f", {stats['overruns']} overruns"
+    return text
+
+
+class EngineThread:
+    """Ticks a SequenceEngine every `period` seconds from a daemon thread."""
+
+    def __init__(self, engine, period=0.01, publish_interval=0.1, history=1000):
+        self.engine = engine
+        self.period = period
+        self.publish_interval = publish_interval
+        self.jitter = deque(maxlen=history)
+        self.cycle = deque(maxlen=history)
+        self.ticks = 0
+        self.polls = 0
+        self.overruns = 0
+        self._latest = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start ticking in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sequence-engine', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """Stop ticking and wait for the engine thread to exit."""
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def latest(self):
+        """Newest published EngineState, None before the first publish."""
+        return self._latest
+
+    def _run(self):
+        next_tick = time.monotonic()
+        next_publish = next_tick
+        while not self._stop.is_set():
+            started = time.monotonic()
+            if started < next_tick:
+                # Woken for a timer between ticks
+                try:
+                    self.engine.run_timers()
+                except Exception as e:
+                    print(f"Sequence engine error: {e}")
+            else:
+                self.jitter.append(started - next_tick)
+                self.ticks += 1
+                try:
+                    if self.engine.tick():
+                        self.polls += 1
+                        self.cycle.append(time.monotonic() - started)
+                except Exception as e:
+                    print(f"Sequence engine error: {e}")
+
+                now = time.monotonic()
+                if now >= next_publish:
+                    self._latest = self.engine.state(self.stats())
+                    next_publish = now + self.publish_interval
+
+                next_tick += self.period
+                if next_tick <= now:
+                    # Overran one or more periods: skip them, keep the grid
+                    missed = int((now - next_tick) / self.period) + 1
+                    self.overruns += missed
+                    next_tick += missed * self.period
+
+            wake = next_tick
+            deadline = self.engine.next_deadline()
+            if deadline is not None and deadline < wake:
+                wake = deadline
+            self._stop.wait(max(0.0, wake - time.monotonic()))
+
+    def stats(self):
+        """Tick counters and jitter / cycle / timer lateness percentiles in milliseconds."""
+        result = {'period_ms': self.period * 1000.0, 'ticks': self.ticks, 'polls': self.polls,
+                  'overruns': self.overruns}
+        for name, samples in (('jitter', self.jitter), ('cycle', self.cycle),
+                              ('timer', self.engine.timers.lateness)):
+            samples = sorted(samples)
+            if samples:
+                def rank(p):
+                    return samples[min(len(samples) - 1, int(p / 100.0 * len(samples)))] * 1000.0
+                result.update({f'{name}_p50_ms': rank(50), f'{name}_p99_ms': rank(99),
+                               f'{name}_max_ms': samples[-1] * 1000.0})
+        return result
@@ -0,0 +1,101 @@
+"""DI-to-DO reaction time tracing.
+
+Every production line step and station transition that switches outputs in
+answer to an input is traced from the DI sample that triggered it to the
+end of the DO write carrying its outputs. A trace has three parts:
+
+    read      the DI/DO poll: from sending the read to having the snapshot
+    evaluate  condition evaluation and action queuing for the whole tick
+    write     the tick's DO frames, including their verification
+
+and the poll window, the time since the previous poll. The edge itself
+happened somewhere in that window, so latency is the reaction time from
+the sample that saw the edge and latency + window bounds it from the edge.
+
+Traces are kept per (sequence, step) for the last `history` cycles; step
+is the step index of a production line or the state a station left. Times
+are on the engine clock, so simulated runs trace virtual time.
+"""
+
+import csv
+import json
+import threading
+from collections import deque
+
+# Columns of summary() rows, in CSV order
+FIELDS = ('sequence', 'step', 'count', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms', 'worst_p99_ms',
+          'read_ms', 'evaluate_ms', 'write_ms')
+
+
+def _rank(samples, p):
+    """p-th percentile of sorted samples, as in EngineThread.stats()."""
+    return samples[min(len(samples) - 1, int(p / 100.0 * len(samples)))]
+
+
+class LatencyTracker:
+    """Rolling DI-to-DO reaction times per sequence and step.
+
+    The engine thread records while the GUI reads summaries, so both sides
+    take self.lock; recording is a deque append.
+    """
+
+    def __init__(self, history=500):
+        self.history = history
+        self.lock = threading.Lock()
+        self.traces = {}  # (seq_id, step) -> deque of (read, evaluate, write, window) seconds
+
+    def record(self, key, read, evaluate, write, window):
+        with self.lock:
+            traces = self.traces.get(key)
+            if traces is None:
+                traces = self.traces[key] = deque(maxlen=self.history)
+            traces.append((read, evaluate, write, window))
+
+    def clear(self):
+        with self.lock:
+            self.traces.clear()
+
+    def forget(self, seq_id):
+        """Drop the traces of a sequence, e.g. after its steps were edited."""
+        with self.lock:
+            for key in [key for key in self.traces if key[0] == seq_id]:
+                del self.traces[key]
+
+    def summary(self):
+        """One dict per traced step (see FIELDS), ordered by sequence and step; times in ms."""
+        with self.lock:
+            items = [(key, list(traces)) for key, traces in self.traces.items()]
+        rows = []
+        for (seq_id, step), traces in items:
+            totals = sorted(read + evaluate + write for read, evaluate, write, _ in traces)
+            worst = sorted(read + evaluate + write + window for read, evaluate, write, window in traces)
+            count = len(traces)
+            rows.append({
+                'sequence': seq_id,
+                'step': step,
+                'count': count,
+                'p50_ms': _rank(totals, 50) * 1000.0,
+                'p90_ms': _rank(totals, 90) * 1000.0,
+                'p99_ms': _rank(totals, 99) * 1000.0,
+                'max_ms': totals[-1] * 1000.0,
+                'worst_p99_ms': _rank(worst, 99) * 1000.0,
+                'read_ms': sum(trace[0] for trace in traces) / count * 1000.0,
+                'evaluate_ms': sum(trace[1] for trace in traces) / count * 1000.0,
+                'write_ms': sum(trace[2] for trace in traces) / count * 1000.0,
+            })
+        rows.sort(key=lambda row: (row['sequence'], isinstance(row['step'], str), row['step']))
+        return rows
+
+    def export(self, path):
+        """Write summary() to path: JSON for a .json file, CSV otherwise. Returns the row count."""
+        rows = self.summary()
+        with open(path, 'w', newline='') as f:
+            if str(path).lower().endswith('.json'):
+                json.dump({'fields': FIELDS, 'steps': rows}, f, indent=2)
+            else:
+                writer = csv.DictWriter(f, fieldnames=FIELDS)
+                writer.writeheader()
+                for row in rows:
+                    writer.writerow({name: f"{value:.3f}" if isinstance(value, float) else value
+                                     for name, value in row.items()})
+        return len(rows)
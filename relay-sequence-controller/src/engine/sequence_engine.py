@@ -0,0 +1,877 @@
+"""Sequence engine: the relay control loop, independent of the GUI.
+
+SequenceEngine owns the sequences, their run state and the step, wait and
+blink timers, and does one control cycle per tick(): read the DI/DO snapshot,
+run due timers, evaluate the enabled sequences and flush the DO writes. It
+has no Qt dependency; EngineThread (engine/engine_thread.py) runs it on a
+fixed period and the GUI only draws the EngineState snapshots it publishes.
+
+Every method that reads or changes the run state takes self.lock, so the
+GUI thread can edit, enable or reset sequences while the engine thread ticks.
+"""
+
+import threading
+import time
+from functools import partial
+
+from relay_b import OutputShadow, FLASH_MAX_MS
+from engine.latency import LatencyTracker
+from models.io_snapshot import IOSnapshot
+from models.compiled_sequence import (EdgeMemory, STEP_DELAY, STEP_NOOP, STEP_SKIP, STEP_WAIT,
+                                      compile_sequence, state_word)
+from models.condition_table import ConditionTable
+from utils.board_group import CHANNELS, BoardGroup, GroupOutputShadow, board_names
+from utils.deadline_scheduler import DeadlineScheduler
+from utils.poll_scheduler import AdaptivePollScheduler
+
+# BLINK outputs are on for half of each period, timed by the relay board
+BLINK_PERIOD = 2.0  # seconds
+
+# 'evaluation' in the configuration: 'parallel' finds the sequences with
+# something to do from all conditions at once (models/condition_table.py),
+# 'sequential' walks every enabled sequence every tick
+EVALUATION_MODES = ('parallel', 'sequential')
+
+
+class EngineState:
+    """Read-only copy of the engine state for display, taken under the engine lock.
+
+    di_seen / do_seen have a bit set for every channel that was ON in any
+    tick since the previous EngineState, so a pulse shorter than the GUI
+    refresh still shows up in the DI/DO history.
+    """
+
+    __slots__ = ('timestamp', 'connected', 'error', 'di_mask', 'do_mask', 'di_seen', 'do_seen',
+                 'enabled', 'active', 'steps', 'timers', 'initialized', 'stats')
+
+    def __init__(self, engine, stats=None):
+        snapshot = engine.snapshot
+        self.timestamp = snapshot.timestamp if snapshot else time.time()
+        self.connected = engine.relay is not None
+        self.error = engine.error
+        self.di_mask = snapshot.di_mask if snapshot else 0
+        self.do_mask = snapshot.do_mask if snapshot else 0
+        self.di_seen = engine.di_seen
+        self.do_seen = engine.do_seen
+        self.enabled = tuple(engine.enabled)
+        # Station / tool picking states by key ('state' value), timed end times as floats
+        self.active = {key: value.get('state') if isinstance(value, dict) else value
+                       for key, value in engine.active_sequences.items()}
+        self.steps = {key: state.get('current_step', 0) for key, state in engine.multi_step_states.items()}
+        self.timers = frozenset(engine.timers.keys())
+        self.initialized = frozenset(engine.sequence_initialized)
+        self.stats = stats or {}
+
+    def do(self, channel):
+        """Return True if DO channel (1-8, 9-16 for the second board, ...) was ON in the last tick."""
+        return bool(self.do_mask & (1 << (channel - 1)))
+
+
+class SequenceEngine:
+    """Relay control loop for one board or a BoardGroup: sequence state, timers and outputs.
+
+    Args:
+        log: called with each event message, from whichever thread caused
+            it (the engine thread for sequence events); defaults to print.
+        clock: monotonic time source in seconds for timers, timeouts and
+            polls; engine/simulation.py passes a virtual clock.
+    """
+
+    def __init__(self, log=None, clock=time.monotonic):
+        self.lock = threading.RLock()
+        self.on_log = log or print
+        self.relay = None
+        self.outputs = None  # OutputShadow: DO writes of one tick go out in one frame
+        # Extra boards from 'boards' in the configuration (utils/board_group.py);
+        # board_names[b] is the prefix of board b in step text, None for the main board
+        self.boards = []
+        self.board_names = [None]
+        self.board_index = {}
+        self.sequences = []
+        self.enabled = []  # per sequence, set from the GUI check boxes
+        self.compiled_sequences = []  # steps of self.sequences, compiled by compile_sequences()
+        self.evaluation = 'parallel'
+        self.condition_table = None  # ConditionTable of the compiled steps in 'parallel' mode
+        self.station_ids = set()  # indexes of station sequences, walked every tick
+        self.uninitialized = set()  # enabled sequences whose initial state is not applied yet
+        self.active_sequences = {}
+        self.multi_step_states = {}
+        self.sequence_initialized = {}
+        # Timed DO offs, waits and blink phases on the monotonic clock, keyed
+        # ('step', seq_id, step_idx, do_ch), ('wait', seq_id, step_idx),
+        # ('blink', seq_id, step_idx, do_ch) or ('station_blink', seq_id, do_ch)
+        self.clock = clock
+        self.timers = DeadlineScheduler(clock)
+        self.edge_memory = EdgeMemory()  # DI states seen by (EDGE)/(ONCE) conditions
+        self.snapshot = None  # DI/DO state read once per poll
+        self.error = None  # message of the last failed poll, None once a poll succeeds
+        self.di_seen = 0
+        self.do_seen = 0
+        # Poll fast while a sequence waits on an input, slow when idle;
+        # bounds come from 'poll_min_ms' / 'poll_max_ms' in the configuration
+        self.poll_scheduler = AdaptivePollScheduler(0.02, 0.25, clock=clock)
+        self.next_poll = 0.0  # self.clock() time of the next relay poll
+        # DI-to-DO reaction times (engine/latency.py): steps that switched
+        # outputs in answer to this tick's inputs, traced once the tick's
+        # writes are out
+        self.latency = LatencyTracker()
+        self.reactions = []
+        self.last_sample = None  # self.clock() time the previous poll was sent
+
+    def log_event(self, message):
+        self.on_log(message)
+
+    def do_name(self, channel):
+        """Step text name of a DO channel: 'DO3' on the main board, 'B:DO3' on board B."""
+        board, index = divmod(channel - 1, CHANNELS)
+        if 0 < board < len(self.board_names):
+            return f"{self.board_names[board]}:DO{index + 1}"
+        return f"DO{channel}"
+
+    def attach(self, relay):
+        """Use relay for all I/O from the next tick on."""
+        with self.lock:
+            self.relay = relay
+            if isinstance(relay, BoardGroup):
+                self.outputs = GroupOutputShadow(relay, clock=self.clock)
+            else:
+                self.outputs = OutputShadow(relay, clock=self.clock)
+            self.snapshot = None
+            self.next_poll = 0.0
+
+    def load(self, config):
+        """Take sequences, enabled states and poll bounds from a configuration dict."""
+        with self.lock:
+            try:
+                self.poll_scheduler.set_bounds(config.get('poll_min_ms', 20) / 1000.0,
+                                               config.get('poll_max_ms', 250) / 1000.0)
+            except ValueError as e:
+                self.log_event(f"Ignoring poll interval settings: {e}")
+            evaluation = config.get('evaluation', 'parallel')
+            if evaluation in EVALUATION_MODES:
+                self.evaluation = evaluation
+            else:
+                self.log_event(f"Ignoring unknown evaluation mode '{evaluation}'")
+            self.boards = config.get('boards', [])
+            self.board_names = board_names(config)
+            self.board_index = {name: board for board, name in enumerate(self.board_names) if name}
+            self.sequences = config.get('sequences', [])
+            enabled_states = config.get('enabled_states', [True] * len(self.sequences))
+            self.enabled = [bool(enabled) for enabled in enabled_states][:len(self.sequences)]
+            self.enabled += [True] * (len(self.sequences) - len(self.enabled))
+            self.compile_sequences()
+            self.next_poll = 0.0
+
+    def compile_sequences(self):
+        """Compile the steps of all sequences; call whenever self.sequences changes."""
+        self.compiled_sequences = [compile_sequence(seq, FLASH_MAX_MS, self.board_index) for seq in self.sequences]
+        self.station_ids = {i for i, compiled in enumerate(self.compiled_sequences) if compiled is None}
+        if self.evaluation == 'parallel':
+            self.condition_table = ConditionTable(self.compiled_sequences, boards=len(self.board_names))
+        else:
+            self.condition_table = None
+        self.sync_conditions()
+
+    def sync_conditions(self, seq_id=None):
+        """Bring the condition table up to date with the run state of one or all sequences.
+
+        Call after changing a sequence's current step, waiting flag, enabled
+        state or initialization flag.
+        """
+        if self.condition_table is None:
+            return
+        if seq_id is None:
+            self.uninitialized.clear()
+            seq_ids = range(len(self.sequences))
+        else:
+            seq_ids = (seq_id,)
+        for i in seq_ids:
+            if self.enabled[i] and i not in self.sequence_initialized:
+                self.uninitialized.add(i)
+            state = self.multi_step_states.get(f"production_{i}")
+            if not self.enabled[i] or (state and state.get('waiting', False)):
+                self.condition_table.set_cursor(i, None)
+            else:
+                self.condition_table.set_cursor(i, state['current_step'] if state else 0)
+
+    def add_sequence(self, seq, enabled=True):
+        with self.lock:
+            self.sequences.append(seq)
+            self.enabled.append(enabled)
+            self.compile_sequences()
+            self.next_poll = 0.0
+
+    def replace_sequence(self, index, seq):
+        """Replace sequence #index, restarting it from its initial state."""
+        with self.lock:
+            self.sequences[index] = seq
+            self.compile_sequences()
+            self.latency.forget(index)
+            
+            # Reset initialization flag for this sequence
+            if index in self.sequence_initialized:
+                del self.sequence_initialized[index]
+            
+            # Reset multi-step state
+            seq_key = f"multi_{index}"
+            if seq_key in self.multi_step_states:
+                del self.multi_step_states[seq_key]
+            self.sync_conditions(index)
+            self.next_poll = 0.0
+
+    def remove_sequence(self, index):
+        """Remove sequence #index, applying its end state first."""
+        with self.lock:
+            seq = self.sequences[index]
+            if not seq.get('return_to_initial', False) and self.outputs:
+                self.apply_end_state(seq, index)
+                self.outputs.flush()
+            
+            self.sequences.pop(index)
+            self.enabled.pop(index)
+            self.compile_sequences()
+            # Later sequences move up one index; their traces would be mislabeled
+            self.latency.clear()
+            
+            # Clean up state tracking
+            if index in self.sequence_initialized:
+                del self.sequence_initialized[index]
+            self.sync_conditions()
+
+    def set_enabled(self, seq_id, enabled):
+        """Enable or disable sequence #seq_id; disabling applies its end state."""
+        with self.lock:
+            if seq_id >= len(self.sequences):
+                return
+            self.enabled[seq_id] = enabled
+            if enabled:
+                self.sync_conditions(seq_id)
+                self.next_poll = 0.0
+                return
+            
+            # Sequence disabled, apply end state
+            seq = self.sequences[seq_id]
+            if not seq.get('return_to_initial', False) and self.outputs:
+                self.apply_end_state(seq, seq_id)
+                self.outputs.flush()
+            # Reset initialization flag
+            if seq_id in self.sequence_initialized:
+                del self.sequence_initialized[seq_id]
+            # Reset multi-step state
+            seq_key = f"production_{seq_id}"
+            if seq_key in self.multi_step_states:
+                del self.multi_step_states[seq_key]
+            # Also check for old format
+            old_seq_key = f"multi_{seq_id}"
+            if old_seq_key in self.multi_step_states:
+                del self.multi_step_states[old_seq_key]
+            self.sync_conditions(seq_id)
+            # Cancel its waits and blinks; timed DO offs still run
+            self.timers.cancel_group(seq_id)
+            # Clear edge detection states
+            self.edge_memory.clear()
+            self.log_event(f"Sequence {seq_id} disabled")
+
+    def reset_edges(self):
+        """Reset all edge detection states."""
+        with self.lock:
+            self.edge_memory.clear()
+
+    def reset_outputs(self):
+        """Stop all sequences and timers and turn every DO OFF in one frame.
+
+        Raises the relay's exception if the write fails.
+        """
+        with self.lock:
+            # Stop all timers and clear states
+            self.timers.clear()
+            self.active_sequences.clear()
+            
+            # Reset all sequence states
+            for i in range(len(self.sequences)):
+                # Reset initialization flags
+                if i in self.sequence_initialized:
+                    del self.sequence_initialized[i]
+                
+                # Reset multi-step states
+                seq_key = f"production_{i}"
+                if seq_key in self.multi_step_states:
+                    del self.multi_step_states[seq_key]
+                
+                old_seq_key = f"multi_{i}"
+                if old_seq_key in self.multi_step_states:
+                    del self.multi_step_states[old_seq_key]
+            
+            self.sync_conditions()
+            
+            # Drop queued writes and pulses, so the next flush cannot turn
+            # outputs back on, then turn OFF all DO channels in a single frame
+            self.outputs.discard()
+            self.relay.set_outputs(0x00)
+            self.next_poll = 0.0
+
+    def shutdown(self):
+        """Stop all timers and apply the end state of every enabled sequence."""
+        with self.lock:
+            if not self.outputs:
+                return
+            self.timers.clear()
+            for i, seq in enumerate(self.sequences):
+                if self.enabled[i] and not seq.get('return_to_initial', False):
+                    self.apply_end_state(seq, i)
+            self.outputs.flush()
+
+    def state(self, stats=None):
+        """EngineState for display; starts a new di_seen / do_seen window."""
+        with self.lock:
+            state = EngineState(self, stats)
+            self.di_seen = self.snapshot.di_mask if self.snapshot else 0
+            self.do_seen = self.snapshot.do_mask if self.snapshot else 0
+            return state
+
+    def tick(self):
+        """Run due timers, then one control cycle if the next relay poll is due.
+
+        Returns True if the relay was polled. Errors are logged and kept in
+        self.error; the next poll is tried after the slowest poll interval.
+        """
+        with self.lock:
+            current_time = self.clock()
+            self.run_timers(current_time)
+            if not self.relay or current_time < self.next_poll:
+                return False
+            
+            try:
+                # Read DI and DO once; everything below uses this snapshot
+                self.reactions.clear()
+                sampled = self.clock()
+                self.snapshot = IOSnapshot.read(self.relay)
+                read = self.clock()
+                di_mask = self.snapshot.di_mask
+                # The poll's coil read doubles as the output shadow's resync
+                self.outputs.observe(self.snapshot.do_mask)
+                self.di_seen |= di_mask
+                self.do_seen |= self.snapshot.do_mask
+                self.error = None
+                
+                # Process sequences
+                self.process_sequences(di_mask)
+                
+                # Send this tick's DO changes; unchanged outputs cost no traffic
+                evaluated = self.clock()
+                self.outputs.flush()
+                if self.reactions:
+                    self.trace_reactions(sampled, read, evaluated)
+                self.last_sample = sampled
+                
+                # Schedule the next poll from DI activity; timers fire on their own
+                interval = self.poll_scheduler.next_interval(di_mask, waiting=self.is_waiting_on_input())
+            except Exception as e:
+                self.error = str(e)
+                self.log_event(f"Error: {e}")
+                interval = self.poll_scheduler.max_interval
+            self.next_poll = current_time + interval
+            return True
+
+    def trace(self, seq_id, step):
+        """Note that step (index, or station state) of seq_id switched outputs on this tick's inputs."""
+        self.reactions.append((seq_id, step))
+
+    def trace_reactions(self, sampled, read, evaluated):
+        """Record the reaction time of every step traced this tick; its writes are done."""
+        written = self.clock()
+        window = sampled - self.last_sample if self.last_sample is not None else 0.0
+        for key in self.reactions:
+            self.latency.record(key, read - sampled, evaluated - read, written - evaluated, window)
+        self.reactions.clear()
+
+    def next_deadline(self):
+        """self.clock() time the next timer is due, None if no timer is pending."""
+        with self.lock:
+            return self.timers.next_deadline()
+
+    def run_timers(self, now=None):
+        """Fire the timers due at now and send their DO changes.
+
+        Called by the engine thread when a timer falls due between ticks. A
+        fired timer brings the next poll forward, so steps waiting on the
+        result are evaluated on the next tick.
+        """
+        with self.lock:
+            if now is None:
+                now = self.clock()
+            if not self.timers.run_due(now):
+                return 0
+            try:
+                self.outputs.flush()
+            except Exception as e:
+                self.error = str(e)
+                self.log_event(f"Error: {e}")
+            self.next_poll = min(self.next_poll, now)
+            return 1
+
+    def step_timer_expired(self, do_ch, seq_id, now):
+        """Timed DO off of an executed step."""
+        self.outputs.off(do_ch)
+        self.log_event(f"Sequence {seq_id}: {self.do_name(do_ch)} turned OFF (timer)")
+
+    def wait_expired(self, seq_id, step_idx, subsequent_actions, now):
+        """End of a WAIT step: run its actions and let the sequence advance."""
+        # Execute subsequent actions if any
+        if subsequent_actions:
+            self.execute_actions(subsequent_actions, seq_id, step_idx)
+            self.log_event(f"Sequence {seq_id}: Wait completed, executed: {subsequent_actions.text}")
+        else:
+            self.log_event(f"Sequence {seq_id}: Wait completed")
+        
+        # Advance to next step
+        multi_key = f"production_{seq_id}"
+        if multi_key in self.multi_step_states:
+            self.multi_step_states[multi_key]['waiting'] = False
+            self.sync_conditions(seq_id)
+
+    def blink_phase(self, blink_key, do_ch, seq_id, end_time, due, now):
+        """Start the next board-timed on phase of a blink due at `due`, or end the blink."""
+        # Check if blink period has ended
+        if now >= end_time:
+            self.outputs.off(do_ch)
+            self.log_event(f"Sequence {seq_id}: {self.do_name(do_ch)} blink completed")
+            return
+        
+        # Start the next on phase; the board turns it off again
+        self.outputs.flash(do_ch, int(BLINK_PERIOD * 1000))
+        next_time = due + BLINK_PERIOD
+        if next_time <= now:
+            next_time = now + BLINK_PERIOD
+        self.timers.schedule(blink_key, next_time,
+                             partial(self.blink_phase, blink_key, do_ch, seq_id, end_time, next_time),
+                             group=seq_id)
+
+    def is_waiting_on_input(self):
+        """Return True if a running sequence is waiting for a DI to change."""
+        for state in self.active_sequences.values():
+            if isinstance(state, dict) and state.get('state') != 'waiting_for_part':
+                return True
+        for state in self.multi_step_states.values():
+            if state.get('current_step', 0) > 0 and not state.get('waiting', False):
+                return True
+        return False
+
+    def process_sequences(self, di_mask):
+        """Process all enabled sequences based on current DI state."""
+        # Production line conditions test DI and DO bits of one state word
+        do_mask = self.snapshot.do_mask if self.snapshot is not None else self.relay.check_DO()
+        word = state_word(di_mask, do_mask, len(self.board_names))
+        if self.condition_table is None:
+            for i, seq in enumerate(self.sequences):
+                if not self.enabled[i]:
+                    continue
+                
+                # Apply initial state if first time enabled
+                self.apply_initial_state(seq, i)
+                
+                if seq['type'] == 'station':
+                    self.process_station_operation(seq, di_mask, i)
+                else:
+                    self.process_production_line(seq, word, i)
+            return
+        
+        # Only the production lines with a step that can run this tick, from
+        # that step on; stations and first-time initial states as above
+        starts = dict(self.condition_table.due(word))
+        for i in sorted(starts.keys() | self.station_ids | self.uninitialized):
+            if not self.enabled[i]:
+                continue
+            seq = self.sequences[i]
+            self.apply_initial_state(seq, i)
+            self.uninitialized.discard(i)
+            
+            if seq['type'] == 'station':
+                self.process_station_operation(seq, di_mask, i)
+            else:
+                self.process_production_line(seq, word, i, starts.get(i))
+                self.sync_conditions(i)
+    
+    def process_station_operation(self, seq, di_mask, seq_id):
+        """Process station operation with sensor feedback and error handling."""
+        operation_type = seq.get('operation_type', 'Part Detection & Process')
+        
+        # Handle Tool Picking Sequence
+        if operation_type == "Tool Picking Sequence":
+            return self.process_tool_picking_sequence(seq, di_mask, seq_id)
+        
+        # Handle other station operations
+        part_sensor = seq.get('part_sensor', 1)
+        process_device = seq.get('process_device', 1)
+        feedback_sensor = seq.get('feedback_sensor', 2)
+        skip_sensor = seq.get('skip_sensor', 3)
+        timeout = seq.get('timeout', 10)
+        duration = seq.get('duration', 5)
+        
+        # Check if part is detected
+        part_detected = bool(di_mask & (1 << (part_sensor - 1)))
+        feedback_detected = bool(di_mask & (1 << (feedback_sensor - 1)))
+        skip_detected = bool(di_mask & (1 << (skip_sensor - 1)))
+        
+        station_key = f"station_{seq_id}_{process_device}"
+        blink_key = ('station_blink', seq_id, process_device)
+        
+        # State tracking for this station
+        if station_key not in self.active_sequences:
+            self.active_sequences[station_key] = {
+                'state': 'waiting_for_part',
+                'start_time': None,
+                'process_start_time': None
+            }
+        
+        station_state = self.active_sequences[station_key]
+        current_time = self.clock()
+        
+        if station_state['state'] == 'waiting_for_part':
+            if part_detected:
+                if skip_detected:
+                    # Skip process due to error condition
+                    self.log_event(f"Station {seq_id}: Part detected but skip sensor active - skipping process")
+                    station_state['state'] = 'waiting_for_part'  # Reset to wait for next part
+                else:
+                    # Start process
+                    self.trace(seq_id, 'waiting_for_part')
+                    station_state['state'] = 'processing'
+                    station_state['start_time'] = current_time
+                    station_state['process_start_time'] = current_time
+                    
+                    if seq.get('blink_mode', False):
+                        # Start blink mode
+                        if duration > 0:
+                            self.start_blink(blink_key, process_device, seq_id, duration)
+                            self.log_event(f"Station {seq_id}: Started processing (blinking) for {duration}s")
+                        else:
+                            # Process until feedback
+                            self.outputs.on(process_device)
+                            self.log_event(f"Station {seq_id}: Started processing (blink until feedback)")
+                    else:
+                        # Normal processing
+                        self.outputs.on(process_device)
+                        if duration > 0:
+                            self.log_event(f"Station {seq_id}: Started processing for {duration}s")
+                        else:
+                            self.log_event(f"Station {seq_id}: Started processing until feedback")
+        
+        elif station_state['state'] == 'processing':
+            # Check for completion conditions
+            process_complete = False
+            
+            if duration > 0 and (current_time - station_state['process_start_time']) >= duration:
+                # Duration-based completion
+                process_complete = True
+                self.log_event(f"Station {seq_id}: Process completed (duration timeout)")
+            elif duration == 0 and feedback_detected:
+                # Feedback-based completion
+                process_complete = True
+                self.trace(seq_id, 'processing')
+                self.log_event(f"Station {seq_id}: Process completed (feedback received)")
+            elif (current_time - station_state['start_time']) >= timeout:
+                # Timeout - process failed
+                self.outputs.off(process_device)
+                self.log_event(f"Station {seq_id}: Process TIMEOUT - stopping operation")
+                station_state['state'] = 'waiting_for_part'
+                # Clear any blink timers
+                self.timers.cancel(blink_key)
+                return
+            
+            if process_complete:
+                # Stop processing
+                if not seq.get('blink_mode', False) or duration > 0:
+                    self.outputs.off(process_device)
+                
+                # Clear blink timers if they exist
+                self.timers.cancel(blink_key)
+                
+                station_state['state'] = 'waiting_for_clear'
+                self.log_event(f"Station {seq_id}: Waiting for part to clear")
+        
+        elif station_state['state'] == 'waiting_for_clear':
+            if not part_detected:
+                # Part has cleared, ready for next cycle
+                station_state['state'] = 'waiting_for_part'
+                self.log_event(f"Station {seq_id}: Part cleared - ready for next part")
+    
+    def process_tool_picking_sequence(self, seq, di_mask, seq_id):
+        """Process tool picking sequence with specific workflow."""
+        # Get configuration
+        part_sensor = seq.get('part_sensor', 4)  # DI4
+        process_device = seq.get('process_device', 4)  # DO4
+        first_tool_light = seq.get('first_tool_light', 2)  # DO2
+        second_tool_light = seq.get('second_tool_light', 3)  # DO3
+        tools_picked_sensor = seq.get('tools_picked_sensor', 3)  # DI3
+        tools_collected_sensor = seq.get('tools_collected_sensor', 2)  # DI2
+        alarm_device = seq.get('alarm_device', 5)  # DO5
+        timeout = seq.get('timeout', 30)
+        
+        # Get sensor states
+        part_detected = bool(di_mask & (1 << (part_sensor - 1)))
+        tools_picked = bool(di_mask & (1 << (tools_picked_sensor - 1)))
+        tools_collected = bool(di_mask & (1 << (tools_collected_sensor - 1)))
+        
+        tool_key = f"tool_picking_{seq_id}"
+        current_time = self.clock()
+        
+        # Initialize state if not exists
+        if tool_key not in self.active_sequences:
+            self.active_sequences[tool_key] = {
+                'state': 'waiting_for_part',
+                'start_time': None,
+                'step_start_time': None
+            }
+        
+        tool_state = self.active_sequences[tool_key]
+        
+        if tool_state['state'] == 'waiting_for_part':
+            if part_detected:
+                # Step 1: Part detected, start process
+                self.trace(seq_id, tool_state['state'])
+                self.outputs.on(process_device)  # DO4 ON
+                self.outputs.on(first_tool_light)  # DO2 ON (1st tool light)
+                tool_state['state'] = 'waiting_for_first_tool'
+                tool_state['start_time'] = current_time
+                tool_state['step_start_time'] = current_time
+                self.log_event(f"Tool Picking {seq_id}: Part detected - Process ON, 1st tool light ON")
+        
+        elif tool_state['state'] == 'waiting_for_first_tool':
+            if tools_picked:
+                # Step 2: Tools picked, show second tool
+                self.trace(seq_id, tool_state['state'])
+                self.outputs.off(first_tool_light)  # DO2 OFF
+                self.outputs.on(second_tool_light)  # DO3 ON (2nd tool light)
+                tool_state['state'] = 'waiting_for_second_tool'
+                tool_state['step_start_time'] = current_time
+                self.log_event(f"Tool Picking {seq_id}: 1st tools picked - 2nd tool light ON")
+            elif (current_time - tool_state['step_start_time']) >= timeout:
+                # Timeout - activate alarm
+                self.outputs.on(alarm_device)  # DO5 ON (alarm)
+                tool_state['state'] = 'alarm_first_tool'
+                self.log_event(f"Tool Picking {seq_id}: TIMEOUT waiting for 1st tools - ALARM ON")
+        
+        elif tool_state['state'] == 'alarm_first_tool':
+            if tools_picked:
+                # Clear alarm and continue
+                self.trace(seq_id, tool_state['state'])
+                self.outputs.off(alarm_device)  # DO5 OFF
+                self.outputs.off(first_tool_light)  # DO2 OFF
+                self.outputs.on(second_tool_light)  # DO3 ON
+                tool_state['state'] = 'waiting_for_second_tool'
+                tool_state['step_start_time'] = current_time
+                self.log_event(f"Tool Picking {seq_id}: 1st tools picked (after alarm) - continuing")
+        
+        elif tool_state['state'] == 'waiting_for_second_tool':
+            if tools_collected:
+                # Step 3: All tools collected, complete sequence
+                self.trace(seq_id, tool_state['state'])
+                self.outputs.off(second_tool_light)  # DO3 OFF
+                self.outputs.off(process_device)  # DO4 OFF
+                tool_state['state'] = 'waiting_for_part_clear'
+                self.log_event(f"Tool Picking {seq_id}: All tools collected - sequence complete")
+            elif (current_time - tool_state['step_start_time']) >= timeout:
+                # Timeout - activate alarm
+                self.outputs.on(alarm_device)  # DO5 ON (alarm)
+                tool_state['state'] = 'alarm_second_tool'
+                self.log_event(f"Tool Picking {seq_id}: TIMEOUT waiting for 2nd tools - ALARM ON")
+        
+        elif tool_state['state'] == 'alarm_second_tool':
+            if tools_collected:
+                # Clear alarm and complete
+                self.trace(seq_id, tool_state['state'])
+                self.outputs.off(alarm_device)  # DO5 OFF
+                self.outputs.off(second_tool_light)  # DO3 OFF
+                self.outputs.off(process_device)  # DO4 OFF
+                tool_state['state'] = 'waiting_for_part_clear'
+                self.log_event(f"Tool Picking {seq_id}: All tools collected (after alarm) - complete")
+        
+        elif tool_state['state'] == 'waiting_for_part_clear':
+            if not part_detected:
+                # Part cleared, ready for next cycle
+                tool_state['state'] = 'waiting_for_part'
+                self.log_event(f"Tool Picking {seq_id}: Part cleared - ready for next cycle")
+
+    def process_production_line(self, seq, word, seq_id, start=None):
+        """Process production line sequence with enhanced sensor-based control.
+        
+        Args:
+            word (int): DI/DO state word of this tick (see state_word)
+            start (int): first step to evaluate, if the condition table showed
+                the steps from the current one up to it cannot run this tick
+        """
+        compiled = self.compiled_sequences[seq_id]
+        seq_key = f"production_{seq_id}"
+        
+        if seq_key not in self.multi_step_states:
+            self.multi_step_states[seq_key] = {
+                'current_step': 0, 
+                'completed': set(),
+                'waiting': False
+            }
+        
+        state = self.multi_step_states[seq_key]
+        
+        # If waiting, don't process new steps
+        if state.get('waiting', False):
+            return
+        
+        steps = compiled.steps
+        first = state['current_step'] if start is None else start
+        for step_idx in range(first, len(steps)):
+            step = steps[step_idx]
+            if step.kind == STEP_SKIP:
+                continue
+            
+            # A WAIT step starts as soon as it is reached
+            if step.kind == STEP_WAIT:
+                if step_idx not in state['completed']:
+                    self.start_wait(state, seq_id, step_idx, step)
+                    break
+                continue
+            
+            trigger = step.condition.evaluate(word, self.edge_memory)
+            
+            if trigger and step_idx not in state['completed']:
+                if step.kind == STEP_NOOP:
+                    continue
+                if step.kind == STEP_DELAY:
+                    self.start_wait(state, seq_id, step_idx, step)
+                    break
+                
+                self.execute_actions(step.actions, seq_id, step_idx)
+                self.trace(seq_id, step_idx)
+                
+                state['completed'].add(step_idx)
+                state['current_step'] = step_idx + 1
+                
+                # Check if this is the last step
+                if step_idx == compiled.last_index:
+                    # Sequence complete
+                    if seq.get('return_to_initial', False):
+                        self.log_event(f"Sequence {seq_id}: Completed, returning to initial state")
+                        self.reapply_initial_state(seq, seq_id)
+                    else:
+                        self.apply_end_state(seq, seq_id)
+                    
+                    # Reset sequence state for next run
+                    self.multi_step_states[seq_key] = {
+                        'current_step': 0, 
+                        'completed': set(),
+                        'waiting': False
+                    }
+                break
+    
+    def start_wait(self, state, seq_id, step_idx, step):
+        """Start the wait of a WAIT step; its actions run when the wait timer fires."""
+        self.timers.schedule(('wait', seq_id, step_idx), self.clock() + step.wait,
+                             partial(self.wait_expired, seq_id, step_idx, step.actions), group=seq_id)
+        state['waiting'] = True
+        state['completed'].add(step_idx)
+        state['current_step'] = step_idx + 1
+        if step.actions:
+            self.log_event(f"Sequence {seq_id} Step {step_idx}: Waiting {step.wait}s, then executing: {step.actions.text}")
+        else:
+            self.log_event(f"Sequence {seq_id} Step {step_idx}: Waiting {step.wait}s")
+    
+    def execute_actions(self, actions, seq_id, step_idx):
+        """Execute a compiled action list (models.compiled_sequence.ActionSet)."""
+        duration = actions.duration
+        
+        # Plain ON/OFF changes go out in one frame; timed ON and BLINK are
+        # timed by the board (pulse/flash commands)
+        self.write_outputs(actions.on_mask, actions.write_mask)
+        
+        for do_ch, state_part in actions.changes:
+            if state_part == 'ON':
+                if actions.pulsed:
+                    self.outputs.pulse(do_ch, duration * 1000)
+                    self.log_event(f"Multi-sequence {seq_id} Step {step_idx}: {self.do_name(do_ch)} ON for {duration}s (board timed)")
+                    continue
+                
+                self.log_event(f"Multi-sequence {seq_id} Step {step_idx}: {self.do_name(do_ch)} ON")
+                
+                # Schedule turn off if duration specified
+                if duration > 0:
+                    # No group: a timed output still turns off if the sequence is disabled
+                    self.timers.schedule(('step', seq_id, step_idx, do_ch), self.clock() + duration,
+                                         partial(self.step_timer_expired, do_ch, seq_id))
+                    self.log_event(f"Sequence {seq_id}: {self.do_name(do_ch)} will turn OFF in {duration}s")
+            
+            elif state_part == 'OFF':
+                self.log_event(f"Multi-sequence {seq_id} Step {step_idx}: {self.do_name(do_ch)} OFF")
+            
+            elif state_part == 'BLINK':
+                # Start blink mode
+                blink_key = ('blink', seq_id, step_idx, do_ch)
+                if duration > 0:
+                    self.start_blink(blink_key, do_ch, seq_id, duration)
+                    self.log_event(f"Multi-sequence {seq_id} Step {step_idx}: {self.do_name(do_ch)} started blinking for {duration}s")
+                else:
+                    self.log_event(f"Multi-sequence {seq_id} Step {step_idx}: BLINK requires duration")
+    
+    def start_blink(self, blink_key, do_ch, seq_id, duration):
+        """Blink DO<do_ch> for duration seconds, one board-timed on phase per period."""
+        now = self.clock()
+        next_time = now + BLINK_PERIOD
+        self.timers.schedule(blink_key, next_time,
+                             partial(self.blink_phase, blink_key, do_ch, seq_id, now + duration, next_time),
+                             group=seq_id)
+        self.outputs.flash(do_ch, int(BLINK_PERIOD * 1000))
+    
+    def write_outputs(self, on_mask, write_mask):
+        """Queue the DO channels in write_mask; they are sent with the tick's other writes.
+        
+        Args:
+            on_mask (int): Desired DO states, bit 0 = DO1
+            write_mask (int): DO channels to write, bit 0 = DO1
+        """
+        self.outputs.set_mask(on_mask, write_mask)
+    
+    def get_do_state(self, channel):
+        """Return DO state from the current tick's snapshot, reading the relay if there is none."""
+        if self.snapshot is not None:
+            return self.snapshot.do(channel)
+        return self.relay.status(channel)
+    
+    def apply_initial_state(self, seq, seq_id):
+        """Apply initial state for a sequence."""
+        if seq_id in self.sequence_initialized:
+            return
+        
+        if seq.get('initial_states'):
+            for do_ch, state in seq['initial_states'].items():
+                do_ch = int(do_ch)  # Ensure it's an integer
+                if state:
+                    self.outputs.on(do_ch)
+                    self.log_event(f"Sequence {seq_id}: Initial state - {self.do_name(do_ch)} ON")
+                else:
+                    self.outputs.off(do_ch)
+                    self.log_event(f"Sequence {seq_id}: Initial state - {self.do_name(do_ch)} OFF")
+        
+        self.sequence_initialized[seq_id] = True
+    
+    def reapply_initial_state(self, seq, seq_id):
+        """Re-apply initial state without checking initialization flag."""
+        if seq.get('initial_states'):
+            for do_ch, state in seq['initial_states'].items():
+                do_ch = int(do_ch)  # Ensure it's an integer
+                if state:
+                    self.outputs.on(do_ch)
+                    self.log_event(f"Sequence {seq_id}: Return to initial - {self.do_name(do_ch)} ON")
+                else:
+                    self.outputs.off(do_ch)
+                    self.log_event(f"Sequence {seq_id}: Return to initial - {self.do_name(do_ch)} OFF")
+    
+    def apply_end_state(self, seq, seq_id):
+        """Apply end state for a sequence."""
+        if seq.get('end_states'):
+            for do_ch, state in seq['end_states'].items():
+                do_ch = int(do_ch)  # Ensure it's an integer
+                if state:
+                    self.outputs.on(do_ch)
+                    self.log_event(f"Sequence {seq_id}: End state - {self.do_name(do_ch)} ON")
+                else:
+                    self.outputs.off(do_ch)
+                    self.log_event(f"Sequence {seq_id}: End state - {self.do_name(do_ch)} OFF")
@@ -0,0 +1,472 @@
+"""Virtual-time simulation of the sequence engine.
+
+Runs a SequenceEngine against an in-process VirtualRelay on a VirtualClock,
+with the digital inputs driven by a DIScript, so a shift of WAIT steps and
+station timeouts runs in seconds. Time jumps straight to the next relay
+poll, timer deadline or scripted DI change; nothing sleeps.
+
+The engine is driven as EngineThread drives it: polls start on the tick
+grid (multiples of `tick`) once the engine's poll scheduler wants one, and
+timers fire at their deadline between ticks. A DI change is therefore seen
+at the first poll after it, as on a real board.
+
+The report has the time each production line step took (from the previous
+step, or the start of the cycle, to its trigger), the time spent in each
+station state, cycle times and the final DO states.
+
+A script is built in code or loaded from JSON (see DIScript.from_dict):
+
+    {"events": [[0.5, 1, true]],
+     "cycles": [{"period": 30, "count": 960, "start": 1.0,
+                 "events": [[0, 1, true], [2.5, 2, true], [8, 1, false], [8, 2, false]]}],
+     "reactions": [{"do": 4, "on": true, "di": 3, "state": true, "delay": 0.8}]}
+
+events are (seconds, DI channel, state); a cycle repeats its events every
+period; a reaction switches a DI `delay` seconds after a DO switches, e.g. a
+feedback sensor answering its output. With named boards in the
+configuration every board is simulated; channels are numbered on across
+them, so DI / DO 9 is channel 1 of the first named board.
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+
+from relay_b import flash_units
+from engine.sequence_engine import SequenceEngine
+from utils.board_group import CHANNELS, BoardGroup
+
+
+class VirtualClock:
+    """Simulated monotonic time in seconds; only Simulation moves it."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+class VirtualRelay:
+    """In-process stand-in for relay_b.Relay: no sockets, state on a VirtualClock.
+
+    DI states are set by the simulation. DO writes take effect immediately;
+    board-timed pulses end at their exact virtual end time. Every DO change
+    is passed to on_change(time, channel + offset, state); offset numbers
+    the channels of one board of a BoardGroup.
+    """
+
+    def __init__(self, clock, on_change=None, offset=0):
+        self.clock = clock
+        self.on_change = on_change
+        self.offset = offset
+        self.host = 'virtual'
+        self.port = 0
+        self.sock = None
+        self.capture = None
+        self.on_mismatch = None
+        self.lock = threading.RLock()
+        self.di_mask = 0
+        self.do_mask = 0
+        self._pulse_end = {}  # coil bit -> virtual end time of a board-timed pulse
+
+    def _set(self, mask, channels, now):
+        changed = (self.do_mask ^ mask) & channels
+        self.do_mask = (self.do_mask & ~channels) | (mask & channels)
+        if changed and self.on_change:
+            for channel in range(1, 9):
+                if changed & (1 << (channel - 1)):
+                    self.on_change(now, channel + self.offset, bool(mask & (1 << (channel - 1))))
+
+    def expire(self, now=None):
+        """End the board-timed pulses that are due, at their own end time."""
+        if now is None:
+            now = self.clock()
+        for bit, end in sorted(self._pulse_end.items(), key=lambda item: item[1]):
+            if end <= now:
+                del self._pulse_end[bit]
+                self._set(0, bit, end)
+
+    def next_pulse_end(self):
+        return min(self._pulse_end.values(), default=None)
+
+    def check_DI(self):
+        return self.di_mask
+
+    read_DI = check_DI
+
+    def check_DO(self):
+        self.expire()
+        return self.do_mask
+
+    # Split-phase reads as used by BoardGroup; nothing is in flight
+    def request_DI(self):
+        pass
+
+    response_DI = check_DI
+
+    def request_DO(self):
+        pass
+
+    response_DO = check_DO
+
+    def status(self, channel):
+        return bool(self.check_DO() & (1 << (channel - 1)))
+
+    def set_outputs(self, mask, channels=0xFF, verify=False):
+        channels &= 0xFF
+        self.expire()
+        for bit in [bit for bit in self._pulse_end if bit & channels]:
+            del self._pulse_end[bit]
+        self._set(mask, channels, self.clock())
+
+    def on(self, channel):
+        self.set_outputs(0xFF, 1 << (channel - 1))
+
+    def off(self, channel):
+        self.set_outputs(0x00, 1 << (channel - 1))
+
+    def all_off(self):
+        self.set_outputs(0x00)
+
+    def pulse(self, channel, ms):
+        bit = 1 << (channel - 1)
+        units = flash_units(ms)
+        self.expire()
+        self._set(bit, bit, self.clock())
+        self._pulse_end[bit] = self.clock() + units * 0.1
+
+    def flash(self, channel, period):
+        self.pulse(channel, period // 2)
+
+
+class DIScript:
+    """Scripted digital inputs: timed changes, repeated cycles and reactions to outputs."""
+
+    def __init__(self):
+        self._events = []  # heap of (time, order, channel, state)
+        self._order = itertools.count()
+        self.reactions = {}  # (DO channel, DO state) -> [(DI channel, DI state, delay)]
+
+    def set(self, t, channel, state):
+        """Switch DI<channel> to state at t seconds (9-16 for the second board, ...)."""
+        if channel < 1:
+            raise ValueError("DI channel must be 1 or higher")
+        heapq.heappush(self._events, (t, next(self._order), channel, bool(state)))
+
+    def pulse(self, t, channel, width):
+        """DI<channel> ON at t seconds for width seconds."""
+        self.set(t, channel, True)
+        self.set(t + width, channel, False)
+
+    def cycle(self, period, count, events, start=0.0):
+        """Repeat events, (offset, channel, state) tuples, every period seconds."""
+        for n in range(count):
+            for offset, channel, state in events:
+                self.set(start + n * period + offset, channel, state)
+
+    def react(self, do_channel, do_state, di_channel, di_state, delay):
+        """Switch DI<di_channel> to di_state delay seconds after DO<do_channel> goes to do_state."""
+        self.reactions.setdefault((do_channel, bool(do_state)), []).append((di_channel, bool(di_state), delay))
+
+    def output_changed(self, t, channel, state):
+        for di_channel, di_state, delay in self.reactions.get((channel, state), ()):
+            self.set(t + delay, di_channel, di_state)
+
+    def next_time(self):
+        return self._events[0][0] if self._events else None
+
+    def apply_due(self, now, di_mask):
+        """Return di_mask with every change due at now applied."""
+        while self._events and self._events[0][0] <= now:
+            _, _, channel, state = heapq.heappop(self._events)
+            bit = 1 << (channel - 1)
+            di_mask = di_mask | bit if state else di_mask & ~bit
+        return di_mask
+
+    @classmethod
+    def from_dict(cls, data):
+        """Script from the JSON layout in the module docstring."""
+        script = cls()
+        for t, channel, state in data.get('events', []):
+            script.set(t, channel, state)
+        for cycle in data.get('cycles', []):
+            script.cycle(cycle['period'], cycle['count'], cycle['events'], cycle.get('start', 0.0))
+        for reaction in data.get('reactions', []):
+            script.react(reaction['do'], reaction.get('on', True), reaction['di'],
+                         reaction.get('state', True), reaction.get('delay', 0.0))
+        return script
+
+
+def _summary(samples):
+    return {'count': len(samples), 'mean': sum(samples) / len(samples),
+            'min': min(samples), 'max': max(samples)}
+
+
+class Simulation:
+    """A SequenceEngine on virtual time, driven by a DIScript.
+
+    Args:
+        config: controller configuration dict (sequences, enabled_states, ...)
+        script: DIScript for the digital inputs
+        tick: engine tick in seconds; polls start on this grid
+        log: called with "<virtual time> <message>" for each engine event,
+            None to only count them
+    """
+
+    def __init__(self, config, script, tick=0.01, log=None):
+        self.clock = VirtualClock()
+        self.script = script
+        self.tick = tick
+        self.log = log
+        self.engine = SequenceEngine(log=self._log, clock=self.clock)
+        self.engine.load(config)
+        # One virtual board per board of the configuration
+        names = self.engine.board_names
+        self.boards = [VirtualRelay(self.clock, on_change=self._output_changed, offset=board * CHANNELS)
+                       for board in range(len(names))]
+        self.relay = BoardGroup(self.boards, names) if len(self.boards) > 1 else self.boards[0]
+        self.engine.attach(self.relay)
+        self.polls = 0
+        self.skipped_polls = 0  # polls replayed by _skip_idle_polls
+        self.events = 0
+        # Per sequence: [current step or state, time it became current, cycle start]
+        self._marks = {}
+        self.step_times = {}   # (seq_id, step index or station state) -> [seconds]
+        self.cycle_times = {}  # seq_id -> [seconds]
+        # Per DO channel: [switch count, total on time, time switched on or None]
+        self.outputs = {channel: [0, 0.0, None] for channel in range(1, CHANNELS * len(self.boards) + 1)}
+
+    def _log(self, message):
+        self.events += 1
+        if self.log:
+            self.log(f"{self.clock.now:12.3f} {message}")
+
+    @property
+    def di_mask(self):
+        """DI states of all boards, 8 bits per board."""
+        return sum(board.di_mask << (CHANNELS * i) for i, board in enumerate(self.boards))
+
+    @di_mask.setter
+    def di_mask(self, mask):
+        for i, board in enumerate(self.boards):
+            board.di_mask = (mask >> (CHANNELS * i)) & 0xFF
+
+    @property
+    def do_mask(self):
+        """DO states of all boards, 8 bits per board."""
+        return sum(board.do_mask << (CHANNELS * i) for i, board in enumerate(self.boards))
+
+    def _expire(self, now):
+        for board in self.boards:
+            board.expire(now)
+
+    def _next_pulse_end(self):
+        return min((t for t in (board.next_pulse_end() for board in self.boards) if t is not None), default=None)
+
+    def _output_changed(self, t, channel, state):
+        record = self.outputs[channel]
+        record[0] += 1
+        if state:
+            record[2] = t
+        elif record[2] is not None:
+            record[1] += t - record[2]
+            record[2] = None
+        self.script.output_changed(t, channel, state)
+
+    def _next_poll_time(self):
+        """Time of the next poll: on the tick grid, never before the engine wants it."""
+        next_poll = self.engine.next_poll
+        return max(math.ceil(next_poll / self.tick - 1e-9) * self.tick, next_poll)
+
+    def _fingerprint(self):
+        """Everything a poll can change; an unchanged fingerprint means the poll did nothing."""
+        engine = self.engine
+        return (self.do_mask, engine.edge_memory.state, self.events, len(engine.timers),
+                tuple((state['current_step'], state['waiting']) for state in engine.multi_step_states.values()),
+                tuple(state.get('state') if isinstance(state, dict) else state
+                      for state in engine.active_sequences.values()))
+
+    def _station_key(self, seq_id, seq):
+        if seq.get('operation_type') == "Tool Picking Sequence":
+            return f"tool_picking_{seq_id}"
+        return f"station_{seq_id}_{seq.get('process_device', 1)}"
+
+    def _station_deadline(self):
+        """Earliest time a station state can end on its timeout or duration, inf if none."""
+        engine = self.engine
+        deadline = math.inf
+        for seq_id, seq in enumerate(engine.sequences):
+            if seq['type'] != 'station':
+                continue
+            state = engine.active_sequences.get(self._station_key(seq_id, seq))
+            if not state:
+                continue
+            if state['state'] == 'processing':
+                due = state['start_time'] + seq.get('timeout', 10)
+                if seq.get('duration', 5) > 0:
+                    due = min(due, state['process_start_time'] + seq.get('duration', 5))
+            elif state['state'] in ('waiting_for_first_tool', 'waiting_for_second_tool'):
+                due = state['step_start_time'] + seq.get('timeout', 30)
+            else:
+                continue
+            deadline = min(deadline, due)
+        return deadline
+
+    def _skip_idle_polls(self, until, end):
+        """Replay polls before `until` that would find nothing to do.
+
+        Only called after a poll changed nothing: with the same DI and DO
+        states the next polls evaluate the same conditions to the same
+        result until a station timeout or duration runs out, so only the
+        poll scheduler sees them. It is still run for each of them, so the
+        poll times after the skip match a real run.
+        """
+        engine = self.engine
+        waiting = engine.is_waiting_on_input()
+        di_mask = self.di_mask
+        poll = self._next_poll_time()
+        while poll < until and poll <= end:
+            self.clock.now = poll
+            engine.next_poll = poll + engine.poll_scheduler.next_interval(di_mask, waiting=waiting)
+            self.polls += 1
+            self.skipped_polls += 1
+            poll = self._next_poll_time()
+
+    def run(self, duration):
+        """Advance virtual time by duration seconds and return report()."""
+        engine = self.engine
+        clock = self.clock
+        end = clock.now + duration
+        started = time.perf_counter()
+        idle = False
+        while True:
+            deadline = engine.timers.next_deadline()
+            event = math.inf
+            for t in (deadline, self.script.next_time(), self._next_pulse_end()):
+                if t is not None and t < event:
+                    event = t
+            if idle:
+                self._skip_idle_polls(min(event, self._station_deadline()), end)
+            poll = self._next_poll_time()
+            now = max(clock.now, min(poll, event))
+            if now > end:
+                clock.now = end
+                self._expire(end)
+                break
+            clock.now = now
+
+            idle = False
+            self._expire(now)
+            self.di_mask = self.script.apply_due(now, self.di_mask)
+            if now >= poll:
+                before = self._fingerprint()
+                if engine.tick():
+                    self.polls += 1
+                    idle = self._fingerprint() == before
+            elif deadline is not None and now >= deadline:
+                engine.run_timers(now)
+            self._observe(now)
+        self.wall_time = time.perf_counter() - started
+        return self.report()
+
+    def _observe(self, now):
+        """Record step and station state changes since the last engine call."""
+        engine = self.engine
+        for seq_id, seq in enumerate(engine.sequences):
+            if seq['type'] == 'station':
+                state = engine.active_sequences.get(self._station_key(seq_id, seq))
+                current = state['state'] if state else 'waiting_for_part'
+            else:
+                state = engine.multi_step_states.get(f"production_{seq_id}")
+                current = state['current_step'] if state else 0
+
+            mark = self._marks.get(seq_id)
+            if mark is None or type(mark[0]) is not type(current):
+                # First look, or the sequence was replaced by one of the other type
+                self._marks[seq_id] = [current, now, now]
+                continue
+            previous, since, cycle_start = mark
+            if current == previous:
+                continue
+
+            if seq['type'] == 'station':
+                self.step_times.setdefault((seq_id, previous), []).append(now - since)
+                cycle_done = current == 'waiting_for_part'
+            else:
+                # Steps only move forward; back to 0 means the last step completed
+                completed = current - 1 if current > previous else engine.compiled_sequences[seq_id].last_index
+                self.step_times.setdefault((seq_id, completed), []).append(now - since)
+                cycle_done = current == 0
+            if cycle_done:
+                self.cycle_times.setdefault(seq_id, []).append(now - cycle_start)
+                cycle_start = now
+            self._marks[seq_id] = [current, now, cycle_start]
+
+    def report(self):
+        """Run statistics, per-step timings and final DO states as a dict."""
+        sequences = []
+        for seq_id, seq in enumerate(self.engine.sequences):
+            compiled = self.engine.compiled_sequences[seq_id]
+            steps = []
+            for (step_seq, step), samples in self.step_times.items():
+                if step_seq != seq_id:
+                    continue
+                # Step numbers index the current steps; sequences edited during the run may have fewer
+                if isinstance(step, int) and compiled is not None and step < len(compiled):
+                    text = compiled.steps[step].text
+                else:
+                    text = str(step)
+                steps.append(dict(_summary(samples), step=step, text=text))
+            steps.sort(key=lambda entry: (isinstance(entry['step'], str), entry['step']))
+            entry = {'id': seq_id, 'type': seq['type'], 'enabled': self.engine.enabled[seq_id], 'steps': steps}
+            if self.cycle_times.get(seq_id):
+                entry['cycles'] = _summary(self.cycle_times[seq_id])
+            sequences.append(entry)
+
+        outputs = {}
+        for channel, (switches, on_time, on_since) in self.outputs.items():
+            if on_since is not None:
+                on_time += self.clock.now - on_since
+            outputs[channel] = {'name': self.engine.do_name(channel),
+                                'state': bool(self.do_mask & (1 << (channel - 1))),
+                                'switches': switches, 'on_time': on_time}
+        return {
+            'duration': self.clock.now,
+            'wall_time': getattr(self, 'wall_time', 0.0),
+            'polls': self.polls,
+            'skipped_polls': self.skipped_polls,
+            'events': self.events,
+            'sequences': sequences,
+            'do_mask': self.do_mask,
+            'outputs': outputs,
+            # Reaction times on virtual time: polls are instant, so this is the poll window
+            'latency': self.engine.latency.summary(),
+        }
+
+
+def format_report(report):
+    """Human readable form of Simulation.report()."""
+    wall = report['wall_time']
+    lines = [f"Simulated {report['duration']:.1f} s in {wall:.2f} s "
+             f"({report['duration'] / wall if wall else float('inf'):.0f}x), "
+             f"{report['polls']} polls ({report['skipped_polls']} idle), {report['events']} events"]
+    for seq in report['sequences']:
+        header = f"Sequence {seq['id']} ({seq['type']}{'' if seq['enabled'] else ', disabled'})"
+        if 'cycles' in seq:
+            cycles = seq['cycles']
+            header += (f": {cycles['count']} cycles, mean {cycles['mean']:.3f} s, "
+                       f"min {cycles['min']:.3f} s, max {cycles['max']:.3f} s")
+        lines.append(header)
+        for step in seq['steps']:
+            label = f"step {step['step']}" if isinstance(step['step'], int) else step['step']
+            lines.append(f"  {label:<24} n={step['count']:<6} mean {step['mean']:8.3f} s  "
+                         f"min {step['min']:8.3f} s  max {step['max']:8.3f} s  {step['text'] if label != step['text'] else ''}")
+    states = ' '.join(f"{entry['name']}={'ON' if entry['state'] else 'OFF'}" for entry in report['outputs'].values())
+    lines.append(f"Final outputs: {states}")
+    for entry in report['outputs'].values():
+        if entry['switches']:
+            lines.append(f"  {entry['name']}: {entry['switches']} switches, on {entry['on_time']:.1f} s")
+    return "\n".join(lines)
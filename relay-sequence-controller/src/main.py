@@ -1,16 +1,25 @@
+import os
 import sys
-import time
 import json
+import time
 from datetime import datetime
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                                 QHBoxLayout, QPushButton, QTreeWidget, QTreeWidgetItem,
                                 QDialog, QLabel, QComboBox, QSpinBox, QDialogButtonBox,
-                                QGroupBox, QCheckBox, QListWidget, QTextEdit, QTableWidget,
+                                QGroupBox, QCheckBox, QListView, QTextEdit, QTableWidget,
                                 QTableWidgetItem, QHeaderView, QMenu, QLineEdit, QMessageBox,
-                                QInputDialog)
+                                QInputDialog, QFileDialog)
 from PySide6.QtCore import QTimer, Qt
-from relay_b import Relay
-from utils.config_manager import load_config, save_config
+from engine.sequence_engine import SequenceEngine
+from engine.engine_thread import EngineThread, format_stats
+from utils.config_manager import CONFIG_DIR, load_config, save_config
+from utils.event_log import EventLog
+from ui.event_log_model import EventLogModel
+from utils.board_group import connect_boards
+from utils.relay_capture import CaptureWriter
+
+LATENCY_REFRESH = 1.0  # seconds between reaction time table redraws
+
 
 class SequenceDialog(QDialog):
     """Dialog to add a new sequence rule."""
@@ -388,30 +397,40 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Relay Sequence Controller")
         self.setGeometry(100, 100, 1000, 700)
         
-        # Relay connection
+        # Relay connection; relay_host / relay_port in the configuration file
+        # (e.g. written by Relay_control/relay_discovery.py) override these
         self.relay = None
-        self.sequences = []
-        self.active_sequences = {}
+        self.relay_host = '192.168.1.200'
+        self.relay_port = 4196
+        self.capture = None  # CaptureWriter when RELAY_CAPTURE is set
         self.di_history = {i: False for i in range(1, 9)}
         self.do_history = {i: False for i in range(1, 9)}
-        self.multi_step_states = {}
-        self.sequence_initialized = {}
-        self.step_timers = {}
-        self.wait_timers = {}  # Track wait/delay timers
-        self.blink_timers = {}  # Track blink states
-        self.blink_states = {}  # Track current blink state (ON/OFF)
-        self.edge_detected = {}  # Track edge detection for one-shot triggers
+        # Log messages from any thread go to a ring buffer (utils/event_log.py);
+        # a writer thread appends them to ~/.relay_controller/events.log and
+        # the log view polls them at a low rate
+        CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+        self.event_log = EventLog(path=str(CONFIG_DIR / 'events.log'))
+        self.event_log.start()
+        
+        # The control loop runs in the engine thread on a fixed tick
+        # ('tick_ms'); this window only draws the state it publishes every
+        # 'ui_refresh_ms', so dialogs and repaints cannot delay outputs
+        self.engine = SequenceEngine(log=self.log_event)
+        self.engine_thread = EngineThread(self.engine, period=0.01, publish_interval=0.1)
+        self.drawn_state = None
+        self.next_latency_refresh = 0.0  # time.monotonic() of the next reaction time redraw
         
         self.init_ui()
         self.connect_relay()
         
         # Load configuration
         self.load_configuration()
+        self.engine_thread.start()
         
-        # Timer for polling DI status
+        # Timer for redrawing the published engine state
         self.timer = QTimer()
-        self.timer.timeout.connect(self.update_status)
-        self.timer.start(250)
+        self.timer.timeout.connect(self.refresh_ui)
+        self.timer.start(int(self.engine_thread.publish_interval * 1000))
 
     def init_ui(self):
         central_widget = QWidget()
@@ -544,13 +563,38 @@ class MainWindow(QMainWindow):
         status_group.setLayout(status_layout)
         right_layout.addWidget(status_group)
         
+        # Reaction times: from the DI sample that triggered a step to its DO write
+        latency_group = QGroupBox("Reaction Times (DI to DO)")
+        latency_layout = QVBoxLayout()
+        self.latency_tree = QTreeWidget()
+        self.latency_tree.setHeaderLabels(["Sequence", "Step", "Count", "p50 ms", "p99 ms",
+                                           "Worst p99 ms", "Max ms"])
+        self.latency_tree.setMaximumHeight(160)
+        latency_layout.addWidget(self.latency_tree)
+        
+        latency_btn_layout = QHBoxLayout()
+        export_latency_btn = QPushButton("Export...")
+        export_latency_btn.clicked.connect(self.export_latency)
+        latency_btn_layout.addWidget(export_latency_btn)
+        clear_latency_btn = QPushButton("Clear")
+        clear_latency_btn.clicked.connect(self.engine.latency.clear)
+        latency_btn_layout.addWidget(clear_latency_btn)
+        latency_btn_layout.addStretch()
+        latency_layout.addLayout(latency_btn_layout)
+        
+        latency_group.setLayout(latency_layout)
+        right_layout.addWidget(latency_group)
+        
         # Event Log
         log_group = QGroupBox("Event Log")
         log_layout = QVBoxLayout()
-        self.log_list = QListWidget()
+        self.log_model = EventLogModel(self.event_log, parent=self)
+        self.log_list = QListView()
+        self.log_list.setModel(self.log_model)
+        self.log_list.setUniformItemSizes(True)
         log_layout.addWidget(self.log_list)
         clear_log_btn = QPushButton("Clear Log")
-        clear_log_btn.clicked.connect(self.log_list.clear)
+        clear_log_btn.clicked.connect(self.log_model.clear)
         log_layout.addWidget(clear_log_btn)
         log_group.setLayout(log_layout)
         right_layout.addWidget(log_group)
@@ -602,14 +646,15 @@ class MainWindow(QMainWindow):
         """Load configuration from a file."""
         config = load_config()
         if config:
-            self.sequences = config.get('sequences', [])
-            enabled_states = config.get('enabled_states', [True] * len(self.sequences))
+            self.engine_thread.period = config.get('tick_ms', 10) / 1000.0
+            self.engine_thread.publish_interval = config.get('ui_refresh_ms', 100) / 1000.0
+            self.engine.load(config)
             
-            for seq, enabled in zip(self.sequences, enabled_states):
+            for seq, enabled in zip(self.engine.sequences, self.engine.enabled):
                 # Add sequences to the UI with their saved enabled state
                 self.add_sequence_to_ui(seq, enabled=enabled)
             
-            self.log_event(f"Loaded {len(self.sequences)} sequences from configuration")
+            self.log_event(f"Loaded {len(self.engine.sequences)} sequences from configuration")
     
     def show_di_context_menu(self, position):
         """Show context menu for DI tree items."""
@@ -715,7 +760,7 @@ class MainWindow(QMainWindow):
     
     def reset_edge_detection(self):
         """Reset all edge detection states."""
-        self.edge_detected.clear()
+        self.engine.reset_edges()
         self.log_event("Edge detection states reset - all DI(EDGE) triggers will work again")
     
     def reset_all_do_with_password(self):
@@ -854,30 +899,8 @@ class MainWindow(QMainWindow):
             return
         
         try:
-            # Stop all timers and clear states
-            self.step_timers.clear()
-            self.wait_timers.clear()
-            self.blink_timers.clear()
-            self.blink_states.clear()
-            self.active_sequences.clear()
-            
-            # Reset all sequence states
-            for i in range(len(self.sequences)):
-                # Reset initialization flags
-                if i in self.sequence_initialized:
-                    del self.sequence_initialized[i]
-                
-                # Reset multi-step states
-                seq_key = f"production_{i}"
-                if seq_key in self.multi_step_states:
-                    del self.multi_step_states[seq_key]
-                
-                old_seq_key = f"multi_{i}"
-                if old_seq_key in self.multi_step_states:
-                    del self.multi_step_states[old_seq_key]
-            
-            # Turn OFF all DO channels
-            self.relay.all_off()
+            # Stop all sequences and timers, then turn OFF all DO channels in a single frame
+            self.engine.reset_outputs()
             
             # Reset DO history
             self.do_history = {i: False for i in range(1, 9)}
@@ -915,11 +938,11 @@ class MainWindow(QMainWindow):
             return
         
         index = self.seq_tree.indexOfTopLevelItem(item)
-        if index < 0 or index >= len(self.sequences):
+        if index < 0 or index >= len(self.engine.sequences):
             return
         
         # Get the current sequence
-        current_seq = self.sequences[index]
+        current_seq = self.engine.sequences[index]
         
         # Get current enabled state
         checkbox = self.seq_tree.itemWidget(item, 2)
@@ -930,16 +953,7 @@ class MainWindow(QMainWindow):
         if dialog.exec():
             # Update the sequence
             updated_seq = dialog.get_sequence()
-            self.sequences[index] = updated_seq
-            
-            # Reset initialization flag for this sequence
-            if index in self.sequence_initialized:
-                del self.sequence_initialized[index]
-            
-            # Reset multi-step state
-            seq_key = f"multi_{index}"
-            if seq_key in self.multi_step_states:
-                del self.multi_step_states[seq_key]
+            self.engine.replace_sequence(index, updated_seq)
             
             # Remove old item and add updated one
             self.seq_tree.takeTopLevelItem(index)
@@ -987,59 +1001,19 @@ class MainWindow(QMainWindow):
     
     def on_sequence_toggled(self, seq_id, state):
         """Handle sequence enable/disable."""
-        if state == Qt.Unchecked:
-            # Sequence disabled, apply end state
-            if seq_id < len(self.sequences):
-                seq = self.sequences[seq_id]
-                if not seq.get('return_to_initial', False):
-                    self.apply_end_state(seq, seq_id)
-                # Reset initialization flag
-                if seq_id in self.sequence_initialized:
-                    del self.sequence_initialized[seq_id]
-                # Reset multi-step state
-                seq_key = f"production_{seq_id}"
-                if seq_key in self.multi_step_states:
-                    del self.multi_step_states[seq_key]
-                # Also check for old format
-                old_seq_key = f"multi_{seq_id}"
-                if old_seq_key in self.multi_step_states:
-                    del self.multi_step_states[old_seq_key]
-                # Clear wait timers
-                wait_key = f"wait_{seq_id}"
-                if wait_key in self.wait_timers:
-                    del self.wait_timers[wait_key]
-                # Clear edge detection states
-                edge_keys_to_remove = [key for key in self.edge_detected.keys() if f"_{seq_id}_" in key or key.startswith('edge_')]
-                for key in edge_keys_to_remove:
-                    if key in self.edge_detected:
-                        del self.edge_detected[key]
-                # Clear blink timers
-                blink_keys_to_remove = [key for key in self.blink_timers.keys() if f"_{seq_id}_" in key]
-                for key in blink_keys_to_remove:
-                    if key in self.blink_timers:
-                        del self.blink_timers[key]
-                    if key in self.blink_states:
-                        del self.blink_states[key]
-                self.log_event(f"Sequence {seq_id} disabled")
+        self.engine.set_enabled(seq_id, state != Qt.Unchecked)
     
     def remove_sequence(self):
         """Remove selected sequence."""
         current = self.seq_tree.currentItem()
         if current:
             index = self.seq_tree.indexOfTopLevelItem(current)
+            if index < 0 or index >= len(self.engine.sequences):
+                return
             
-            # Apply end state before removing
-            if index < len(self.sequences):
-                seq = self.sequences[index]
-                if not seq.get('return_to_initial', False):
-                    self.apply_end_state(seq, index)
-            
+            # Applies the end state before removing
+            self.engine.remove_sequence(index)
             self.seq_tree.takeTopLevelItem(index)
-            self.sequences.pop(index)
-            
-            # Clean up state tracking
-            if index in self.sequence_initialized:
-                del self.sequence_initialized[index]
             
             self.log_event(f"Removed sequence #{index}")
 
@@ -1048,16 +1022,30 @@ class MainWindow(QMainWindow):
         dialog = SequenceDialog(self)
         if dialog.exec():
             seq = dialog.get_sequence()
-            self.sequences.append(seq)
+            self.engine.add_sequence(seq)
             self.add_sequence_to_ui(seq, enabled=True)
             self.log_event(f"Added new sequence")   
 
     def connect_relay(self):
         """Connect to the relay board."""
         try:
-            self.relay = Relay(host='192.168.1.200')
+            config = load_config() or {}
+            self.relay_host = config.get('relay_host', self.relay_host)
+            self.relay_port = config.get('relay_port', self.relay_port)
+            # Writes are verified by the next tick's coil read instead of a
+            # status read per write; see on_output_mismatch. Named 'boards'
+            # in the configuration join the main board in one BoardGroup
+            self.relay = connect_boards(self.relay_host, self.relay_port, config, optimistic=True)
+            self.relay.on_mismatch = self.on_output_mismatch
+            # RELAY_CAPTURE=<file> records all Modbus traffic for replay
+            capture_path = os.environ.get('RELAY_CAPTURE')
+            if capture_path and self.capture is None:
+                self.capture = CaptureWriter(capture_path, f"{self.relay.host}:{self.relay.port}")
+                self.log_event(f"Capturing relay traffic to {capture_path}")
+            self.relay.capture = self.capture
             self.relay.connect()
-            self.status_label.setText("Connected to relay at 192.168.1.200")
+            self.engine.attach(self.relay)
+            self.status_label.setText(f"Connected to relay at {self.relay_address()}")
             self.status_label.setStyleSheet("color: green")
             self.log_event("Connected to relay")
         except Exception as e:
@@ -1065,801 +1053,155 @@ class MainWindow(QMainWindow):
             self.status_label.setStyleSheet("color: red")
             self.log_event(f"Connection failed: {e}")    
 
+    def on_output_mismatch(self, channels, coil_mask):
+        """Log DO channels that did not hold the state last written to them."""
+        names = ", ".join(self.engine.do_name(i + 1) for i in range(channels.bit_length()) if channels & (1 << i))
+        self.log_event(f"WARNING: {names} did not switch (outputs {coil_mask:08b})")
+
+    def relay_address(self):
+        """host:port of the main board, with the number of extra boards if any."""
+        address = f"{self.relay_host}:{self.relay_port}"
+        if self.engine.boards:
+            address += f" + {len(self.engine.boards)} board(s)"
+        return address
+
     def closeEvent(self, event):
         """Clean up on close."""
         self.timer.stop()
+        self.engine_thread.stop()
         if self.relay:
-            # Stop all blink timers
-            self.blink_timers.clear()
-            self.blink_states.clear()
-            
-            # Apply end states for all enabled sequences
-            for i in range(self.seq_tree.topLevelItemCount()):
-                item = self.seq_tree.topLevelItem(i)
-                checkbox = self.seq_tree.itemWidget(item, 2)
-                if checkbox and checkbox.isChecked() and i < len(self.sequences):
-                    seq = self.sequences[i]
-                    if not seq.get('return_to_initial', False):
-                        self.apply_end_state(seq, i)
+            # Stop blinking and apply end states for all enabled sequences
+            self.engine.shutdown()
             
             self.relay.all_off()
             self.relay.disconnect()
+        if self.capture:
+            self.capture.close()
         self.log_event("Application closed")
+        self.event_log.close()
         event.accept()
 
     def log_event(self, message):
-        """Add event to log with timestamp."""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_list.insertItem(0, f"[{timestamp}] {message}")
-        if self.log_list.count() > 100:
-            self.log_list.takeItem(self.log_list.count() - 1)
+        """Add event to log with timestamp; safe and non-blocking from any thread."""
+        self.event_log.log(message)
     
-    def update_status(self):
-        """Poll DI/DO status and process sequences."""
-        if not self.relay:
+    def refresh_ui(self):
+        """Draw the engine state last published by the engine thread."""
+        state = self.engine_thread.latest()
+        if state is None or state is self.drawn_state:
             return
+        self.drawn_state = state
         
-        try:
-            # Update DI status
-            di_mask = self.relay.check_DI()
-            for i in range(8):
-                item = self.di_tree.topLevelItem(i)
-                status = "ON" if (di_mask & (1 << i)) else "OFF"
-                item.setText(1, status)
-                item.setForeground(1, Qt.green if status == "ON" else Qt.gray)
-                
-                # Update history
-                if status == "ON" and not self.di_history[i + 1]:
-                    self.di_history[i + 1] = True
-                    item.setText(2, "Was ON")
-                    item.setForeground(2, Qt.yellow)
-                    self.log_event(f"DI{i + 1} triggered for first time")
-            
-            # Update DO status
-            for i in range(8):
-                item = self.do_tree.topLevelItem(i)
-                try:
-                    status = "ON" if self.relay.status(i + 1) else "OFF"
-                    item.setText(1, status)
-                    item.setForeground(1, Qt.green if status == "ON" else Qt.gray)
-                    
-                    # Update history
-                    if status == "ON" and not self.do_history[i + 1]:
-                        self.do_history[i + 1] = True
-                        item.setText(2, "Was ON")
-                        item.setForeground(2, Qt.yellow)
-                        self.log_event(f"DO{i + 1} activated for first time")
-                except:
-                    pass
-            
-            # Check step timers for timed DO off
-            current_time = time.time()
-            timers_to_remove = []
-            for timer_key, (off_time, do_ch, seq_id) in self.step_timers.items():
-                if current_time >= off_time:
-                    self.relay.off(do_ch)
-                    self.log_event(f"Sequence {seq_id}: DO{do_ch} turned OFF (timer)")
-                    timers_to_remove.append(timer_key)
-            
-            for key in timers_to_remove:
-                del self.step_timers[key]
-            
-            # Check wait timers
-            waits_to_remove = []
-            for wait_key, wait_data in self.wait_timers.items():
-                if len(wait_data) == 4:  # New format with subsequent actions
-                    wait_end_time, seq_id, step_idx, subsequent_actions = wait_data
-                elif len(wait_data) == 2:  # Old format compatibility
-                    wait_end_time, seq_id = wait_data
-                    step_idx = None
-                    subsequent_actions = None
-                else:
-                    continue
-                    
-                if current_time >= wait_end_time:
-                    # Execute subsequent actions if any
-                    if subsequent_actions:
-                        self.execute_actions(subsequent_actions, seq_id, step_idx if step_idx is not None else 0, f"Wait completion -> {subsequent_actions}")
-                        self.log_event(f"Sequence {seq_id}: Wait completed, executed: {subsequent_actions}")
-                    else:
-                        self.log_event(f"Sequence {seq_id}: Wait completed")
-                    
-                    waits_to_remove.append(wait_key)
-                    # Advance to next step
-                    multi_key = f"production_{seq_id}"
-                    if multi_key in self.multi_step_states:
-                        self.multi_step_states[multi_key]['waiting'] = False
-            
-            for key in waits_to_remove:
-                del self.wait_timers[key]
-            
-            # Process blink timers
-            blinks_to_toggle = []
-            for blink_key, (next_toggle_time, do_ch, seq_id, end_time) in self.blink_timers.items():
-                if current_time >= next_toggle_time:
-                    # Toggle the relay
-                    current_state = self.blink_states.get(blink_key, False)
-                    new_state = not current_state
-                    self.blink_states[blink_key] = new_state
-                    
-                    if new_state:
-                        self.relay.on(do_ch)
-                    else:
-                        self.relay.off(do_ch)
-                    
-                    # Schedule next toggle in 1 second
-                    next_time = current_time + 1.0
-                    self.blink_timers[blink_key] = (next_time, do_ch, seq_id, end_time)
-                    
-                    # Check if blink period has ended
-                    if current_time >= end_time:
-                        blinks_to_toggle.append(blink_key)
-                        self.relay.off(do_ch)
-                        self.log_event(f"Sequence {seq_id}: DO{do_ch} blink completed")
-            
-            for key in blinks_to_toggle:
-                if key in self.blink_timers:
-                    del self.blink_timers[key]
-                if key in self.blink_states:
-                    del self.blink_states[key]
-            
-            # Process sequences
-            self.process_sequences(di_mask)
-            
-            # Update sequence status display
-            self.update_sequence_status_display()
-            
-        except Exception as e:
-            self.status_label.setText(f"Error: {e}")
-            self.log_event(f"Error: {e}")
+        if state.error:
+            self.status_label.setText(f"Error: {state.error}")
+        elif self.relay:
+            self.status_label.setText(f"Connected to relay at {self.relay_address()} "
+                                      f"({format_stats(state.stats)})")
+        
+        # Update DI status
+        for i in range(8):
+            item = self.di_tree.topLevelItem(i)
+            status = "ON" if (state.di_mask & (1 << i)) else "OFF"
+            item.setText(1, status)
+            item.setForeground(1, Qt.green if status == "ON" else Qt.gray)
+            
+            # Update history; di_seen also holds inputs that were ON only between refreshes
+            if (state.di_seen & (1 << i)) and not self.di_history[i + 1]:
+                self.di_history[i + 1] = True
+                item.setText(2, "Was ON")
+                item.setForeground(2, Qt.yellow)
+                self.log_event(f"DI{i + 1} triggered for first time")
+        
+        # Update DO status
+        for i in range(8):
+            item = self.do_tree.topLevelItem(i)
+            status = "ON" if state.do(i + 1) else "OFF"
+            item.setText(1, status)
+            item.setForeground(1, Qt.green if status == "ON" else Qt.gray)
+            
+            # Update history
+            if (state.do_seen & (1 << i)) and not self.do_history[i + 1]:
+                self.do_history[i + 1] = True
+                item.setText(2, "Was ON")
+                item.setForeground(2, Qt.yellow)
+                self.log_event(f"DO{i + 1} activated for first time")
+        
+        # Update sequence status display
+        self.update_sequence_status_display(state)
+        
+        # Reaction time percentiles change slowly; redraw them once a second
+        now = time.monotonic()
+        if now >= self.next_latency_refresh:
+            self.next_latency_refresh = now + LATENCY_REFRESH
+            self.update_latency_display()
 
-    def process_sequences(self, di_mask):
-        """Process all enabled sequences based on current DI state."""
-        for i in range(self.seq_tree.topLevelItemCount()):
-            item = self.seq_tree.topLevelItem(i)
-            checkbox = self.seq_tree.itemWidget(item, 2)
-            
-            if not checkbox or not checkbox.isChecked():
-                continue
-            
-            seq = self.sequences[i]
-            
-            # Apply initial state if first time enabled
-            self.apply_initial_state(seq, i)
-            
-            if seq['type'] == 'station':
-                self.process_station_operation(seq, di_mask, i)
-            else:
-                self.process_production_line(seq, di_mask, i)
-    
-    def process_station_operation(self, seq, di_mask, seq_id):
-        """Process station operation with sensor feedback and error handling."""
-        operation_type = seq.get('operation_type', 'Part Detection & Process')
-        
-        # Handle Tool Picking Sequence
-        if operation_type == "Tool Picking Sequence":
-            return self.process_tool_picking_sequence(seq, di_mask, seq_id)
-        
-        # Handle other station operations
-        part_sensor = seq.get('part_sensor', 1)
-        process_device = seq.get('process_device', 1)
-        feedback_sensor = seq.get('feedback_sensor', 2)
-        skip_sensor = seq.get('skip_sensor', 3)
-        timeout = seq.get('timeout', 10)
-        duration = seq.get('duration', 5)
-        
-        # Check if part is detected
-        part_detected = bool(di_mask & (1 << (part_sensor - 1)))
-        feedback_detected = bool(di_mask & (1 << (feedback_sensor - 1)))
-        skip_detected = bool(di_mask & (1 << (skip_sensor - 1)))
-        
-        station_key = f"station_{seq_id}_{process_device}"
-        blink_key = f"station_blink_{seq_id}_{process_device}"
-        
-        # State tracking for this station
-        if station_key not in self.active_sequences:
-            self.active_sequences[station_key] = {
-                'state': 'waiting_for_part',
-                'start_time': None,
-                'process_start_time': None
-            }
-        
-        station_state = self.active_sequences[station_key]
-        current_time = time.time()
-        
-        if station_state['state'] == 'waiting_for_part':
-            if part_detected:
-                if skip_detected:
-                    # Skip process due to error condition
-                    self.log_event(f"Station {seq_id}: Part detected but skip sensor active - skipping process")
-                    station_state['state'] = 'waiting_for_part'  # Reset to wait for next part
-                else:
-                    # Start process
-                    station_state['state'] = 'processing'
-                    station_state['start_time'] = current_time
-                    station_state['process_start_time'] = current_time
-                    
-                    if seq.get('blink_mode', False):
-                        # Start blink mode
-                        if duration > 0:
-                            end_time = current_time + duration
-                            next_toggle = current_time + 1.0
-                            self.blink_timers[blink_key] = (next_toggle, process_device, seq_id, end_time)
-                            self.blink_states[blink_key] = True
-                            self.relay.on(process_device)
-                            self.log_event(f"Station {seq_id}: Started processing (blinking) for {duration}s")
-                        else:
-                            # Process until feedback
-                            self.relay.on(process_device)
-                            self.log_event(f"Station {seq_id}: Started processing (blink until feedback)")
-                    else:
-                        # Normal processing
-                        self.relay.on(process_device)
-                        if duration > 0:
-                            self.log_event(f"Station {seq_id}: Started processing for {duration}s")
-                        else:
-                            self.log_event(f"Station {seq_id}: Started processing until feedback")
-        
-        elif station_state['state'] == 'processing':
-            # Check for completion conditions
-            process_complete = False
-            
-            if duration > 0 and (current_time - station_state['process_start_time']) >= duration:
-                # Duration-based completion
-                process_complete = True
-                self.log_event(f"Station {seq_id}: Process completed (duration timeout)")
-            elif duration == 0 and feedback_detected:
-                # Feedback-based completion
-                process_complete = True
-                self.log_event(f"Station {seq_id}: Process completed (feedback received)")
-            elif (current_time - station_state['start_time']) >= timeout:
-                # Timeout - process failed
-                self.relay.off(process_device)
-                self.log_event(f"Station {seq_id}: Process TIMEOUT - stopping operation")
-                station_state['state'] = 'waiting_for_part'
-                # Clear any blink timers
-                if blink_key in self.blink_timers:
-                    del self.blink_timers[blink_key]
-                if blink_key in self.blink_states:
-                    del self.blink_states[blink_key]
-                return
-            
-            if process_complete:
-                # Stop processing
-                if not seq.get('blink_mode', False) or duration > 0:
-                    self.relay.off(process_device)
-                
-                # Clear blink timers if they exist
-                if blink_key in self.blink_timers:
-                    del self.blink_timers[blink_key]
-                if blink_key in self.blink_states:
-                    del self.blink_states[blink_key]
-                
-                station_state['state'] = 'waiting_for_clear'
-                self.log_event(f"Station {seq_id}: Waiting for part to clear")
-        
-        elif station_state['state'] == 'waiting_for_clear':
-            if not part_detected:
-                # Part has cleared, ready for next cycle
-                station_state['state'] = 'waiting_for_part'
-                self.log_event(f"Station {seq_id}: Part cleared - ready for next part")
-    
-    def process_tool_picking_sequence(self, seq, di_mask, seq_id):
-        """Process tool picking sequence with specific workflow."""
-        # Get configuration
-        part_sensor = seq.get('part_sensor', 4)  # DI4
-        process_device = seq.get('process_device', 4)  # DO4
-        first_tool_light = seq.get('first_tool_light', 2)  # DO2
-        second_tool_light = seq.get('second_tool_light', 3)  # DO3
-        tools_picked_sensor = seq.get('tools_picked_sensor', 3)  # DI3
-        tools_collected_sensor = seq.get('tools_collected_sensor', 2)  # DI2
-        alarm_device = seq.get('alarm_device', 5)  # DO5
-        timeout = seq.get('timeout', 30)
-        
-        # Get sensor states
-        part_detected = bool(di_mask & (1 << (part_sensor - 1)))
-        tools_picked = bool(di_mask & (1 << (tools_picked_sensor - 1)))
-        tools_collected = bool(di_mask & (1 << (tools_collected_sensor - 1)))
-        
-        tool_key = f"tool_picking_{seq_id}"
-        current_time = time.time()
-        
-        # Initialize state if not exists
-        if tool_key not in self.active_sequences:
-            self.active_sequences[tool_key] = {
-                'state': 'waiting_for_part',
-                'start_time': None,
-                'step_start_time': None
-            }
-        
-        tool_state = self.active_sequences[tool_key]
-        
-        if tool_state['state'] == 'waiting_for_part':
-            if part_detected:
-                # Step 1: Part detected, start process
-                self.relay.on(process_device)  # DO4 ON
-                self.relay.on(first_tool_light)  # DO2 ON (1st tool light)
-                tool_state['state'] = 'waiting_for_first_tool'
-                tool_state['start_time'] = current_time
-                tool_state['step_start_time'] = current_time
-                self.log_event(f"Tool Picking {seq_id}: Part detected - Process ON, 1st tool light ON")
-        
-        elif tool_state['state'] == 'waiting_for_first_tool':
-            if tools_picked:
-                # Step 2: Tools picked, show second tool
-                self.relay.off(first_tool_light)  # DO2 OFF
-                self.relay.on(second_tool_light)  # DO3 ON (2nd tool light)
-                tool_state['state'] = 'waiting_for_second_tool'
-                tool_state['step_start_time'] = current_time
-                self.log_event(f"Tool Picking {seq_id}: 1st tools picked - 2nd tool light ON")
-            elif (current_time - tool_state['step_start_time']) >= timeout:
-                # Timeout - activate alarm
-                self.relay.on(alarm_device)  # DO5 ON (alarm)
-                tool_state['state'] = 'alarm_first_tool'
-                self.log_event(f"Tool Picking {seq_id}: TIMEOUT waiting for 1st tools - ALARM ON")
-        
-        elif tool_state['state'] == 'alarm_first_tool':
-            if tools_picked:
-                # Clear alarm and continue
-                self.relay.off(alarm_device)  # DO5 OFF
-                self.relay.off(first_tool_light)  # DO2 OFF
-                self.relay.on(second_tool_light)  # DO3 ON
-                tool_state['state'] = 'waiting_for_second_tool'
-                tool_state['step_start_time'] = current_time
-                self.log_event(f"Tool Picking {seq_id}: 1st tools picked (after alarm) - continuing")
-        
-        elif tool_state['state'] == 'waiting_for_second_tool':
-            if tools_collected:
-                # Step 3: All tools collected, complete sequence
-                self.relay.off(second_tool_light)  # DO3 OFF
-                self.relay.off(process_device)  # DO4 OFF
-                tool_state['state'] = 'waiting_for_part_clear'
-                self.log_event(f"Tool Picking {seq_id}: All tools collected - sequence complete")
-            elif (current_time - tool_state['step_start_time']) >= timeout:
-                # Timeout - activate alarm
-                self.relay.on(alarm_device)  # DO5 ON (alarm)
-                tool_state['state'] = 'alarm_second_tool'
-                self.log_event(f"Tool Picking {seq_id}: TIMEOUT waiting for 2nd tools - ALARM ON")
-        
-        elif tool_state['state'] == 'alarm_second_tool':
-            if tools_collected:
-                # Clear alarm and complete
-                self.relay.off(alarm_device)  # DO5 OFF
-                self.relay.off(second_tool_light)  # DO3 OFF
-                self.relay.off(process_device)  # DO4 OFF
-                tool_state['state'] = 'waiting_for_part_clear'
-                self.log_event(f"Tool Picking {seq_id}: All tools collected (after alarm) - complete")
-        
-        elif tool_state['state'] == 'waiting_for_part_clear':
-            if not part_detected:
-                # Part cleared, ready for next cycle
-                tool_state['state'] = 'waiting_for_part'
-                self.log_event(f"Tool Picking {seq_id}: Part cleared - ready for next cycle")
+    def update_latency_display(self):
+        """Redraw the reaction time table from the engine's latency tracker."""
+        self.latency_tree.clear()
+        for row in self.engine.latency.summary():
+            step = row['step']
+            item = QTreeWidgetItem([
+                f"#{row['sequence']}",
+                f"Step {step}" if isinstance(step, int) else step,
+                str(row['count']),
+                f"{row['p50_ms']:.1f}",
+                f"{row['p99_ms']:.1f}",
+                f"{row['worst_p99_ms']:.1f}",
+                f"{row['max_ms']:.1f}",
+            ])
+            item.setToolTip(1, f"read {row['read_ms']:.1f} ms, evaluate {row['evaluate_ms']:.2f} ms, "
+                               f"write {row['write_ms']:.1f} ms (means)")
+            self.latency_tree.addTopLevelItem(item)
 
-    def process_production_line(self, seq, di_mask, seq_id):
-        """Process simple logic sequence."""
-        di1_on = bool(di_mask & (1 << (seq['di1'] - 1)))
-        
-        # Evaluate logic
-        trigger = False
-        if seq['logic'] == "Single DI":
-            trigger = di1_on
-        elif seq['logic'] == "AND Gate":
-            di2_on = bool(di_mask & (1 << (seq['di2'] - 1)))
-            trigger = di1_on and di2_on
-        elif seq['logic'] == "OR Gate":
-            di2_on = bool(di_mask & (1 << (seq['di2'] - 1)))
-            trigger = di1_on or di2_on
-        
-        # Control DO
-        do_ch = seq['do']
-        seq_key = f"simple_{seq_id}_{do_ch}"
-        blink_key = f"blink_{seq_id}_{do_ch}"
-        
-        if trigger and seq_key not in self.active_sequences and blink_key not in self.blink_timers:
-            if seq.get('blink_mode', False):
-                # Start blink mode
-                if seq['duration'] > 0:
-                    end_time = time.time() + seq['duration']
-                    next_toggle = time.time() + 1.0  # First toggle in 1 second
-                    self.blink_timers[blink_key] = (next_toggle, do_ch, seq_id, end_time)
-                    self.blink_states[blink_key] = True
-                    self.relay.on(do_ch)
-                    self.log_event(f"Sequence {seq_id}: DO{do_ch} started blinking for {seq['duration']}s")
-                else:
-                    # Infinite blink until trigger goes off
-                    self.relay.on(do_ch)
-                    self.log_event(f"Sequence {seq_id}: DO{do_ch} turned ON (blink mode)")
-            else:
-                # Normal mode
-                self.relay.on(do_ch)
-                self.log_event(f"Sequence {seq_id}: DO{do_ch} turned ON")
-                if seq['duration'] > 0:
-                    # Schedule turn off
-                    self.active_sequences[seq_key] = time.time() + seq['duration']
-        
-        # Handle trigger off for infinite blink mode
-        if not trigger and seq.get('blink_mode', False) and seq['duration'] == 0:
-            if blink_key in self.blink_timers:
-                del self.blink_timers[blink_key]
-            if blink_key in self.blink_states:
-                del self.blink_states[blink_key]
-            self.relay.off(do_ch)
-            self.log_event(f"Sequence {seq_id}: DO{do_ch} blink stopped (trigger off)")
-        
-        # Check for timed turn-off (normal mode)
-        if seq_key in self.active_sequences:
-            if time.time() >= self.active_sequences[seq_key]:
-                self.relay.off(do_ch)
-                self.log_event(f"Sequence {seq_id}: DO{do_ch} turned OFF (timer)")
-                del self.active_sequences[seq_key]
-    
-    def process_production_line(self, seq, di_mask, seq_id):
-        """Process production line sequence with enhanced sensor-based control."""
-        steps = seq.get('steps', '').strip().split('\n')
-        seq_key = f"production_{seq_id}"
-        
-        if seq_key not in self.multi_step_states:
-            self.multi_step_states[seq_key] = {
-                'current_step': 0, 
-                'completed': set(),
-                'waiting': False
-            }
-        
-        state = self.multi_step_states[seq_key]
-        
-        # If waiting, don't process new steps
-        if state.get('waiting', False):
-            return
-        
-        for step_idx, step in enumerate(steps):
-            if step_idx < state['current_step']:
-                continue
-                
-            step = step.strip()
-            if not step:
-                continue
-            
-            # Check if this is a WAIT step
-            if step.upper().startswith('WAIT:'):
-                if step_idx not in state['completed']:
-                    # Check if it has subsequent actions: WAIT:10s->Actions
-                    if '->' in step:
-                        wait_part, subsequent_actions = step.split('->', 1)
-                        duration_str = wait_part.split(':', 1)[1].strip()
-                        if duration_str.endswith('s'):
-                            try:
-                                wait_duration = int(duration_str[:-1])
-                                wait_key = f"wait_{seq_id}_{step_idx}"
-                                self.wait_timers[wait_key] = (time.time() + wait_duration, seq_id, step_idx, subsequent_actions.strip())
-                                state['waiting'] = True
-                                state['completed'].add(step_idx)
-                                state['current_step'] = step_idx + 1
-                                self.log_event(f"Sequence {seq_id} Step {step_idx}: Waiting {wait_duration}s, then executing: {subsequent_actions.strip()}")
-                                break
-                            except ValueError:
-                                pass
-                    else:
-                        # Simple wait without actions
-                        duration_str = step.split(':', 1)[1].strip()
-                        if duration_str.endswith('s'):
-                            try:
-                                wait_duration = int(duration_str[:-1])
-                                wait_key = f"wait_{seq_id}_{step_idx}"
-                                self.wait_timers[wait_key] = (time.time() + wait_duration, seq_id, step_idx, None)
-                                state['waiting'] = True
-                                state['completed'].add(step_idx)
-                                state['current_step'] = step_idx + 1
-                                self.log_event(f"Sequence {seq_id} Step {step_idx}: Waiting {wait_duration}s")
-                                break
-                            except ValueError:
-                                pass
-                continue
-            
-            # Check if step has condition
-            if '->' not in step:
-                continue
-            
-            condition, action = step.split('->', 1)
-            condition = condition.strip()
-            action = action.strip()
-            
-            # Parse condition
-            trigger = self.evaluate_condition(condition, di_mask)
-            
-            if trigger and step_idx not in state['completed']:
-                # Check if action is WAIT with subsequent actions
-                if action.upper().startswith('WAIT:') and '->' in action:
-                    # Format: WAIT:10s->DO2(OFF)|DO3(OFF)
-                    wait_part, subsequent_actions = action.split('->', 1)
-                    duration_str = wait_part.split(':', 1)[1].strip()
-                    if duration_str.endswith('s'):
-                        try:
-                            wait_duration = int(duration_str[:-1])
-                            wait_key = f"wait_{seq_id}_{step_idx}"
-                            self.wait_timers[wait_key] = (time.time() + wait_duration, seq_id, step_idx, subsequent_actions.strip())
-                            state['waiting'] = True
-                            state['completed'].add(step_idx)
-                            state['current_step'] = step_idx + 1
-                            self.log_event(f"Sequence {seq_id} Step {step_idx}: Waiting {wait_duration}s, then executing: {subsequent_actions.strip()}")
-                            break
-                        except ValueError:
-                            pass
-                # Check if action is simple WAIT
-                elif action.upper().startswith('WAIT:'):
-                    duration_str = action.split(':', 1)[1].strip()
-                    if duration_str.endswith('s'):
-                        try:
-                            wait_duration = int(duration_str[:-1])
-                            wait_key = f"wait_{seq_id}_{step_idx}"
-                            self.wait_timers[wait_key] = (time.time() + wait_duration, seq_id, step_idx, None)
-                            state['waiting'] = True
-                            state['completed'].add(step_idx)
-                            state['current_step'] = step_idx + 1
-                            self.log_event(f"Sequence {seq_id} Step {step_idx}: Waiting {wait_duration}s")
-                            break
-                        except ValueError:
-                            pass
-                else:
-                    # Parse and execute actions
-                    self.execute_actions(action, seq_id, step_idx, step)
-                    
-                    state['completed'].add(step_idx)
-                    state['current_step'] = step_idx + 1
-                    
-                    # Check if this is the last step
-                    if step_idx == len(steps) - 1:
-                        # Sequence complete
-                        if seq.get('return_to_initial', False):
-                            self.log_event(f"Sequence {seq_id}: Completed, returning to initial state")
-                            self.reapply_initial_state(seq, seq_id)
-                        else:
-                            self.apply_end_state(seq, seq_id)
-                        
-                        # Reset sequence state for next run
-                        self.multi_step_states[seq_key] = {
-                            'current_step': 0, 
-                            'completed': set(),
-                            'waiting': False
-                        }
-                    break
-    
-    def execute_actions(self, action_str, seq_id, step_idx, full_step):
-        """Execute one or more actions from action string."""
-        # Parse duration if present (at the end)
-        duration = 0
-        if ':' in action_str:
-            parts = action_str.rsplit(':', 1)
-            action_str = parts[0].strip()
-            duration_str = parts[1].strip()
-            if duration_str.endswith('s'):
-                try:
-                    duration = int(duration_str[:-1])
-                except ValueError:
-                    pass
-        
-        # Split multiple actions by & (AND) or | (OR)
-        if '&' in action_str:
-            actions = [a.strip() for a in action_str.split('&')]
-        elif '|' in action_str:
-            actions = [a.strip() for a in action_str.split('|')]
-        else:
-            actions = [action_str.strip()]
-        
-        for action in actions:
-            if not action:
-                continue
-            
-            # Parse DO channel and state: DO2(ON), DO2(OFF), DO2
-            if '(' in action and ')' in action:
-                # Format: DO2(ON) or DO2(OFF)
-                do_part, state_part = action.split('(', 1)
-                do_part = do_part.strip()
-                state_part = state_part.replace(')', '').strip()
-                
-                if not do_part.startswith('DO'):
-                    continue
-                
-                try:
-                    do_ch = int(do_part[2:])
-                except ValueError:
-                    continue
-                
-                # Execute action
-                if state_part == 'ON':
-                    self.relay.on(do_ch)
-                    self.log_event(f"Multi-sequence {seq_id} Step {step_idx}: DO{do_ch} ON")
-                    
-                    # Schedule turn off if duration specified
-                    if duration > 0:
-                        timer_key = f"multi_{seq_id}_step_{step_idx}_do_{do_ch}"
-                        self.step_timers[timer_key] = (time.time() + duration, do_ch, seq_id)
-                        self.log_event(f"Sequence {seq_id}: DO{do_ch} will turn OFF in {duration}s")
-                
-                elif state_part == 'OFF':
-                    self.relay.off(do_ch)
-                    self.log_event(f"Multi-sequence {seq_id} Step {step_idx}: DO{do_ch} OFF")
-                
-                elif state_part == 'BLINK':
-                    # Start blink mode
-                    blink_key = f"multi_blink_{seq_id}_{step_idx}_{do_ch}"
-                    if duration > 0:
-                        end_time = time.time() + duration
-                        next_toggle = time.time() + 1.0
-                        self.blink_timers[blink_key] = (next_toggle, do_ch, seq_id, end_time)
-                        self.blink_states[blink_key] = True
-                        self.relay.on(do_ch)
-                        self.log_event(f"Multi-sequence {seq_id} Step {step_idx}: DO{do_ch} started blinking for {duration}s")
-                    else:
-                        self.log_event(f"Multi-sequence {seq_id} Step {step_idx}: BLINK requires duration")
-            
-            else:
-                # Legacy format: DO2 or DO2:5s (defaults to ON)
-                if not action.startswith('DO'):
-                    continue
-                
-                try:
-                    do_ch = int(action[2:])
-                except ValueError:
-                    continue
-                
-                self.relay.on(do_ch)
-                self.log_event(f"Multi-sequence {seq_id} Step {step_idx}: DO{do_ch} ON")
-                
-                if duration > 0:
-                    timer_key = f"multi_{seq_id}_step_{step_idx}_do_{do_ch}"
-                    self.step_timers[timer_key] = (time.time() + duration, do_ch, seq_id)
-                    self.log_event(f"Sequence {seq_id}: DO{do_ch} will turn OFF in {duration}s")
-    
-    def evaluate_condition(self, condition, di_mask):
-        """Evaluate condition string supporting DO state checks."""
-        condition = condition.replace(' ', '')
-        
-        # Handle AND
-        if '&' in condition:
-            parts = condition.split('&')
-            return all(self.check_input(p, di_mask) for p in parts)
-        
-        # Handle OR
-        if '|' in condition:
-            parts = condition.split('|')
-            return any(self.check_input(p, di_mask) for p in parts)
-        
-        # Single input
-        return self.check_input(condition, di_mask)
-    
-    def check_input(self, input_str, di_mask):
-        """Check if a single input is in the specified state."""
-        input_str = input_str.strip()
-        
-        # Check for edge detection: DI2(EDGE) or DI2(ONCE)
-        if '(' in input_str and ')' in input_str:
-            base_part, state_part = input_str.split('(', 1)
-            base_part = base_part.strip()
-            state_part = state_part.replace(')', '').strip()
-            
-            if base_part.startswith('DI') and state_part in ['EDGE', 'ONCE']:
-                try:
-                    ch = int(base_part[2:])
-                    current_state = bool(di_mask & (1 << (ch - 1)))
-                    edge_key = f"edge_{base_part}"
-                    
-                    # Get previous state
-                    previous_state = self.edge_detected.get(edge_key, False)
-                    
-                    # Update current state
-                    self.edge_detected[edge_key] = current_state
-                    
-                    # Return True only on rising edge (OFF -> ON)
-                    return current_state and not previous_state
-                except:
-                    return False
-            
-            elif base_part.startswith('DO'):
-                try:
-                    ch = int(base_part[2:])
-                    current_state = self.relay.status(ch)
-                    
-                    if state_part == 'ON':
-                        return current_state
-                    elif state_part == 'OFF':
-                        return not current_state
-                except:
-                    return False
-        
-        # Standard format
-        if input_str.startswith('DI'):
-            try:
-                ch = int(input_str[2:])
-                return bool(di_mask & (1 << (ch - 1)))
-            except:
-                return False
-        elif input_str.startswith('DO'):
-            try:
-                ch = int(input_str[2:])
-                return self.relay.status(ch)
-            except:
-                return False
-        
-        return False
-    
-    def apply_initial_state(self, seq, seq_id):
-        """Apply initial state for a sequence."""
-        if seq_id in self.sequence_initialized:
+    def export_latency(self):
+        """Save the reaction time percentiles as CSV or JSON."""
+        path, _ = QFileDialog.getSaveFileName(self, "Export Reaction Times", "reaction_times.csv",
+                                              "CSV (*.csv);;JSON (*.json)")
+        if not path:
             return
-        
-        if seq.get('initial_states'):
-            for do_ch, state in seq['initial_states'].items():
-                do_ch = int(do_ch)  # Ensure it's an integer
-                if state:
-                    self.relay.on(do_ch)
-                    self.log_event(f"Sequence {seq_id}: Initial state - DO{do_ch} ON")
-                else:
-                    self.relay.off(do_ch)
-                    self.log_event(f"Sequence {seq_id}: Initial state - DO{do_ch} OFF")
-        
-        self.sequence_initialized[seq_id] = True
-    
-    def reapply_initial_state(self, seq, seq_id):
-        """Re-apply initial state without checking initialization flag."""
-        if seq.get('initial_states'):
-            for do_ch, state in seq['initial_states'].items():
-                do_ch = int(do_ch)  # Ensure it's an integer
-                if state:
-                    self.relay.on(do_ch)
-                    self.log_event(f"Sequence {seq_id}: Return to initial - DO{do_ch} ON")
-                else:
-                    self.relay.off(do_ch)
-                    self.log_event(f"Sequence {seq_id}: Return to initial - DO{do_ch} OFF")
-    
-    def apply_end_state(self, seq, seq_id):
-        """Apply end state for a sequence."""
-        if seq.get('end_states'):
-            for do_ch, state in seq['end_states'].items():
-                do_ch = int(do_ch)  # Ensure it's an integer
-                if state:
-                    self.relay.on(do_ch)
-                    self.log_event(f"Sequence {seq_id}: End state - DO{do_ch} ON")
-                else:
-                    self.relay.off(do_ch)
-                    self.log_event(f"Sequence {seq_id}: End state - DO{do_ch} OFF")
+        try:
+            count = self.engine.latency.export(path)
+            self.log_event(f"Exported reaction times of {count} steps to {path}")
+        except OSError as e:
+            self.log_event(f"ERROR: Failed to export reaction times: {e}")
 
     def save_configuration(self):
         """Save the current configuration to a file."""
-        # Get enabled state for each sequence
-        enabled_states = []
-        for i in range(self.seq_tree.topLevelItemCount()):
-            item = self.seq_tree.topLevelItem(i)
-            checkbox = self.seq_tree.itemWidget(item, 2)
-            enabled_states.append(checkbox.isChecked() if checkbox else True)
-        
         config = {
-            'sequences': self.sequences,
-            'enabled_states': enabled_states,
+            'sequences': self.engine.sequences,
+            'enabled_states': list(self.engine.enabled),
+            'poll_min_ms': int(self.engine.poll_scheduler.min_interval * 1000),
+            'poll_max_ms': int(self.engine.poll_scheduler.max_interval * 1000),
+            'tick_ms': int(round(self.engine_thread.period * 1000)),
+            'ui_refresh_ms': int(round(self.engine_thread.publish_interval * 1000)),
+            'evaluation': self.engine.evaluation,
+            'boards': self.engine.boards,
+            'relay_host': self.relay_host,
+            'relay_port': self.relay_port,
             'saved_at': datetime.now().isoformat()
         }
         
         if save_config(config):
-            self.log_event(f"Configuration saved: {len(self.sequences)} sequences")
+            self.log_event(f"Configuration saved: {len(self.engine.sequences)} sequences")
         else:
             self.log_event("ERROR: Failed to save configuration")
 
-    def update_sequence_status_display(self):
-        """Update the sequence status display with current sequence information."""
+    def update_sequence_status_display(self, state):
+        """Update the sequence status display from a published EngineState."""
+        sequences = self.engine.sequences
+        compiled_sequences = self.engine.compiled_sequences
+        enabled = state.enabled[:len(sequences)]
         current_sequences = []
         completed_sequences = []
         next_steps = []
         next_sequence = None
         
         # Analyze all sequences
-        for i in range(self.seq_tree.topLevelItemCount()):
-            item = self.seq_tree.topLevelItem(i)
-            checkbox = self.seq_tree.itemWidget(item, 2)
-            
-            if not checkbox or not checkbox.isChecked():
+        for i, is_enabled in enumerate(enabled):
+            if not is_enabled:
                 continue
             
-            seq = self.sequences[i]
+            seq = sequences[i]
             seq_key = f"multi_{i}"
             
             # Check if sequence is currently active
@@ -1871,9 +1213,9 @@ class MainWindow(QMainWindow):
                 if operation_type == "Tool Picking Sequence":
                     # Handle tool picking sequence status
                     tool_key = f"tool_picking_{i}"
-                    if tool_key in self.active_sequences:
+                    if tool_key in state.active:
                         is_active = True
-                        tool_state = self.active_sequences[tool_key]['state']
+                        tool_state = state.active[tool_key]
                         state_display = {
                             'waiting_for_part': 'Waiting for Part',
                             'waiting_for_first_tool': 'Waiting for 1st Tool',
@@ -1898,18 +1240,17 @@ class MainWindow(QMainWindow):
                 else:
                     # Handle other station operations
                     station_key = f"station_{i}_{seq.get('process_device', 1)}"
-                    blink_key = f"station_blink_{i}_{seq.get('process_device', 1)}"
-                    if station_key in self.active_sequences or blink_key in self.blink_timers:
+                    blink_key = ('station_blink', i, seq.get('process_device', 1))
+                    if station_key in state.active or blink_key in state.timers:
                         is_active = True
-                        station_state = self.active_sequences.get(station_key, {}).get('state', 'unknown')
+                        station_state = state.active.get(station_key) or 'unknown'
                         process_device = seq.get('process_device', 1)
                         current_sequences.append(f"#{i}: Station Operation - DO{process_device} ({station_state})")
             else:
                 # Production line sequence
-                if seq_key in self.multi_step_states:
-                    state = self.multi_step_states[seq_key]
-                    current_step = state.get('current_step', 0)
-                    steps = seq.get('steps', '').strip().split('\n')
+                if seq_key in state.steps:
+                    current_step = state.steps[seq_key]
+                    steps = compiled_sequences[i].steps
                     
                     if current_step < len(steps):
                         is_active = True
@@ -1917,7 +1258,7 @@ class MainWindow(QMainWindow):
                         
                         # Show next step
                         if current_step < len(steps):
-                            next_step_text = steps[current_step].strip()
+                            next_step_text = steps[current_step].text
                             if len(next_step_text) > 50:
                                 next_step_text = next_step_text[:50] + "..."
                             next_steps.append(f"#{i}: {next_step_text}")
@@ -1928,23 +1269,20 @@ class MainWindow(QMainWindow):
             # Check for completed station operations
             if seq['type'] == 'station' and not is_active:
                 station_key = f"station_{i}_{seq.get('process_device', 1)}"
-                if i in self.sequence_initialized and station_key not in self.active_sequences:
+                if i in state.initialized and station_key not in state.active:
                     # This could be considered "completed" if it was triggered before
                     pass
         
         # Find next sequence that will be triggered
-        for i in range(self.seq_tree.topLevelItemCount()):
-            item = self.seq_tree.topLevelItem(i)
-            checkbox = self.seq_tree.itemWidget(item, 2)
-            
-            if checkbox and checkbox.isChecked():
-                seq = self.sequences[i]
+        for i, is_enabled in enumerate(enabled):
+            if is_enabled:
+                seq = sequences[i]
                 if seq['type'] == 'station':
                     operation_type = seq.get('operation_type', 'Part Detection & Process')
                     
                     if operation_type == "Tool Picking Sequence":
                         tool_key = f"tool_picking_{i}"
-                        if tool_key not in self.active_sequences:
+                        if tool_key not in state.active:
                             part_sensor = seq.get('part_sensor', 4)
                             next_sequence = f"#{i}: Tool Picking - Wait for Part_DI{part_sensor}"
                             break
@@ -1955,10 +1293,10 @@ class MainWindow(QMainWindow):
                         break
                 else:
                     seq_key = f"production_{i}"
-                    if seq_key not in self.multi_step_states or self.multi_step_states[seq_key]['current_step'] == 0:
-                        steps = seq.get('steps', '').strip().split('\n')
+                    if seq_key not in state.steps or state.steps[seq_key] == 0:
+                        steps = compiled_sequences[i].steps
                         if steps:
-                            first_step = steps[0].strip()
+                            first_step = steps[0].text
                             if len(first_step) > 40:
                                 first_step = first_step[:40] + "..."
                             next_sequence = f"#{i}: {first_step}"
@@ -2073,8 +1411,10 @@ class MainWindow(QMainWindow):
             return do_states
         
         try:
-            for channel in range(1, 9):
-                is_on = self.relay.status(channel)
+            do_mask = self.relay.check_DO()
+            for i in range(8):
+                channel = i + 1
+                is_on = bool(do_mask & (1 << i))
                 do_states[channel] = is_on
         except Exception as e:
             self.log_event(f"Error getting DO states: {e}")
@@ -0,0 +1,357 @@
+"""Production line steps compiled once at load or edit time.
+
+The step text of a production line sequence, e.g.
+
+    DO1(ON)&DI1->DO2(ON)&DO1(OFF)
+    DI2(EDGE)->WAIT:5s->DO2(OFF)
+    WAIT:2s
+    DI3|DI4->DO3(BLINK):10s
+
+is parsed here into channel bitmasks and durations, so the per-tick
+evaluation only tests bits. Conditions are evaluated against one state word
+per tick: DI1-DI8 in bits 0-7 and DO1-DO8 in bits 8-15 (see state_word).
+
+With several relay boards, DIx / DOx is the main board and NAME:DIx /
+NAME:DOx channel x of the board named NAME in the configuration. Board b
+(main board 0) has its DI and DO bits at 16 * b in the state word, and its
+DO channel x is action channel 8 * b + x. A term naming an unknown board
+never matches; an action on one is ignored.
+
+Parsing follows the rules the controller has always applied to the text:
+a condition is split on '&' (all terms) or else on '|' (any term), an
+action list the same way, a trailing ':<n>s' is the action duration and a
+term that cannot be parsed never matches.
+"""
+
+# Condition term kinds
+TERM_ON = 0     # DIn, DOn, DOn(ON): bit set
+TERM_OFF = 1    # DOn(OFF): bit clear
+TERM_EDGE = 2   # DIn(EDGE), DIn(ONCE): rising edge since last evaluation
+TERM_NEVER = 3  # unparseable term
+
+# Step kinds
+STEP_SKIP = 0     # blank line, malformed WAIT or text without '->'
+STEP_WAIT = 1     # WAIT:<n>s[->actions], runs as soon as it is reached
+STEP_ACTIONS = 2  # condition->actions
+STEP_DELAY = 3    # condition->WAIT:<n>s[->actions]
+STEP_NOOP = 4     # condition->malformed WAIT: condition is evaluated, nothing runs
+
+NUM_CHANNELS = 8
+DO_SHIFT = 8  # DO1 is bit 8 of the state word
+BOARD_BITS = 16  # state word bits per board: DI1-DI8, then DO1-DO8
+
+
+def state_word(di_mask, do_mask, boards=1):
+    """Combine DI and DO bitmasks into the word conditions are tested against.
+
+    With several boards the masks hold 8 bits per board (DI / DO channel
+    8 * b + x is channel x of board b).
+    """
+    if boards == 1:
+        return (di_mask & 0xFF) | ((do_mask & 0xFF) << DO_SHIFT)
+    word = 0
+    for board in range(boards):
+        shift = board * NUM_CHANNELS
+        word |= (((di_mask >> shift) & 0xFF) | (((do_mask >> shift) & 0xFF) << DO_SHIFT)) << (board * BOARD_BITS)
+    return word
+
+
+def _channel(text):
+    """Channel number 1-8 from text, or None."""
+    try:
+        channel = int(text)
+    except ValueError:
+        return None
+    return channel if 1 <= channel <= NUM_CHANNELS else None
+
+
+def _board(reference, boards):
+    """Split 'NAME:DO3' into ('DO3', board number); the main board is 0, None if unknown."""
+    if ':' not in reference:
+        return reference, 0
+    name, reference = reference.split(':', 1)
+    return reference.strip(), (boards or {}).get(name.strip())
+
+
+def _seconds(text):
+    """Whole seconds from '<n>s', or None."""
+    text = text.strip()
+    if not text.endswith('s'):
+        return None
+    try:
+        return int(text[:-1])
+    except ValueError:
+        return None
+
+
+class EdgeMemory:
+    """Last evaluated state of each DI used with (EDGE)/(ONCE), bit 0 = DI1.
+
+    Shared by all sequences: a DI edge is consumed by the first condition
+    that evaluates it.
+    """
+
+    __slots__ = ('state',)
+
+    def __init__(self):
+        self.state = 0
+
+    def clear(self):
+        self.state = 0
+
+
+class Condition:
+    """Compiled condition such as 'DI1&DO2(OFF)' or 'DI2(EDGE)|DI3'."""
+
+    __slots__ = ('text', 'any', 'terms', 'on_mask', 'off_mask', 'never', 'has_edges')
+
+    def __init__(self, text, boards=None):
+        self.text = text
+        condition = text.replace(' ', '')
+        if '&' in condition:
+            self.any = False
+            parts = condition.split('&')
+        elif '|' in condition:
+            self.any = True
+            parts = condition.split('|')
+        else:
+            self.any = False
+            parts = [condition]
+        self.terms = tuple(self._compile_term(part.strip(), boards) for part in parts)
+
+        # Without edge terms the result depends only on the state word
+        self.on_mask = 0
+        self.off_mask = 0
+        for kind, bit in self.terms:
+            if kind == TERM_ON:
+                self.on_mask |= bit
+            elif kind == TERM_OFF:
+                self.off_mask |= bit
+        self.never = any(kind == TERM_NEVER for kind, _ in self.terms)
+        self.has_edges = any(kind == TERM_EDGE for kind, _ in self.terms)
+
+    @staticmethod
+    def _compile_term(term, boards):
+        term, board = _board(term, boards)
+        if board is None:
+            return TERM_NEVER, 0
+        offset = board * BOARD_BITS
+        if '(' in term and ')' in term:
+            base, state = term.split('(', 1)
+            base = base.strip()
+            state = state.replace(')', '').strip()
+            if base.startswith('DI') and state in ('EDGE', 'ONCE'):
+                channel = _channel(base[2:])
+                if channel:
+                    return TERM_EDGE, 1 << (offset + channel - 1)
+            elif base.startswith('DO') and state in ('ON', 'OFF'):
+                channel = _channel(base[2:])
+                if channel:
+                    return (TERM_ON if state == 'ON' else TERM_OFF), 1 << (offset + channel - 1 + DO_SHIFT)
+            return TERM_NEVER, 0
+
+        if term.startswith('DI'):
+            channel = _channel(term[2:])
+            if channel:
+                return TERM_ON, 1 << (offset + channel - 1)
+        elif term.startswith('DO'):
+            channel = _channel(term[2:])
+            if channel:
+                return TERM_ON, 1 << (offset + channel - 1 + DO_SHIFT)
+        return TERM_NEVER, 0
+
+    def evaluate(self, word, edges):
+        """Return True if the condition holds for state word.
+
+        Args:
+            word (int): DI/DO state word from state_word()
+            edges (EdgeMemory): edge state, updated by every edge term evaluated
+        """
+        if not self.has_edges:
+            if self.any:
+                return bool((word & self.on_mask) or (~word & self.off_mask))
+            return not self.never and (word & self.on_mask) == self.on_mask and not (word & self.off_mask)
+
+        # Terms in order with short-circuit, so an edge term only consumes
+        # its edge when the terms before it allowed it to be evaluated
+        for kind, bit in self.terms:
+            if kind == TERM_ON:
+                result = word & bit
+            elif kind == TERM_OFF:
+                result = not (word & bit)
+            elif kind == TERM_EDGE:
+                current = word & bit
+                result = current and not (edges.state & bit)
+                edges.state = (edges.state & ~bit) | current
+            else:
+                result = False
+            if self.any and result:
+                return True
+            if not self.any and not result:
+                return False
+        return not self.any
+
+    def __repr__(self):
+        return f"Condition({self.text!r})"
+
+
+class ActionSet:
+    """Compiled action list such as 'DO2(ON)&DO3(OFF):5s'.
+
+    changes holds (channel, 'ON' | 'OFF' | 'BLINK') in text order, channel
+    8 * board + x for DOx of a named board. Plain ON and OFF changes are
+    written together as write_mask / on_mask; timed ON
+    changes are left to the board (pulsed) when the duration fits a board
+    timed command, and BLINK changes are started separately.
+    """
+
+    __slots__ = ('text', 'duration', 'changes', 'pulsed', 'on_mask', 'write_mask')
+
+    def __init__(self, text, max_pulse_ms, boards=None):
+        self.text = text
+        self.duration = 0
+        action_str = text
+        if ':' in action_str:
+            head, duration_str = action_str.rsplit(':', 1)
+            # In 'B:DO2(ON)' the colon names a board, it does not start a duration
+            if not duration_str.strip().startswith('DO'):
+                action_str = head.strip()
+                self.duration = _seconds(duration_str) or 0
+
+        if '&' in action_str:
+            actions = [a.strip() for a in action_str.split('&')]
+        elif '|' in action_str:
+            actions = [a.strip() for a in action_str.split('|')]
+        else:
+            actions = [action_str.strip()]
+
+        changes = []
+        for action in actions:
+            if not action:
+                continue
+            action, board = _board(action, boards)
+            if board is None:
+                continue
+            if '(' in action and ')' in action:
+                do_part, state = action.split('(', 1)
+                do_part = do_part.strip()
+                state = state.replace(')', '').strip()
+                if not do_part.startswith('DO'):
+                    continue
+                channel = _channel(do_part[2:])
+                if channel is None:
+                    continue
+                if state in ('ON', 'OFF', 'BLINK'):
+                    changes.append((board * NUM_CHANNELS + channel, state))
+            else:
+                # Legacy format: DO2 (ON)
+                if not action.startswith('DO'):
+                    continue
+                channel = _channel(action[2:])
+                if channel is None:
+                    continue
+                changes.append((board * NUM_CHANNELS + channel, 'ON'))
+        self.changes = tuple(changes)
+
+        self.pulsed = 0 < self.duration * 1000 <= max_pulse_ms
+        self.on_mask = 0
+        self.write_mask = 0
+        for channel, state in self.changes:
+            if state == 'BLINK' or (state == 'ON' and self.pulsed):
+                continue
+            bit = 1 << (channel - 1)
+            self.write_mask |= bit
+            if state == 'OFF':
+                self.on_mask &= ~bit
+            else:
+                self.on_mask |= bit
+
+    def __repr__(self):
+        return f"ActionSet({self.text!r})"
+
+
+class Step:
+    """One compiled line of a production line sequence."""
+
+    __slots__ = ('kind', 'text', 'condition', 'wait', 'actions')
+
+    def __init__(self, kind, text, condition=None, wait=None, actions=None):
+        self.kind = kind
+        self.text = text
+        self.condition = condition  # Condition, None for STEP_WAIT / STEP_SKIP
+        self.wait = wait            # seconds for STEP_WAIT / STEP_DELAY
+        self.actions = actions      # ActionSet run now (STEP_ACTIONS) or after the wait
+
+    def __repr__(self):
+        return f"Step({self.text!r})"
+
+
+def _compile_wait(text, max_pulse_ms, boards):
+    """Return (seconds, ActionSet or None) for 'WAIT:<n>s[->actions]', or None."""
+    then = None
+    if '->' in text:
+        text, then_text = text.split('->', 1)
+        then_text = then_text.strip()
+        if then_text:
+            then = ActionSet(then_text, max_pulse_ms, boards)
+    seconds = _seconds(text.split(':', 1)[1])
+    if seconds is None:
+        return None
+    return seconds, then
+
+
+def compile_step(text, max_pulse_ms, boards=None):
+    """Compile one step line; boards maps board names to board numbers."""
+    text = text.strip()
+    if not text:
+        return Step(STEP_SKIP, text)
+
+    if text.upper().startswith('WAIT:'):
+        wait = _compile_wait(text, max_pulse_ms, boards)
+        if wait is None:
+            return Step(STEP_SKIP, text)
+        return Step(STEP_WAIT, text, wait=wait[0], actions=wait[1])
+
+    if '->' not in text:
+        return Step(STEP_SKIP, text)
+
+    condition_text, action_text = text.split('->', 1)
+    condition = Condition(condition_text.strip(), boards)
+    action_text = action_text.strip()
+    if action_text.upper().startswith('WAIT:'):
+        wait = _compile_wait(action_text, max_pulse_ms, boards)
+        if wait is None:
+            return Step(STEP_NOOP, text, condition)
+        return Step(STEP_DELAY, text, condition, wait=wait[0], actions=wait[1])
+    return Step(STEP_ACTIONS, text, condition, actions=ActionSet(action_text, max_pulse_ms, boards))
+
+
+class CompiledSequence:
+    """Steps of one production line sequence, compiled from its 'steps' text.
+
+    Step indexes match the text lines (blank lines included), as the
+    controller's step numbers always have.
+    """
+
+    __slots__ = ('steps', 'last_index')
+
+    def __init__(self, steps_text, max_pulse_ms, boards=None):
+        lines = (steps_text or '').strip().split('\n')
+        self.steps = tuple(compile_step(line, max_pulse_ms, boards) for line in lines)
+        self.last_index = len(self.steps) - 1
+
+    def __len__(self):
+        return len(self.steps)
+
+
+def compile_sequence(seq, max_pulse_ms, boards=None):
+    """Compile a sequence dict; station sequences have no steps and compile to None.
+
+    Args:
+        seq (dict): sequence as stored in the configuration
+        max_pulse_ms (int): longest ON time the board can time by itself
+        boards (dict): board number of each named board (NAME:DIx), if any
+    """
+    if seq.get('type') == 'station':
+        return None
+    return CompiledSequence(seq.get('steps', ''), max_pulse_ms, boards)
@@ -0,0 +1,128 @@
+"""Bit-parallel evaluation of production line conditions.
+
+Every step of every production line sequence gets one lane of a single
+Python integer: its condition's required-on and required-off masks over the
+DI/DO state word (see compiled_sequence.state_word; 16 bits per relay
+board), plus a guard bit. One tick then evaluates all conditions with a few
+big-integer operations: the state word is copied into every lane, each lane
+is reduced to the bits that break (all-of condition) or satisfy (any-of
+condition) it, and adding all ones to every lane carries into its guard bit
+exactly when that lane is non-zero.
+
+What the engine asks each tick is which sequences can do anything. A
+running sequence is due when, from its current step on, it has a step whose
+condition holds, a WAIT step, or a step with an edge term: edges are
+consumed in sequence order, so those steps are left to Condition.evaluate.
+Every step before that one has a false condition without side effects, so
+the engine's step walk can start at it. Sequences with nothing due are not
+visited, so the tick cost follows the number of sequences with work to do
+rather than the number configured.
+"""
+
+from models.compiled_sequence import BOARD_BITS, STEP_ACTIONS, STEP_DELAY, STEP_NOOP, STEP_WAIT
+
+
+class ConditionTable:
+    """Conditions of all production line steps as lanes of one integer.
+
+    Args:
+        compiled_sequences (list): CompiledSequence per sequence, None for
+            station sequences (see compiled_sequence.compile_sequence)
+        boards (int): relay boards in the state word
+    """
+
+    def __init__(self, compiled_sequences, boards=1):
+        width = boards * BOARD_BITS
+        self.lane = lane = width + 1  # bits per step: the state word and a guard bit
+        data = (1 << width) - 1
+        self.base = {}      # seq_id -> row of its first step
+        self.rows = []      # row -> seq_id
+        self.segments = {}  # seq_id -> guard bits of all its steps
+        repeat = 0   # bit 0 of every lane
+        keep = 0     # lane bits that count when set in the word
+        flip = 0     # lane bits that count when clear in the word
+        all_rows = 0  # guard bits of all-of conditions: true when nothing counts
+        any_rows = 0  # guard bits of any-of conditions: true when something counts
+        stops = 0     # guard bits of WAIT steps and steps with edge terms
+        row = 0
+        for seq_id, compiled in enumerate(compiled_sequences):
+            if compiled is None:
+                continue
+            self.base[seq_id] = row
+            segment = 0
+            for step in compiled.steps:
+                shift = row * lane
+                guard = (data + 1) << shift
+                repeat |= 1 << shift
+                segment |= guard
+                self.rows.append(seq_id)
+                condition = step.condition
+                if step.kind == STEP_WAIT:
+                    stops |= guard
+                elif step.kind in (STEP_ACTIONS, STEP_DELAY, STEP_NOOP) and condition.has_edges:
+                    stops |= guard
+                elif step.kind in (STEP_ACTIONS, STEP_DELAY):
+                    if condition.any:
+                        keep |= condition.on_mask << shift
+                        flip |= condition.off_mask << shift
+                        any_rows |= guard
+                    elif not condition.never:
+                        flip |= condition.on_mask << shift
+                        keep |= condition.off_mask << shift
+                        all_rows |= guard
+                row += 1
+            self.segments[seq_id] = segment
+
+        self.repeat = repeat
+        self.data = data * repeat
+        self.guards = (data + 1) * repeat
+        self.keep = keep
+        self.flip = flip
+        self.all_rows = all_rows
+        self.any_rows = any_rows
+        self.stops = stops
+        self.active = 0    # guard bits of the steps running sequences can reach
+        self.cursors = {}  # seq_id -> its part of self.active
+
+    def __len__(self):
+        return len(self.rows)
+
+    def set_cursor(self, seq_id, step):
+        """Let sequence seq_id reach its steps from `step` on.
+
+        step is None while the sequence cannot advance (disabled or in a
+        WAIT). Unknown sequences (stations) are ignored.
+        """
+        segment = self.segments.get(seq_id)
+        if segment is None:
+            return
+        bits = 0
+        if step is not None:
+            shift = (self.base[seq_id] + step) * self.lane
+            bits = segment >> shift << shift
+        self.active ^= self.cursors.get(seq_id, 0) ^ bits
+        self.cursors[seq_id] = bits
+
+    def hits(self, word):
+        """Guard bits of the steps whose (edge-free) condition holds for word."""
+        lanes = word * self.repeat
+        counted = ((lanes ^ self.data) & self.flip) | (lanes & self.keep)
+        nonzero = (counted + self.data) & self.guards
+        return (nonzero & self.any_rows) | (self.all_rows & ~nonzero)
+
+    def due(self, word):
+        """(seq_id, step) for each running sequence with something to do, in sequence order.
+
+        step is the first step from the sequence's cursor on that can do
+        something this tick; the steps before it cannot.
+        """
+        if not self.active:
+            return []
+        pending = (self.hits(word) | self.stops) & self.active
+        due = []
+        while pending:
+            row = ((pending & -pending).bit_length() - 1) // self.lane
+            seq_id = self.rows[row]
+            due.append((seq_id, row - self.base[seq_id]))
+            pending &= ~self.segments[seq_id]
+        return due
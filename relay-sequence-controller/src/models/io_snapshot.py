@@ -0,0 +1,38 @@
+import time
+
+
+class IOSnapshot:
+    """DI/DO state of a relay board captured once per poll tick.
+
+    Reading the board once per tick (one Read Discrete Inputs plus one Read
+    Coils request) and evaluating every condition and UI update against the
+    same snapshot keeps the poll loop at two transactions, no matter how many
+    sequences reference DI/DO channels.
+    """
+
+    def __init__(self, di_mask=0, do_mask=0, timestamp=None):
+        self.di_mask = di_mask
+        self.do_mask = do_mask
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    @classmethod
+    def read(cls, relay):
+        """Read DI and DO state from a relay in two requests.
+
+        A BoardGroup sends each request to all its boards before waiting for
+        any answer, so its snapshot also costs two round trips.
+        """
+        di_mask = relay.check_DI()
+        do_mask = relay.check_DO()
+        return cls(di_mask, do_mask)
+
+    def di(self, channel):
+        """Return True if DI channel (1-8, 9-16 for the second board, ...) was ON when the snapshot was taken."""
+        return bool(self.di_mask & (1 << (channel - 1)))
+
+    def do(self, channel):
+        """Return True if DO channel (1-8, 9-16 for the second board, ...) was ON when the snapshot was taken."""
+        return bool(self.do_mask & (1 << (channel - 1)))
+
+    def __repr__(self):
+        return f"IOSnapshot(di={self.di_mask:08b}, do={self.do_mask:08b})"
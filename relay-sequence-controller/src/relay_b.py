@@ -6,14 +6,56 @@ import socket
 import time
 import threading
 
+# Board timed commands: Write Single Coil to 0x02nn (flash on: on, then off
+# after the delay) or 0x04nn (flash off), delay in 100 ms units
+FLASH_ON_BASE = 0x0200
+FLASH_OFF_BASE = 0x0400
+FLASH_UNIT_MS = 100
+FLASH_MAX_MS = 0x7FFF * FLASH_UNIT_MS
+
+
+def flash_units(ms: int) -> int:
+    """Convert a flash delay in milliseconds to the board's 100 ms units."""
+    units = int(round(ms / FLASH_UNIT_MS))
+    if units < 1 or units * FLASH_UNIT_MS > FLASH_MAX_MS:
+        raise ValueError(f'Flash time [{ms}] ms outside the board range {FLASH_UNIT_MS}-{FLASH_MAX_MS} ms.')
+    return units
+
+
+# Directions passed to a capture's record(direction, frame); the values match
+# Relay_control/relay_capture.py so its CaptureWriter can be attached
+CAPTURE_REQUEST = 0
+CAPTURE_RESPONSE = 1
+
+
 class Relay():
     """Waveshare Modbus POE ethernet relay board."""
-    def __init__(self, host='192.168.1.254', port=4196, address=0x01):
+    def __init__(self, host='192.168.1.254', port=4196, address=0x01, optimistic=False):
         
         self.host = host
         self.port = port
         self.address = address
         self.channels = range(1, 9)
+        # Last known coil states (bit 0 = channel 1), None until first read
+        self.coil_mask = None
+        # Optimistic mode: on()/off()/set_outputs() return after the echo
+        # check and the written channels are verified by the next check_DO(),
+        # e.g. the poll loop's coil read, instead of one status() per write
+        self.optimistic = optimistic
+        self.expected_mask = 0   # written states of channels awaiting verification
+        self.pending_verify = 0  # channels written but not verified yet
+        # Called as on_mismatch(channels, coil_mask) when a verified channel
+        # does not hold its written state; printed if not set
+        self.on_mismatch = None
+        # Optional capture writer (relay_capture.CaptureWriter) recording every
+        # request and response frame without its CRC
+        self.capture = None
+        # Receive buffer reused for every response frame
+        self._rx = bytearray(256)
+        self._rx_view = memoryview(self._rx)
+        # Serialises request/response pairs when several threads share the
+        # board (e.g. a DISampler and the GUI writing outputs)
+        self.lock = threading.RLock()
 
         # Table of CRC values for high–order byte
         self.CRCTableHigh = [
@@ -75,6 +117,7 @@ class Relay():
         if hasattr(self, 'sock') and self.sock:
             self.sock.close()
             self.sock = None
+        self.coil_mask = None
 
     def ModbusCRC(self, data):
         """Calculate modbus CRC value."""
@@ -88,11 +131,48 @@ class Relay():
         
         return (crcHigh << 8 | crcLow)
 
+    def _read_response(self, length: int):
+        """Receive exactly one response frame and check its CRC.
+
+        Loops over partial TCP segments and never reads past the frame, so a
+        split or coalesced response cannot desynchronise the next request.
+        The returned view is reused by the next response.
+
+        Args:
+            length: expected frame length including CRC.
+        """
+        view = self._rx_view
+        self._recv_into(view, 2)
+        if view[1] & 0x80:
+            # Exception response: address, function | 0x80, code, CRC
+            self._recv_into(view[2:], 3)
+            if self.capture:
+                self.capture.record(CAPTURE_RESPONSE, view[:3])
+            raise RuntimeError(f'Device [{self}] returned Modbus exception [{view[2]}] for function [{view[1] & 0x7F:#04x}].')
+        self._recv_into(view[2:], length - 2)
+        crc = self.ModbusCRC(view[:length - 2])
+        if view[length - 2] != crc & 0xFF or view[length - 1] != crc >> 8:
+            raise RuntimeError(f'CRC mismatch in response from device [{self}].')
+        if self.capture:
+            self.capture.record(CAPTURE_RESPONSE, view[:length - 2])
+        return view[:length]
+
+    def _recv_into(self, view, length: int):
+        """Fill view[:length] from the socket."""
+        received = 0
+        while received < length:
+            count = self.sock.recv_into(view[received:length], length - received)
+            if count == 0:
+                raise RuntimeError(f'Connection to device [{self}] closed.')
+            received += count
+
     def __str__(self):
         return f'Waveshare Relay host [{self.host}] port [{self.port}] address '
         f'[{self.address}]'
 
     def _write(self, cmd):
+        if self.capture:
+            self.capture.record(CAPTURE_REQUEST, cmd)
         crc = self.ModbusCRC(cmd)
         cmd.append(crc & 0xFF)
         cmd.append(crc >> 8)
@@ -108,21 +188,24 @@ class Relay():
         Args:
             channel: channel number.
         """
-        if channel not in self.channels:
-            raise ValueError(f'Provided channel [{channel}] not in [{self.channels}] for device [{self}].')
+        with self.lock:
+            if channel not in self.channels:
+                raise ValueError(f'Provided channel [{channel}] not in [{self.channels}] for device [{self}].')
 
-        # driver channels are 0 indexed
-        cmd = [self.address, 0x05, 0, channel - 1, 0xFF, 0]     
-        self._write(cmd)
+            # driver channels are 0 indexed
+            cmd = [self.address, 0x05, 0, channel - 1, 0xFF, 0]     
+            self._write(cmd)
 
-        # TODO
-        # time.sleep(0.2)
+            # TODO
+            # time.sleep(0.2)
 
-        if self.sock.recv(8) != bytearray(cmd):
-            raise RuntimeError(f'Did not receive response from device [{self}] when turning on channel [{channel}].')
+            if self._read_response(8) != bytearray(cmd):
+                raise RuntimeError(f'Did not receive response from device [{self}] when turning on channel [{channel}].')
 
-        if not self.status(channel):
-            raise RuntimeError(f'Failed to turn on relay channel [{channel}] of device [{self}].')
+            if self.optimistic:
+                self._expect(1 << (channel - 1), 0xFF)
+            elif not self.status(channel):
+                raise RuntimeError(f'Failed to turn on relay channel [{channel}] of device [{self}].')
 
     def off(self, channel: int):
         """Turn a relay channel off.
@@ -130,31 +213,167 @@ class Relay():
         Args:
             channel: channel number.
         """
-        if channel not in self.channels:
-            raise ValueError(f'Provided channel [{channel}] not in [{self.channels}] for device [{self}].')
+        with self.lock:
+            if channel not in self.channels:
+                raise ValueError(f'Provided channel [{channel}] not in [{self.channels}] for device [{self}].')
+
+            # driver channels are 0 indexed
+            cmd = [self.address, 0x05, 0, channel - 1, 0, 0]     
+            self._write(cmd)
+
+            # TODO
+            # time.sleep(0.2)
 
-        # driver channels are 0 indexed
-        cmd = [self.address, 0x05, 0, channel - 1, 0, 0]     
-        self._write(cmd)
+            if self._read_response(8) != bytearray(cmd):
+                raise RuntimeError(f'Did not receive response from device [{self}] when turning on channel [{channel}].')
 
-        # TODO
-        # time.sleep(0.2)
+            if self.optimistic:
+                self._expect(1 << (channel - 1), 0x00)
+            elif self.status(channel):
+                raise RuntimeError(f'Failed to turn off relay channel [{channel}] of device [{self}].')
 
-        if self.sock.recv(8) != bytearray(cmd):
-            raise RuntimeError(f'Did not receive response from device [{self}] when turning on channel [{channel}].')
+    def pulse(self, channel: int, ms: int):
+        """Turn a relay channel on for ``ms`` milliseconds, timed by the board.
 
-        if self.status(channel):
-            raise RuntimeError(f'Failed to turn off relay channel [{channel}] of device [{self}].')
+        Uses the board's flash-on command, so the channel is turned off again
+        without another request. ``ms`` is rounded to the board's 100 ms
+        resolution and must be between 100 ms and FLASH_MAX_MS.
+
+        Args:
+            channel: channel number.
+            ms: on time in milliseconds.
+        """
+        self._flash(channel, ms, FLASH_ON_BASE)
+
+    def flash(self, channel: int, period: int):
+        """Run one board-timed blink cycle: on for the first half of ``period`` ms.
+
+        Call again every ``period`` ms to keep the channel blinking; each call
+        costs one request and the on time does not depend on the caller.
+
+        Args:
+            channel: channel number.
+            period: blink period in milliseconds.
+        """
+        self._flash(channel, period // 2, FLASH_ON_BASE)
+
+    def _flash(self, channel: int, ms: int, base: int):
+        with self.lock:
+            if channel not in self.channels:
+                raise ValueError(f'Provided channel [{channel}] not in [{self.channels}] for device [{self}].')
+
+            units = flash_units(ms)
+            cmd = [self.address, 0x05, base >> 8, channel - 1, units >> 8, units & 0xFF]
+            self._write(cmd)
+
+            if self._read_response(8) != bytearray(cmd):
+                raise RuntimeError(f'Did not receive response from device [{self}] when flashing channel [{channel}].')
+
+            # The board switches the coil again when the delay ends, so the
+            # cached state is unknown and the channel is not verified
+            self.coil_mask = None
+            self.pending_verify &= ~(1 << (channel - 1))
 
     def all_off(self):
         """Turn all relay channels off."""
-        for i in self.channels:
-            self.off(i)
+        self.set_outputs(0x00, verify=True)
 
     def all_on(self):
         """Turn all relay channels on."""
-        for i in self.channels:
-            self.on(i)
+        self.set_outputs(0xFF, verify=True)
+
+    def set_outputs(self, mask: int, channels: int = 0xFF, verify: bool = False):
+        """Write several relay channels with one Write Multiple Coils (0x0F) frame.
+
+        Only the span from the lowest to the highest channel in ``channels`` is
+        written. Channels inside that span that are not selected keep the state
+        from the last coil read (a Read Coils request is made if none is known).
+
+        Args:
+            mask: desired channel states, bit 0 = channel 1.
+            channels: channels to write, bit 0 = channel 1.
+            verify: read the coils back afterwards and check the result. Without
+                it, optimistic mode checks the channels at the next check_DO().
+        """
+        with self.lock:
+            channels &= 0xFF
+            if not channels:
+                return
+            first = (channels & -channels).bit_length() - 1
+            last = channels.bit_length() - 1
+            span = ((1 << (last - first + 1)) - 1) << first
+
+            if span & ~channels:
+                current = self.coil_mask if self.coil_mask is not None else self.check_DO()
+                mask = (mask & channels) | (current & ~channels)
+            mask &= span
+
+            quantity = last - first + 1
+            cmd = [self.address, 0x0F, 0, first, 0, quantity, 1, (mask >> first) & 0xFF]
+            self._write(cmd)
+
+            # Write Multiple Coils echoes address, function, start and quantity
+            if self._read_response(8)[:6] != bytearray(cmd[:6]):
+                raise RuntimeError(f'Did not receive response from device [{self}] when writing channels [{channels:#04x}].')
+
+            if self.coil_mask is not None:
+                self.coil_mask = (self.coil_mask & ~span) | mask
+            elif span == 0xFF:
+                self.coil_mask = mask
+
+            if verify:
+                if (self.check_DO() & span) != mask:
+                    raise RuntimeError(f'Failed to write relay channels [{channels:#04x}] of device [{self}].')
+            elif self.optimistic:
+                self._expect(span, mask)
+
+    def check_DO(self):
+        """Return the state of all relay channels as a bitmask (bit 0 = channel 1)."""
+        with self.lock:
+            self.request_DO()
+            return self.response_DO()
+
+    def request_DO(self):
+        """Send a Read Coils request; response_DO() receives the answer.
+
+        Split so several boards can be read in one round trip: send the
+        request to every board, then receive every answer. Hold self.lock
+        from the request to its response.
+        """
+        self._write([0x01, 0x01, 0, 0, 0, 0x08])
+
+    def response_DO(self):
+        """Receive the answer to request_DO() and return the coil bitmask."""
+        self.coil_mask = self._read_response(6)[3]
+        if self.pending_verify:
+            self._verify(self.coil_mask)
+        return self.coil_mask
+
+    def verify_pending(self):
+        """Verify all optimistic writes with one coil read.
+
+        Returns the bitmask of channels that did not hold their written state.
+        """
+        with self.lock:
+            pending = self.pending_verify
+            if not pending:
+                return 0
+            return pending & (self.check_DO() ^ self.expected_mask)
+
+    def _expect(self, channels: int, mask: int):
+        """Record written channel states for verification by the next coil read."""
+        self.expected_mask = (self.expected_mask & ~channels) | (mask & channels)
+        self.pending_verify |= channels
+
+    def _verify(self, coil_mask: int):
+        mismatch = self.pending_verify & (coil_mask ^ self.expected_mask)
+        self.pending_verify = 0
+        if not mismatch:
+            return
+        if self.on_mismatch:
+            self.on_mismatch(mismatch, coil_mask)
+        else:
+            print(f'Relay channels [{mismatch:#04x}] of device [{self}] did not switch (coils [{coil_mask:#04x}]).')
 
     def status(self, channel: int):
         """Return whether a relay channel is on (True) or off (False).
@@ -165,10 +384,7 @@ class Relay():
         if channel not in self.channels:
             raise ValueError(f'Provided channel [{channel}] not in [{self.channels}] for device [{self}].')
 
-        cmd = [0x01, 0x01, 0, 0, 0, 0x08, 0x3D, 0xCC]   
-        self.sock.send(bytearray(cmd))
-
-        if self.sock.recv(6)[3] & 2**(channel-1):
+        if self.check_DO() & 2**(channel-1):
             return True
         else:
             return False
@@ -187,41 +403,47 @@ class Relay():
     """Turn on the first relay channel."""
     def turn_on_first_relay(self):
         """Turn on the first relay channel."""
-        #cmd = [self.address, 0x05, 0, 0, 0xFF, 0]
-        #self._write(cmd)
-        #self.on(1)
-
-        cmd = [0x01, 0x05 ,0 ,0, 0xFF, 0 ]
-        self._write(cmd)
-        #print(f"Command sent: {cmd}")
-        print(f"Expected response: {bytearray(cmd)}")
-        # Check if the response matches the command sent
-        print(f"Response received: {self.sock.recv(8)}")
-        # If the response does not match, raise an error
-        # Note: The response length should be 8 bytes for a valid Modbus TCP response
-        if self.sock.recv(8) != bytearray(cmd):
-            raise RuntimeError(f'Did not receive response from device [{self}] when turning on first relay channel.')
-
-        if not self.status(1):
-            raise RuntimeError(f'Failed to turn on first relay channel of device [{self}].')
+        with self.lock:
+            #cmd = [self.address, 0x05, 0, 0, 0xFF, 0]
+            #self._write(cmd)
+            #self.on(1)
+
+            cmd = [0x01, 0x05 ,0 ,0, 0xFF, 0 ]
+            self._write(cmd)
+            #print(f"Command sent: {cmd}")
+            print(f"Expected response: {bytearray(cmd)}")
+            # Check if the response matches the command sent
+            response = self._read_response(8)
+            print(f"Response received: {bytes(response)}")
+            # If the response does not match, raise an error
+            # Note: The response length should be 8 bytes for a valid Modbus TCP response
+            if response != bytearray(cmd):
+                raise RuntimeError(f'Did not receive response from device [{self}] when turning on first relay channel.')
+
+            if not self.status(1):
+                raise RuntimeError(f'Failed to turn on first relay channel of device [{self}].')
         
+    def read_DI(self):
+        """Return the digital inputs as a bitmask (bit 0 = DI1) without logging them."""
+        with self.lock:
+            self.request_DI()
+            return self.response_DI()
+
+    def request_DI(self):
+        """Send a Read Discrete Inputs request; response_DI() receives the answer (see request_DO)."""
+        self._write([self.address, 0x02, 0x00, 0x00, 0x00, 0x08])
+
+    def response_DI(self):
+        """Receive the answer to request_DI() and return the DI bitmask."""
+        return self._read_response(6)[3]
+
     def check_DI(self):
-        """Check the status of digital inputs (DI1 to DI8)."""
-        #print("Checking DI status...")
-        cmd = [0x01, 0x02, 0x00, 0x00, 0x00, 0x08]
-        self._write(cmd)
-        #print(f"Command sent: {cmd}")
-        response = self.sock.recv(6)
-        #print(f"Expected response: {bytearray(cmd)}, received: {response}")
-
-        if len(response) != 6:
-            raise RuntimeError(f'Invalid response length from device [{self}]. Expected 6 bytes, got {len(response)} bytes.')
-
-        di_status = response[3]
-        for i in range(8):
-            if di_status & (1 << i):
-                print(f"DI{i+1} is ON")
-        return di_status
+        """Check the status of digital inputs (DI1 to DI8); returns them as a bitmask (bit 0 = DI1).
+
+        Polled every control tick, so it does not print the inputs; log
+        changes from the caller if needed.
+        """
+        return self.read_DI()
     
     def DI_on_Relay(self, channel: int):
         """Turn on the relay channel if the corresponding DI is ON.
@@ -242,21 +464,22 @@ class Relay():
 
     def is_DI_on(self, di_number: int) -> bool:
         """Return True if the specified DI number (1-8) is ON, else False."""
-        if di_number < 1 or di_number > 8:
-            raise ValueError("DI number must be between 1 and 8")
+        with self.lock:
+            if di_number < 1 or di_number > 8:
+                raise ValueError("DI number must be between 1 and 8")
 
-        # send command and receive status as usual
-        cmd = [0x01, 0x02, 0x00, 0x00, 0x00, 0x08]
-        self._write(cmd)
-        response = self.sock.recv(6)
+            # send command and receive status as usual
+            cmd = [0x01, 0x02, 0x00, 0x00, 0x00, 0x08]
+            self._write(cmd)
+            response = self._read_response(6)
 
-        if len(response) != 6:
-            raise RuntimeError(f"Invalid response length: expected 6, got {len(response)}")
+            if len(response) != 6:
+                raise RuntimeError(f"Invalid response length: expected 6, got {len(response)}")
 
-        di_status = response[3]
+            di_status = response[3]
 
-        # Check if bit for di_number is set
-        return bool(di_status & (1 << (di_number - 1)))
+            # Check if bit for di_number is set
+            return bool(di_status & (1 << (di_number - 1)))
 
 
     def check_DI_periodic(self):
@@ -271,6 +494,336 @@ class Relay():
         thread.start()
         print("Started periodic DI check thread.")
       
+
+class DISampler:
+    """Samples the digital inputs of one board from a background thread.
+
+    All 8 inputs are read with one request per sample. A change is accepted
+    once the new level has been seen in ``debounce`` consecutive samples;
+    the rising/falling callbacks subscribed for that input are then called
+    from the sampler thread as ``callback(di_number, timestamp)``, where
+    timestamp is the time.time() of the first sample showing the new level.
+    A trigger is therefore reported within ``debounce`` sample periods.
+    """
+
+    def __init__(self, relay, interval=0.02, debounce=2, retry_delay=1.0):
+        self.relay = relay
+        self.interval = interval
+        self.debounce = max(1, debounce)
+        self.retry_delay = retry_delay
+        # Debounced DI bitmask, None until the first successful sample
+        self.state = None
+        # Bit -> (consecutive samples at the new level, time first seen)
+        self._pending = {}
+        self._rising = {}
+        self._falling = {}
+        self._callbacks_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, di_number: int, on_rise=None, on_fall=None):
+        """Call on_rise/on_fall(di_number, timestamp) on debounced edges of DI<di_number>."""
+        if di_number < 1 or di_number > 8:
+            raise ValueError("DI number must be between 1 and 8")
+        with self._callbacks_lock:
+            if on_rise:
+                self._rising.setdefault(di_number, []).append(on_rise)
+            if on_fall:
+                self._falling.setdefault(di_number, []).append(on_fall)
+
+    def unsubscribe(self, di_number: int):
+        """Remove every callback of DI<di_number>."""
+        with self._callbacks_lock:
+            self._rising.pop(di_number, None)
+            self._falling.pop(di_number, None)
+
+    def is_on(self, di_number: int) -> bool:
+        """Debounced state of DI<di_number> as of the last sample."""
+        return bool(self.state and self.state & (1 << (di_number - 1)))
+
+    def start(self):
+        """Start sampling in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """Stop sampling and wait for the sampler thread to exit."""
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _run(self):
+        next_sample = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                mask = self.relay.read_DI()
+                if mask is None:
+                    raise RuntimeError('DI read failed')
+            except Exception as e:
+                print(f"DI sampler error on [{self.relay.host}]: {e}")
+                self._reconnect()
+                next_sample = time.monotonic()
+                continue
+
+            self._update(mask, time.time())
+            next_sample += self.interval
+            delay = next_sample - time.monotonic()
+            if delay < 0:
+                # Fell behind (slow board): sample again right away, no burst
+                next_sample = time.monotonic()
+                delay = 0
+            self._stop.wait(delay)
+
+    def _reconnect(self):
+        self.relay.disconnect()
+        if self._stop.wait(self.retry_delay):
+            return
+        try:
+            self.relay.connect()
+        except Exception as e:
+            print(f"DI sampler reconnect failed on [{self.relay.host}]: {e}")
+
+    def _update(self, mask: int, timestamp: float):
+        if self.state is None:
+            # First sample is the baseline; inputs already on are not edges
+            self.state = mask
+            return
+
+        edges = []
+        changed = mask ^ self.state
+        for bit in range(8):
+            bit_mask = 1 << bit
+            if not changed & bit_mask:
+                self._pending.pop(bit, None)
+                continue
+            count, first_seen = self._pending.get(bit, (0, timestamp))
+            count += 1
+            if count < self.debounce:
+                self._pending[bit] = (count, first_seen)
+                continue
+            self._pending.pop(bit, None)
+            self.state ^= bit_mask
+            edges.append((bit + 1, bool(mask & bit_mask), first_seen))
+
+        for di_number, level, first_seen in edges:
+            with self._callbacks_lock:
+                callbacks = list((self._rising if level else self._falling).get(di_number, ()))
+            for callback in callbacks:
+                try:
+                    callback(di_number, first_seen)
+                except Exception as e:
+                    print(f"DI{di_number} {'rising' if level else 'falling'} callback error: {e}")
+
+
+class OutputShadow:
+    """Write-coalescing shadow of one board's relay outputs.
+
+    on()/off()/set() only record the desired state; flush() then writes every
+    channel whose desired state differs from the known coil state in one
+    Write Multiple Coils frame. Writes that would not change a coil are
+    dropped, so code that re-asserts the same outputs every tick costs no
+    board traffic. The known state is refreshed with a Read Coils after a
+    reconnect, every ``resync_interval`` seconds, or whenever a coil read
+    made elsewhere is passed to observe().
+
+    pulse()/flash() queue board-timed pulses; while one runs, coalesced
+    frames are split around that channel so they cannot cut it short.
+    """
+
+    def __init__(self, relay, resync_interval=5.0, clock=time.monotonic):
+        self.relay = relay
+        self.resync_interval = resync_interval
+        # Time source for resync and pulse expiry; a simulation passes its virtual clock
+        self.clock = clock
+        self.lock = threading.Lock()
+        # Coil states last read from or written to the board, None if unknown
+        self.known = None
+        self._desired = 0
+        self._dirty = 0
+        self._pulses = {}  # channel -> queued board-timed on time in ms
+        self._timed = {}   # coil bit -> monotonic end of its running pulse
+        self._synced_at = 0.0
+        self._synced_sock = None
+        self._flush_lock = threading.Lock()
+        # Traffic counters: channel writes requested, coil frames sent
+        self.requested = 0
+        self.frames = 0
+
+    def set(self, channel: int, state: bool):
+        """Queue DO<channel> to be switched on (True) or off (False) at the next flush()."""
+        if channel < 1 or channel > 8:
+            raise ValueError("DO channel must be between 1 and 8")
+        self.set_mask(0xFF if state else 0x00, 1 << (channel - 1))
+
+    def on(self, channel: int):
+        self.set(channel, True)
+
+    def off(self, channel: int):
+        self.set(channel, False)
+
+    def set_mask(self, mask: int, channels: int = 0xFF):
+        """Queue the channels in ``channels`` (bit 0 = DO1) to the states in ``mask``."""
+        channels &= 0xFF
+        with self.lock:
+            self._desired = (self._desired & ~channels) | (mask & channels)
+            self._dirty |= channels
+            for channel in [c for c in self._pulses if channels & (1 << (c - 1))]:
+                del self._pulses[channel]
+            self.requested += bin(channels).count('1')
+
+    def pulse(self, channel: int, ms: int):
+        """Queue a board-timed pulse: DO<channel> on for ``ms`` ms (see Relay.pulse)."""
+        if channel < 1 or channel > 8:
+            raise ValueError("DO channel must be between 1 and 8")
+        flash_units(ms)  # reject durations the board cannot time now, not at flush()
+        with self.lock:
+            self._dirty &= ~(1 << (channel - 1))
+            self._pulses[channel] = ms
+            self.requested += 1
+
+    def flash(self, channel: int, period: int):
+        """Queue one board-timed blink cycle of ``period`` ms (see Relay.flash)."""
+        self.pulse(channel, period // 2)
+
+    def state(self, channel: int):
+        """Desired state of DO<channel>, including unflushed writes; None if unknown."""
+        bit = 1 << (channel - 1)
+        with self.lock:
+            if channel in self._pulses:
+                return True
+            if self._dirty & bit:
+                return bool(self._desired & bit)
+            if self.known is None:
+                return None
+            return bool(self.known & bit)
+
+    def observe(self, do_mask: int):
+        """Record coil states read elsewhere (e.g. the poll loop) as the known state."""
+        with self.lock:
+            self.known = do_mask & 0xFF
+            self._synced_at = self.clock()
+            self._synced_sock = getattr(self.relay, 'sock', None)
+
+    def invalidate(self):
+        """Forget the known state; the next flush() reads the coils first."""
+        with self.lock:
+            self.known = None
+
+    def discard(self):
+        """Drop queued writes and pulses and forget running ones, e.g. before an all-off reset.
+
+        The known state is forgotten too; the next flush() reads the coils first.
+        """
+        with self.lock:
+            self._dirty = 0
+            self._desired = 0
+            self._pulses = {}
+            self._timed = {}
+            self.known = None
+
+    def resync(self) -> int:
+        """Read the coils from the board and return them as the known state."""
+        do_mask = self.relay.check_DO()
+        self.observe(do_mask)
+        return do_mask
+
+    def _stale(self) -> bool:
+        return (self.known is None
+                or getattr(self.relay, 'sock', None) is not self._synced_sock
+                or self.clock() - self._synced_at > self.resync_interval)
+
+    def flush(self) -> int:
+        """Write queued changes in one frame and return the number of channels written."""
+        with self.lock:
+            dirty, desired, pulses = self._dirty, self._desired, self._pulses
+            self._dirty = 0
+            self._pulses = {}
+            stale = self._stale()
+        if not dirty and not pulses:
+            return 0
+        with self._flush_lock:
+            return self._write_changes(dirty, desired, pulses, stale)
+
+    def _timed_mask(self) -> int:
+        """Coils under a running board-timed pulse; expired pulses are now off."""
+        now = self.clock()
+        timed = 0
+        with self.lock:
+            for bit, end in list(self._timed.items()):
+                if now < end:
+                    timed |= bit
+                    continue
+                del self._timed[bit]
+                if self.known is not None:
+                    self.known &= ~bit
+        return timed
+
+    def _write_changes(self, dirty: int, desired: int, pulses: dict, stale: bool) -> int:
+        written = 0
+        try:
+            changed = timed = 0
+            if dirty:
+                timed = self._timed_mask()
+                known = self.resync() if stale else self.known
+                # A dirty coil under a running pulse is always written: the
+                # known state shows it on, but the board will time it off
+                changed = dirty & ((desired ^ known) | timed)
+            # Write the span from the first to the last changed channel of each
+            # group, filling unchanged channels from the known state so the
+            # driver needs no extra coil read for the gaps. Channels under a
+            # running pulse are never filled: groups are split around them.
+            groups = []
+            group = 0
+            for bit in (1 << i for i in range(8)):
+                if changed & bit:
+                    group |= bit
+                elif timed & bit and group:
+                    groups.append(group)
+                    group = 0
+            if group:
+                groups.append(group)
+
+            for group in groups:
+                first = (group & -group).bit_length() - 1
+                span = ((1 << group.bit_length()) - 1) & ~((1 << first) - 1)
+                mask = (desired & group) | (known & ~group)
+                if self.relay.set_outputs(mask, span) is False:
+                    raise RuntimeError(f'Failed to write relay channels [{group:#04x}]')
+                self.frames += 1
+                written += bin(group).count('1')
+                dirty &= ~group
+                with self.lock:
+                    for written_bit in [b for b in self._timed if b & group]:
+                        del self._timed[written_bit]
+                    if self.known is not None:
+                        self.known = (self.known & ~span) | (mask & span)
+            dirty = 0
+
+            for channel in list(pulses):
+                if self.relay.pulse(channel, pulses[channel]) is False:
+                    raise RuntimeError(f'Failed to pulse relay channel [{channel}]')
+                ms = pulses.pop(channel)
+                self.frames += 1
+                written += 1
+                bit = 1 << (channel - 1)
+                with self.lock:
+                    self._timed[bit] = self.clock() + ms / 1000.0
+                    if self.known is not None:
+                        self.known |= bit
+            return written
+        except Exception:
+            # Keep unsent writes queued for the next flush, unless overridden since
+            with self.lock:
+                self._dirty |= dirty
+                for channel, ms in pulses.items():
+                    if channel not in self._pulses and not self._dirty & (1 << (channel - 1)):
+                        self._pulses[channel] = ms
+                self.known = None
+            raise
+
 if __name__ == '__main__':
     with Relay(host='192.168.1.254') as relay:
         relay.all_on()
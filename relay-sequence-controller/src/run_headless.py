@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Headless sequence runner
+Runs the sequences of the controller configuration (by default
+~/.relay_controller/sequences.json, as saved by the GUI) without Qt: one
+SequenceEngine and engine thread per relay board, logging to stdout or a
+file. Meant for a station PC without a display; it does not import PySide6.
+
+Every board runs the configured sequences with their saved enabled states.
+Without --board the board in the configuration (relay_host / relay_port) is
+used. A board whose polls fail is reconnected every few seconds. Named
+boards in the configuration ('boards', addressed as NAME:DIx / NAME:DOx)
+belong to the configured board's engine, so such a configuration runs on
+one --board only.
+
+On Ctrl-C or SIGTERM each board gets the end states of its enabled
+sequences and all outputs are switched off, as when the GUI is closed.
+With --latency the DI-to-DO reaction times per step (engine/latency.py)
+are written with every stats line and on exit, one file per board.
+
+Example: run the saved configuration on two identical stations
+    python3 run_headless.py --board 192.168.1.200 --board 192.168.1.201 --log station.log
+"""
+
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+
+from engine.sequence_engine import SequenceEngine
+from engine.engine_thread import EngineThread, format_stats
+from utils.board_group import connect_boards
+from utils.config_manager import CONFIG_FILE, load_config
+from utils.event_log import EventLog
+
+DEFAULT_HOST = '192.168.1.200'
+DEFAULT_PORT = 4196
+RECONNECT_INTERVAL = 5.0  # seconds between reconnect attempts of a failing board
+
+
+class RunnerLog(EventLog):
+    """Timestamped log lines from all engine threads to stdout or a rotating file.
+
+    Engine threads only append to the ring buffer (utils/event_log.py); the
+    writer thread does the I/O.
+    """
+
+    def __init__(self, path=None):
+        super().__init__(path=path, echo=path is None, max_bytes=10_000_000)
+        self.start()
+
+    def write(self, label, message):
+        self.log(f"[{label}] {message}")
+
+
+class BoardRunner:
+    """One relay board (with the configuration's named boards) with its own engine and engine thread."""
+
+    def __init__(self, host, port, config, log, tick):
+        self.label = f"{host}:{port}"
+        self.log = log
+        self.relay = connect_boards(host, port, config, optimistic=True)
+        self.relay.on_mismatch = self.on_output_mismatch
+        self.engine = SequenceEngine(log=lambda message: log.write(self.label, message))
+        self.engine.load(dict(config, sequences=list(config.get('sequences', []))))
+        self.thread = EngineThread(self.engine, period=tick, publish_interval=1.0)
+        self.last_connect = 0.0
+
+    def on_output_mismatch(self, channels, coil_mask):
+        names = ", ".join(self.engine.do_name(i + 1) for i in range(channels.bit_length()) if channels & (1 << i))
+        self.log.write(self.label, f"WARNING: {names} did not switch (outputs {coil_mask:08b})")
+
+    def connect(self):
+        """Connect and hand the relay to the engine; returns False on failure."""
+        self.last_connect = time.monotonic()
+        try:
+            self.relay.connect()
+        except Exception as e:
+            # A failed connect leaves the socket behind; drop it so the next attempt reconnects
+            self.relay.disconnect()
+            self.log.write(self.label, f"Connection failed: {e}")
+            return False
+        self.engine.attach(self.relay)
+        self.log.write(self.label, "Connected to relay")
+        return True
+
+    def supervise(self):
+        """Reconnect if the board is not attached or its last poll failed."""
+        if self.engine.relay is not None and self.engine.error is None:
+            return
+        if time.monotonic() - self.last_connect < RECONNECT_INTERVAL:
+            return
+        with self.engine.lock:
+            self.relay.disconnect()
+            self.connect()
+
+    def start(self):
+        self.connect()
+        self.thread.start()
+
+    def stop(self):
+        """Stop the engine thread, apply end states and switch all outputs off."""
+        self.thread.stop()
+        if self.engine.relay is None:
+            return
+        try:
+            self.engine.shutdown()
+            self.relay.all_off()
+        except Exception as e:
+            self.log.write(self.label, f"Error switching outputs off: {e}")
+        self.relay.disconnect()
+
+
+def latency_path(path, runner, runners):
+    """path, with the board in the file name when there are several boards."""
+    if len(runners) == 1:
+        return path
+    stem, ext = os.path.splitext(path)
+    return f"{stem}_{runner.label.replace(':', '_')}{ext}"
+
+
+def export_latency(path, runners):
+    for runner in runners:
+        target = latency_path(path, runner, runners)
+        try:
+            runner.engine.latency.export(target)
+        except OSError as e:
+            runner.log.write(runner.label, f"Error writing reaction times to {target}: {e}")
+
+
+def parse_board(text, default_port):
+    """'host' or 'host:port' -> (host, port)."""
+    host, _, port = text.partition(':')
+    return host, int(port) if port else default_port
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run relay sequences without the GUI')
+    parser.add_argument('--config', default=str(CONFIG_FILE), help='configuration file saved by the GUI')
+    parser.add_argument('--board', action='append', default=[], metavar='HOST[:PORT]',
+                        help='relay board to run the sequences on; repeat for several boards')
+    parser.add_argument('--log', help='append events to this file instead of stdout (rotated at 10 MB)')
+    parser.add_argument('--tick', type=float, help='engine tick in milliseconds (default: tick_ms or 10)')
+    parser.add_argument('--stats', type=float, default=60.0,
+                        help='log tick statistics every N seconds, 0 to disable')
+    parser.add_argument('--duration', type=float, default=0.0, help='stop after N seconds, 0 to run until stopped')
+    parser.add_argument('--latency', metavar='FILE',
+                        help='write DI-to-DO reaction times per step to FILE (.json for JSON, else CSV)')
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if config is None:
+        sys.exit(1)
+    default_port = config.get('relay_port', DEFAULT_PORT)
+    boards = [parse_board(text, default_port) for text in args.board]
+    if len(boards) > 1 and config.get('boards'):
+        print("Error: the configuration addresses named boards; run it on one --board only")
+        sys.exit(1)
+    if not boards:
+        boards = [(config.get('relay_host', DEFAULT_HOST), default_port)]
+    tick = (args.tick if args.tick else config.get('tick_ms', 10)) / 1000.0
+
+    log = RunnerLog(args.log)
+    runners = [BoardRunner(host, port, config, log, tick) for host, port in boards]
+    enabled = sum(1 for state in runners[0].engine.enabled if state)
+    log.write('runner', f"Loaded {len(runners[0].engine.sequences)} sequences ({enabled} enabled) "
+                        f"from {args.config} for {len(runners)} board(s)")
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    for runner in runners:
+        runner.start()
+
+    started = time.monotonic()
+    next_stats = started + args.stats
+    try:
+        while not stop.wait(0.5):
+            now = time.monotonic()
+            for runner in runners:
+                runner.supervise()
+            if args.stats and now >= next_stats:
+                for runner in runners:
+                    log.write(runner.label, format_stats(runner.thread.stats()))
+                if args.latency:
+                    export_latency(args.latency, runners)
+                next_stats = now + args.stats
+            if args.duration and now - started >= args.duration:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for runner in runners:
+            runner.stop()
+        if args.latency:
+            export_latency(args.latency, runners)
+        log.write('runner', "Stopped")
+        log.close()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Sequence simulation
+Replays the controller configuration against a scripted board on virtual
+time (see engine/simulation.py): no relay board, no GUI and no sleeping, so
+a shift of production cycles runs in seconds. Prints the time each step
+took, cycle times and the final DO states.
+
+The DI script is a JSON file of timed DI changes, repeated part cycles and
+DI reactions to outputs, e.g. a part every 30 s for a shift:
+
+    {"cycles": [{"period": 30, "count": 960, "start": 1.0,
+                 "events": [[0, 1, true], [2.5, 2, true], [8, 1, false], [8, 2, false]]}]}
+
+Example:
+    python3 simulate.py --script shift.json --duration 8h --log events.log
+"""
+
+import argparse
+import json
+import sys
+
+from engine.simulation import DIScript, Simulation, format_report
+from utils.config_manager import CONFIG_FILE, load_config
+
+
+def parse_duration(text):
+    """Seconds from '90', '90s', '15m' or '8h'."""
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Simulate relay sequences on virtual time')
+    parser.add_argument('--config', default=str(CONFIG_FILE), help='configuration file saved by the GUI')
+    parser.add_argument('--script', required=True, help='DI script (JSON)')
+    parser.add_argument('--duration', type=parse_duration, default=3600.0,
+                        help='virtual time to simulate: seconds or with an s/m/h suffix (default 1h)')
+    parser.add_argument('--tick', type=float, help='engine tick in milliseconds (default: tick_ms or 10)')
+    parser.add_argument('--log', help='write engine events with their virtual time to this file')
+    parser.add_argument('--json', help='also write the report to this file as JSON')
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if config is None:
+        sys.exit(1)
+    try:
+        with open(args.script) as f:
+            script = DIScript.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error loading DI script: {e}")
+        sys.exit(1)
+    tick = (args.tick if args.tick else config.get('tick_ms', 10)) / 1000.0
+
+    log_file = open(args.log, 'w') if args.log else None
+    try:
+        simulation = Simulation(config, script, tick=tick,
+                                log=(lambda line: log_file.write(line + "\n")) if log_file else None)
+        report = simulation.run(args.duration)
+    finally:
+        if log_file:
+            log_file.close()
+
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
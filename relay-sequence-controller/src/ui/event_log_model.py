@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt, QTimer
+
+from utils.event_log import LEVEL, MESSAGE, TIME
+
+
+class EventLogModel(QAbstractListModel):
+    """Newest-first view of an EventLog for a QListView, refreshed on a timer.
+
+    Events are taken from the ring buffer every refresh_ms and inserted as
+    one block, so a burst of events costs one view update instead of one
+    per event. At most max_rows are kept.
+    """
+
+    def __init__(self, event_log, max_rows=500, refresh_ms=250, parent=None):
+        super().__init__(parent)
+        self.event_log = event_log
+        self.max_rows = max_rows
+        self.rows = []  # display strings, newest first
+        self.cursor = event_log.head
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(refresh_ms)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self.rows[index.row()]
+        return None
+
+    def refresh(self):
+        """Show the events logged since the last refresh."""
+        records, self.cursor, missed = self.event_log.read(self.cursor)
+        new_rows = [self._format(record) for record in reversed(records[-self.max_rows:])]
+        if missed:
+            new_rows.append(f"... {missed} events not shown")
+        if not new_rows:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(new_rows) - 1)
+        self.rows[0:0] = new_rows
+        self.endInsertRows()
+        if len(self.rows) > self.max_rows:
+            self.beginRemoveRows(QModelIndex(), self.max_rows, len(self.rows) - 1)
+            del self.rows[self.max_rows:]
+            self.endRemoveRows()
+
+    def clear(self):
+        """Empty the view; the log itself and its file are kept."""
+        self.beginResetModel()
+        self.rows = []
+        self.endResetModel()
+
+    @staticmethod
+    def _format(record):
+        timestamp = datetime.fromtimestamp(record[TIME]).strftime("%H:%M:%S")
+        if record[LEVEL] == 'INFO':
+            return f"[{timestamp}] {record[MESSAGE]}"
+        return f"[{timestamp}] {record[LEVEL]}: {record[MESSAGE]}"
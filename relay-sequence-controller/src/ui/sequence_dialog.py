@@ -73,7 +73,8 @@ class SequenceDialog(QDialog):
             "• Turn ON: DI1->DO2(ON)\n"
             "• Turn OFF: DI1->DO2(OFF)\n"
             "• Multiple actions: DI1&DO2(ON)->DO2(OFF)&DO3(ON):5s\n"
-            "• Conditions: DI1&DI2, DI1|DI2, DI1&DO2(ON)"
+            "• Conditions: DI1&DI2, DI1|DI2, DI1&DO2(ON)\n"
+            "• Other boards (from 'boards' in the configuration): B:DI1->B:DO2(ON)"
         )
         info_label.setStyleSheet("color: #666; font-size: 9pt;")
         multi_layout.addWidget(info_label)
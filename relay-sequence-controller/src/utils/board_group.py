@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Several relay boards driven as one
+A cell with more than one Waveshare board names the extra boards in the
+configuration:
+
+    "boards": [{"name": "B", "host": "192.168.1.201"},
+               {"name": "C", "host": "192.168.1.202", "port": 4196}]
+
+Step text then addresses them as B:DI3 / C:DO5(ON); plain DIx / DOx stay on
+the main board (relay_host / relay_port). BoardGroup numbers channels on
+across the boards: channel 8 * b + x is channel x of board b (main board
+0), and DI / DO bitmasks have 8 bits per board.
+
+Reads go to all boards at once. check_DI() sends a Read Discrete Inputs to
+every board before receiving any answer, so a tick's snapshot costs about
+one round trip per request however many boards there are. Writes are
+batched per board: GroupOutputShadow keeps an OutputShadow per board, so
+each board gets one frame per tick for its changed outputs.
+"""
+
+import threading
+import time
+from contextlib import ExitStack
+
+from relay_b import OutputShadow, Relay
+
+CHANNELS = 8  # channels per board
+
+
+def board_names(config):
+    """Board names in group order, None for the main board."""
+    return [None] + [board['name'] for board in config.get('boards', [])]
+
+
+def connect_boards(host, port, config, optimistic=True):
+    """Relay for host:port, or a BoardGroup of it and the configuration's named boards.
+
+    Nothing is connected yet; call connect() on the result.
+    """
+    relay = Relay(host=host, port=port, optimistic=optimistic)
+    boards = config.get('boards', [])
+    if not boards:
+        return relay
+    relays = [relay] + [Relay(host=board['host'], port=board.get('port', port), optimistic=optimistic)
+                        for board in boards]
+    return BoardGroup(relays, board_names(config))
+
+
+class BoardGroup:
+    """Relay boards used through the Relay interface with channels numbered across them.
+
+    Args:
+        relays: one Relay (or stand-in with the same methods) per board,
+            the main board first.
+        names: board name per relay, None for the main board.
+    """
+
+    def __init__(self, relays, names):
+        self.relays = list(relays)
+        self.names = list(names)
+        self.host = self.relays[0].host
+        self.port = self.relays[0].port
+        self.channels = range(1, CHANNELS * len(self.relays) + 1)
+        self.lock = threading.RLock()
+        self._on_mismatch = None
+
+    def __str__(self):
+        return ', '.join(f"{name or 'main'} {relay.host}:{relay.port}" for name, relay in zip(self.names, self.relays))
+
+    @property
+    def sock(self):
+        """Sockets of all boards; changes whenever one of them reconnects."""
+        return tuple(getattr(relay, 'sock', None) for relay in self.relays)
+
+    @property
+    def capture(self):
+        return self.relays[0].capture
+
+    @capture.setter
+    def capture(self, writer):
+        # A capture file holds the traffic of one board: the main board's
+        self.relays[0].capture = writer
+
+    @property
+    def on_mismatch(self):
+        return self._on_mismatch
+
+    @on_mismatch.setter
+    def on_mismatch(self, callback):
+        """Called as callback(channels, coil_mask) with group channel bits."""
+        self._on_mismatch = callback
+        for board, relay in enumerate(self.relays):
+            if callback is None:
+                relay.on_mismatch = None
+            else:
+                shift = board * CHANNELS
+                relay.on_mismatch = lambda channels, coil_mask, shift=shift: callback(channels << shift,
+                                                                                       coil_mask << shift)
+
+    def connect(self):
+        """Connect every board; raises the first board's error that fails."""
+        for relay in self.relays:
+            relay.connect()
+
+    def disconnect(self):
+        for relay in self.relays:
+            relay.disconnect()
+
+    def _board(self, channel):
+        """(relay, channel on that board) for a group channel number."""
+        if channel not in self.channels:
+            raise ValueError(f'Provided channel [{channel}] not in [{self.channels}] for board group [{self}].')
+        board, index = divmod(channel - 1, CHANNELS)
+        return self.relays[board], index + 1
+
+    def _read(self, request, response):
+        """Send `request` to every board, then receive every answer; returns the combined mask."""
+        with ExitStack() as stack:
+            for relay in self.relays:
+                stack.enter_context(relay.lock)
+            error = None
+            sent = []
+            for board, relay in enumerate(self.relays):
+                try:
+                    getattr(relay, request)()
+                    sent.append((board, relay))
+                except Exception as e:
+                    error = error or e
+            mask = 0
+            # Receive every answer even after an error, so the other boards'
+            # connections stay in step for the next request
+            for board, relay in sent:
+                try:
+                    mask |= getattr(relay, response)() << (board * CHANNELS)
+                except Exception as e:
+                    error = error or e
+            if error:
+                raise error
+            return mask
+
+    def check_DI(self):
+        """DI states of all boards in one bitmask (bit 8 * b = DI1 of board b)."""
+        return self._read('request_DI', 'response_DI')
+
+    read_DI = check_DI
+
+    def check_DO(self):
+        """Coil states of all boards in one bitmask (bit 8 * b = DO1 of board b)."""
+        return self._read('request_DO', 'response_DO')
+
+    def status(self, channel):
+        relay, channel = self._board(channel)
+        return relay.status(channel)
+
+    def on(self, channel):
+        relay, channel = self._board(channel)
+        relay.on(channel)
+
+    def off(self, channel):
+        relay, channel = self._board(channel)
+        relay.off(channel)
+
+    def pulse(self, channel, ms):
+        relay, channel = self._board(channel)
+        relay.pulse(channel, ms)
+
+    def flash(self, channel, period):
+        relay, channel = self._board(channel)
+        relay.flash(channel, period)
+
+    def set_outputs(self, mask, channels=None, verify=False):
+        """Write the selected channels with one frame per board that has any (see Relay.set_outputs)."""
+        for board, relay in enumerate(self.relays):
+            shift = board * CHANNELS
+            board_channels = 0xFF if channels is None else (channels >> shift) & 0xFF
+            if board_channels:
+                relay.set_outputs((mask >> shift) & 0xFF, board_channels, verify)
+
+    def all_off(self):
+        for relay in self.relays:
+            relay.all_off()
+
+
+class GroupOutputShadow:
+    """An OutputShadow per board of a BoardGroup, used as one with group channel numbers."""
+
+    def __init__(self, group, resync_interval=5.0, clock=time.monotonic):
+        self.shadows = [OutputShadow(relay, resync_interval, clock) for relay in group.relays]
+
+    @property
+    def requested(self):
+        return sum(shadow.requested for shadow in self.shadows)
+
+    @property
+    def frames(self):
+        return sum(shadow.frames for shadow in self.shadows)
+
+    def _shadow(self, channel):
+        board, index = divmod(channel - 1, CHANNELS)
+        if channel < 1 or board >= len(self.shadows):
+            raise ValueError(f"DO channel must be between 1 and {CHANNELS * len(self.shadows)}")
+        return self.shadows[board], index + 1
+
+    def set(self, channel, state):
+        shadow, channel = self._shadow(channel)
+        shadow.set(channel, state)
+
+    def on(self, channel):
+        self.set(channel, True)
+
+    def off(self, channel):
+        self.set(channel, False)
+
+    def set_mask(self, mask, channels=None):
+        for board, shadow in enumerate(self.shadows):
+            shift = board * CHANNELS
+            board_channels = 0xFF if channels is None else (channels >> shift) & 0xFF
+            if board_channels:
+                shadow.set_mask((mask >> shift) & 0xFF, board_channels)
+
+    def pulse(self, channel, ms):
+        shadow, channel = self._shadow(channel)
+        shadow.pulse(channel, ms)
+
+    def flash(self, channel, period):
+        shadow, channel = self._shadow(channel)
+        shadow.flash(channel, period)
+
+    def state(self, channel):
+        shadow, channel = self._shadow(channel)
+        return shadow.state(channel)
+
+    def observe(self, do_mask):
+        for board, shadow in enumerate(self.shadows):
+            shadow.observe((do_mask >> (board * CHANNELS)) & 0xFF)
+
+    def invalidate(self):
+        for shadow in self.shadows:
+            shadow.invalidate()
+
+    def discard(self):
+        for shadow in self.shadows:
+            shadow.discard()
+
+    def resync(self):
+        return sum(shadow.resync() << (board * CHANNELS) for board, shadow in enumerate(self.shadows))
+
+    def flush(self):
+        """Flush every board, one frame per board with changes; raises the first error after trying all."""
+        written = 0
+        error = None
+        for shadow in self.shadows:
+            try:
+                written += shadow.flush()
+            except Exception as e:
+                error = error or e
+        if error:
+            raise error
+        return written
@@ -5,14 +5,15 @@ from pathlib import Path
 CONFIG_DIR = Path.home() / '.relay_controller'
 CONFIG_FILE = CONFIG_DIR / 'sequences.json'
 
-def load_config():
-    """Load configuration from file."""
+def load_config(path=CONFIG_FILE):
+    """Load configuration from file (default: ~/.relay_controller/sequences.json)."""
+    path = Path(path)
     try:
-        if CONFIG_FILE.exists():
-            with open(CONFIG_FILE, 'r') as f:
+        if path.exists():
+            with open(path, 'r') as f:
                 return json.load(f)
         else:
-            print(f"Config file not found: {CONFIG_FILE}")
+            print(f"Config file not found: {path}")
     except Exception as e:
         print(f"Error loading config: {e}")
     return None
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Deadline scheduler for the sequence engine's timers
+Timed DO offs, WAIT steps and blink phases are kept in one binary heap
+ordered by their monotonic due time, so scheduling a timer and finding the
+next one due are O(log n) and O(1), however many sequences are running.
+run_due() fires exactly the timers that are due instead of every tick
+comparing every timer with the clock.
+
+Each timer has a key (scheduling a key again replaces its timer) and an
+optional group, normally the sequence id, so all timers of a sequence can
+be cancelled together. Cancelled timers are only marked and dropped when
+they reach the top of the heap; the heap is rebuilt once more than half of
+it is cancelled entries.
+
+Not thread safe: the engine calls it under its own lock.
+"""
+
+import heapq
+import itertools
+import time
+from collections import deque
+from typing import Callable, Dict, Hashable, Optional, Set
+
+# Heap entry fields; entries are lists so cancel() can mark them in place
+_DEADLINE, _ORDER, _KEY, _CALLBACK, _GROUP = range(5)
+
+
+class DeadlineScheduler:
+    """Min-heap of (deadline, callback) timers on a monotonic clock.
+
+    Args:
+        clock: returns the current time in seconds; deadlines use the same
+            clock. time.monotonic unless the caller runs on virtual time.
+        history: number of fired timers whose lateness is kept.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic, history: int = 1000):
+        self.clock = clock
+        self._heap = []
+        self._entries: Dict[Hashable, list] = {}
+        self._groups: Dict[Hashable, Set[Hashable]] = {}
+        self._order = itertools.count()
+        self._cancelled = 0
+        # Seconds between each fired timer's deadline and its callback
+        self.lateness = deque(maxlen=history)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def keys(self):
+        """Keys of all pending timers."""
+        return self._entries.keys()
+
+    def deadline(self, key) -> Optional[float]:
+        """Due time of the timer with key, None if there is none."""
+        entry = self._entries.get(key)
+        return entry[_DEADLINE] if entry else None
+
+    def schedule(self, key, deadline: float, callback: Callable[[float], None], group=None):
+        """Call callback(now) once the clock reaches deadline.
+
+        A pending timer with the same key is cancelled first.
+        """
+        self.cancel(key)
+        entry = [deadline, next(self._order), key, callback, group]
+        heapq.heappush(self._heap, entry)
+        self._entries[key] = entry
+        if group is not None:
+            self._groups.setdefault(group, set()).add(key)
+
+    def cancel(self, key) -> bool:
+        """Cancel the timer with key; returns False if there was none."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._forget(entry)
+        return True
+
+    def cancel_group(self, group) -> int:
+        """Cancel every timer scheduled with group; returns how many there were."""
+        keys = self._groups.pop(group, ())
+        for key in keys:
+            entry = self._entries.pop(key)
+            entry[_GROUP] = None
+            self._forget(entry)
+        return len(keys)
+
+    def clear(self):
+        """Cancel all timers."""
+        self._heap.clear()
+        self._entries.clear()
+        self._groups.clear()
+        self._cancelled = 0
+
+    def next_deadline(self) -> Optional[float]:
+        """Due time of the earliest pending timer, None if there is none."""
+        heap = self._heap
+        while heap and heap[0][_CALLBACK] is None:
+            heapq.heappop(heap)
+            self._cancelled -= 1
+        return heap[0][_DEADLINE] if heap else None
+
+    def run_due(self, now: Optional[float] = None) -> int:
+        """Fire every timer due at now (default: the clock), earliest first.
+
+        A callback may schedule or cancel timers, including rescheduling its
+        own key; a timer it schedules that is already due fires in the same
+        call. Returns the number of callbacks run.
+        """
+        if now is None:
+            now = self.clock()
+        heap = self._heap
+        fired = 0
+        while heap and heap[0][_DEADLINE] <= now:
+            entry = heapq.heappop(heap)
+            callback = entry[_CALLBACK]
+            if callback is None:
+                self._cancelled -= 1
+                continue
+            del self._entries[entry[_KEY]]
+            self._ungroup(entry)
+            self.lateness.append(self.clock() - entry[_DEADLINE])
+            callback(now)
+            fired += 1
+        return fired
+
+    def _forget(self, entry):
+        entry[_CALLBACK] = None
+        self._ungroup(entry)
+        self._cancelled += 1
+        if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):
+            self._heap = [entry for entry in self._heap if entry[_CALLBACK] is not None]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def _ungroup(self, entry):
+        group = entry[_GROUP]
+        if group is not None:
+            keys = self._groups.get(group)
+            if keys is not None:
+                keys.discard(entry[_KEY])
+                if not keys:
+                    del self._groups[group]
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Modbus traffic capture files
+A capture holds every request and response exchanged with one relay board,
+each stamped with the monotonic time since the capture started, so a
+production session can be replayed later (see relay_replay.py).
+
+Frames are stored without transport framing, as [unit, function, data...]:
+no RTU CRC and no MBAP header, so RTU and Modbus TCP captures look the same.
+
+File layout (little endian):
+    header:  b'RCAP', version (u8), wall clock start (f64),
+             label length (u8), label (utf-8, e.g. "192.168.1.200:4196")
+    record:  time since start in seconds (f64), direction (u8),
+             transaction id (u16, 0 for RTU), frame length (u16), frame
+
+RTU allows one request in flight, so a response answers the last request.
+Modbus TCP responses may arrive in any order and are paired with their
+request by MBAP transaction id.
+
+Inspect a capture:
+    python3 relay_capture.py production.rcap
+"""
+
+import argparse
+import struct
+import threading
+import time
+from typing import Iterator, List, Tuple
+
+MAGIC = b'RCAP'
+VERSION = 1
+
+# Record direction
+REQUEST = 0
+RESPONSE = 1
+
+HEADER = struct.Struct('<4sBdB')
+RECORD = struct.Struct('<dBHH')
+
+
+class CaptureWriter:
+    """Appends request/response frames of one board to a capture file.
+
+    Thread safe, so one writer can be shared by a driver used from the poll
+    thread and the GUI. Records are buffered; call close() (or use the
+    writer as a context manager) to flush them.
+    """
+
+    def __init__(self, path: str, label: str = ''):
+        self.path = path
+        self.lock = threading.Lock()
+        self.records = 0
+        self.file = open(path, 'wb')
+        encoded = label.encode('utf-8')[:255]
+        self.file.write(HEADER.pack(MAGIC, VERSION, time.time(), len(encoded)) + encoded)
+        self.started = time.monotonic()
+
+    def record(self, direction: int, frame, transaction_id: int = 0):
+        """Store one frame ([unit, function, data...]) sent or received now."""
+        elapsed = time.monotonic() - self.started
+        frame = bytes(frame)
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(RECORD.pack(elapsed, direction, transaction_id, len(frame)) + frame)
+            self.records += 1
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_capture(path: str) -> Tuple[dict, List[Tuple[float, int, int, bytes]]]:
+    """Load a capture file.
+
+    Returns (info, records): info has 'version', 'started' (wall clock) and
+    'label'; records are (seconds since start, direction, transaction id,
+    frame) tuples.
+    A record cut short by a crash is ignored.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a capture file")
+    magic, version, started, label_length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a capture file")
+    if version != VERSION:
+        raise ValueError(f"Unsupported capture version {version} in {path}")
+    offset = HEADER.size + label_length
+    info = {
+        'version': version,
+        'started': started,
+        'label': data[HEADER.size:offset].decode('utf-8', 'replace'),
+    }
+    return info, list(_iter_records(data, offset))
+
+
+def _iter_records(data: bytes, offset: int) -> Iterator[Tuple[float, int, int, bytes]]:
+    while offset + RECORD.size <= len(data):
+        elapsed, direction, transaction_id, length = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        if offset + length > len(data):
+            return
+        yield elapsed, direction, transaction_id, data[offset:offset + length]
+        offset += length
+
+
+def exchanges(records: List[Tuple[float, int, int, bytes]]) -> List[Tuple[float, bytes, bytes, float]]:
+    """Pair requests with their responses, in request order.
+
+    Returns (request time, request, response, round trip) tuples. Requests
+    that never got a response (timeouts) are left out.
+    """
+    pairs = []
+    pending = {}  # transaction id -> (request time, request, index in pairs)
+    for elapsed, direction, transaction_id, frame in records:
+        if direction == REQUEST:
+            # Placeholder keeps request order; filled in by the response
+            pending[transaction_id] = (elapsed, frame, len(pairs))
+            pairs.append(None)
+        elif transaction_id in pending:
+            sent, request, index = pending.pop(transaction_id)
+            pairs[index] = (sent, request, frame, elapsed - sent)
+    return [pair for pair in pairs if pair is not None]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Summarise Modbus capture files')
+    parser.add_argument('paths', nargs='+', help='capture files')
+    args = parser.parse_args()
+
+    for path in args.paths:
+        info, records = read_capture(path)
+        pairs = exchanges(records)
+        duration = records[-1][0] if records else 0.0
+        print(f"{path}: {info['label'] or 'unlabelled'}, started "
+              f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(info['started']))}, "
+              f"{duration:.1f} s, {len(records)} frames, {len(pairs)} exchanges")
+        functions = {}
+        for _, request, _, rtt in pairs:
+            functions.setdefault(request[1], []).append(rtt)
+        for function, rtts in sorted(functions.items()):
+            rtts.sort()
+            print(f"  FC {function:#04x}: {len(rtts)} requests, "
+                  f"RTT p50 {rtts[len(rtts) // 2] * 1000:.1f} ms, max {rtts[-1] * 1000:.1f} ms")